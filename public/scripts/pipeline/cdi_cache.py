@@ -0,0 +1,85 @@
+# cdi_cache.py
+# Persistent on-disk cache for incremental CDI runs
+
+import hashlib
+import json
+import os
+import threading
+
+
+def content_hash(text):
+    """Returns the SHA-256 hex digest of a string (used for markdown chunks and pages)."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class IngestionCache:
+    """
+    URL-keyed cache of HTTP validators (ETag/Last-Modified) and the content hashes of the markdown
+    chunks extracted from each URL, plus the content hash of every page from the previous run.
+    The chunks themselves are only kept when the response had validators, since only a 304 reply
+    to a conditional request lets them be reused (HTTP backend); Selenium loads keep just the hashes.
+
+    Layout:
+        {"version": 2,
+         "urls":  {url:  {"source": "html"|"rsc"|"selenium", "etag": ..., "last_modified": ...,
+                          "chunks": [...] (with validators only), "chunk_hashes": [...]}},
+         "pages": {href: {"content_hash": ...}}}
+    """
+
+    VERSION = 2
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {"version": self.VERSION, "urls": {}, "pages": {}}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    loaded = json.load(f)
+                if loaded.get("version") == self.VERSION:
+                    self.data = loaded
+                else:
+                    print(f"Ignoring CDI cache with unsupported version at {path}.")
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Warning: Could not read CDI cache {path}: {e}. Starting with an empty cache.")
+
+    def get_url(self, url):
+        with self._lock:
+            return self.data["urls"].get(url)
+
+    def update_url(self, url, etag, last_modified, chunks, source):
+        """
+        Stores the chunk hashes read from `url` and the validators of the response (`source`) that carried them.
+        Returns (changed, removed): how many of the chunks are not among the URL's chunks from the previous run,
+        and how many of those are gone; None if the URL was not cached.
+        """
+        chunk_hashes = [content_hash(chunk) for chunk in chunks]
+        entry = {"source": source, "etag": etag, "last_modified": last_modified, "chunk_hashes": chunk_hashes}
+        if etag or last_modified:
+            entry["chunks"] = list(chunks)
+        with self._lock:
+            previous = self.data["urls"].get(url)
+            self.data["urls"][url] = entry
+        if previous is None:
+            return None
+        previous_hashes = set(previous.get("chunk_hashes", []))
+        return (sum(1 for h in chunk_hashes if h not in previous_hashes),
+                len(previous_hashes - set(chunk_hashes)))
+
+    def get_page_hash(self, href):
+        with self._lock:
+            return self.data["pages"].get(href, {}).get("content_hash")
+
+    def set_pages(self, page_hashes):
+        """Replaces the page table with {href: content_hash} from the current run."""
+        with self._lock:
+            self.data["pages"] = {href: {"content_hash": h} for href, h in page_hashes.items()}
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -32,6 +32,12 @@ GITHUB_BLOB_URL_PREFIX = f"{GITHUB_REPO_URL}/blob/{GITHUB_REF}/"
 # Where the structured JSON data from CDI will be saved
 INGESTED_DATA_JSON_PATH = os.path.join(WORKSPACE_BASE, "ingested_deepwiki_data.json")
 
+# Optional SQLite page store (pages, resolved links and mermaid diagrams, indexed by DeepWiki href,
+# lowercase title and target_astro_path). When enabled, CDI upserts every page into it and exports
+# INGESTED_DATA_JSON_PATH from it; SPBCP and run_convert_internal_anchors.py read the store instead.
+PAGE_STORE_ENABLED = False
+PAGE_STORE_PATH = os.path.join(WORKSPACE_BASE, "ingested_deepwiki_data.sqlite")
+
 # The target directory where Starlight .mdx files will be generated by SPBCP
 # This should be your Astro project's content directory, typically 'src/content/docs'
 # For example: os.path.join(WORKSPACE_BASE, "my-astro-starlight-project", "src", "content", "docs")
@@ -52,6 +58,90 @@ BRAVE_EXECUTABLE_PATH = "/Applications/Brave Browser.app/Contents/MacOS/Brave Br
 # Minimum character length heuristic for a script payload to be considered a "full page"
 MIN_PAGE_LEN_HEURISTIC = 500 # From your original script
 
+# Ingestion backend used by CDI to read the DeepWiki page payloads:
+#   "selenium" - drive a headless Chrome/Brave through Selenium (original behaviour, default).
+#   "http"     - fetch the server-rendered HTML (and RSC/flight responses) directly; no browser needed.
+CDI_INGESTION_BACKEND = "selenium"
+# With the "http" backend, fall back to Selenium for the navigation or any page the HTTP backend could not read.
+# Requires CHROMEDRIVER_EXECUTABLE_PATH to be valid.
+CDI_SELENIUM_FALLBACK = True
+# Timeout in seconds for each request made by the HTTP backend
+CDI_HTTP_TIMEOUT = 30
+# User-Agent header sent by the HTTP backend (None uses a desktop Chrome User-Agent)
+CDI_HTTP_USER_AGENT = None
+# Number of pages fetched in parallel when the bulk extraction misses them.
+# With the "selenium" backend every worker runs its own browser session, so keep this modest.
+CDI_FALLBACK_CONCURRENCY = 4
+# How CDI decides that a page loaded in the browser is ready to be scraped:
+#   "mutation_observer" - return as soon as a __next_f payload starting with a '# ' heading is in the DOM (event driven)
+#   "polling"           - check the same condition every CDI_PAGE_READY_POLL_INTERVAL seconds
+#   "fixed_sleep"       - legacy behaviour: wait for document.readyState == 'complete', then sleep 3 seconds
+CDI_PAGE_READINESS_STRATEGY = "mutation_observer"
+# Upper bound (seconds) for the readiness wait of a single page
+CDI_PAGE_READY_TIMEOUT = 20
+# Once document.readyState is 'complete' and no payload has appeared, wait at most this many more seconds
+CDI_PAGE_READY_GRACE = 3
+# Poll interval (seconds) for the "polling" strategy and for client-side navigation (CDI_SELENIUM_NAVIGATION)
+CDI_PAGE_READY_POLL_INTERVAL = 0.25
+
+# How the Selenium path moves between pages. "full_load" calls driver.get() for every page. "client_side" loads the
+# app once and then changes routes client-side, reading each page's flight (`?_rsc=`) response from Chrome's
+# performance log (CDP) instead of reloading the app; pages it cannot reach that way fall back to a full load.
+CDI_SELENIUM_NAVIGATION = "full_load"
+
+# Lean load: browser sessions (CDI's Selenium backend and fallback) skip the subresources no scraper reads, which
+# also makes the readiness waits settle sooner. Selenium blocks them by URL pattern via CDP Network.setBlockedURLs.
+# None uses the defaults in lean_load.py (images, media, fonts and stylesheets; common analytics and tracking
+# domains); a list replaces them. Blocked and loaded request counts are printed at the end of the run.
+# Off by default: pages are loaded in full, as a browser would. Compare a run's output with and without it before
+# relying on it for a site. run_scrape_gitbook.py uses the same defaults (see its --lean-load and --block-domain options).
+LEAN_LOAD_ENABLED = False
+LEAN_LOAD_BLOCKED_RESOURCE_TYPES = None
+LEAN_LOAD_BLOCKED_DOMAINS = None
+
+# Incremental re-ingestion: keep an on-disk cache (keyed by URL) of ETag/Last-Modified validators and the
+# content hashes of extracted markdown, so re-runs revalidate pages with conditional requests and reuse the
+# previous run's entries (resolved_links, mermaid_diagrams) for pages whose content did not change.
+# Off by default: every run fetches and processes all pages.
+CDI_INCREMENTAL = False
+CDI_CACHE_PATH = os.path.join(WORKSPACE_BASE, ".cdi_cache.json")
+
+# Checkpointing: CDI saves its progress (site map, link map and the content extracted so far) after each phase
+# and after every CDI_CHECKPOINT_EVERY fallback pages. `python run_cdi.py --resume` continues from the checkpoint
+# without re-fetching pages that already have content. The checkpoint is removed after a successful run.
+CDI_CHECKPOINT_PATH = os.path.join(WORKSPACE_BASE, ".cdi_checkpoint.json")
+CDI_CHECKPOINT_EVERY = 5
+
+# Incremental page building: SPBCP keeps a manifest of each page's input hash and output file, skips pages whose
+# ingested record (and the builder) did not change, only rewrites .mdx files whose bytes differ, and deletes pages
+# it wrote earlier that are no longer in the ingested data. `python run_spbcp.py --force` rebuilds every page.
+# Off by default: every run rebuilds and rewrites all pages and deletes nothing.
+SPBCP_INCREMENTAL = False
+SPBCP_MANIFEST_PATH = os.path.join(WORKSPACE_BASE, ".spbcp_manifest.json")
+
+# Link graph: CDI and SPBCP keep each page's title, Astro path and outgoing links in LINK_GRAPH_PATH, and
+# run_convert_internal_anchors.py adds which titles each generated page's anchor links refer to. The converter then
+# takes its title map from the graph and only re-scans pages SPBCP rewrote and pages that refer to a title whose
+# path changed. Query it with `python run_query_link_graph.py`. `run_convert_internal_anchors.py --force` re-scans all pages.
+# Off by default: the converter re-reads the ingested data and scans every page on each run.
+LINK_GRAPH_ENABLED = False
+LINK_GRAPH_PATH = os.path.join(WORKSPACE_BASE, ".link_graph.json")
+
+# Source tree index: a local clone of GITHUB_REPO_URL (with GITHUB_REF fetched). When set, SPBCP resolves short or
+# partial filenames cited by DeepWiki (e.g. "miner.py") to their full path at GITHUB_REF and reports cited files
+# that do not exist, are ambiguous, or line ranges past the end of a file. The index (paths and line counts) is read
+# from git without network access and cached per commit in SOURCE_INDEX_CACHE_PATH. None = links are not checked.
+SOURCE_CHECKOUT_PATH = None # e.g. os.path.join(WORKSPACE_BASE, "SN27")
+SOURCE_INDEX_CACHE_PATH = os.path.join(WORKSPACE_BASE, ".source_index.json")
+
+# Bumping GITHUB_REF without re-ingesting: set DEEPWIKI_SOURCE_REF to the ref the ingested line numbers refer to
+# (the GITHUB_REF DeepWiki's content was generated for) and GITHUB_REF to the new one. With SOURCE_CHECKOUT_PATH,
+# SPBCP and run_remap_source_links.py move each "#Lx-Ly" range by the diff hunks between the two refs (follows
+# renames). Ranges whose lines were changed or deleted keep linking to DEEPWIKI_SOURCE_REF, where they are still
+# accurate. Line maps are cached per pair of commits in SOURCE_LINE_MAP_CACHE_PATH. None = same as GITHUB_REF.
+DEEPWIKI_SOURCE_REF = None
+SOURCE_LINE_MAP_CACHE_PATH = os.path.join(WORKSPACE_BASE, ".source_line_maps.json")
+
 # --- FILE_MAPPING_OVERRIDES (Optional - for exceptions to automated path/title generation) ---
 # Allows specific overrides for page slugs, categories (parent paths), or titles.
 # The automated logic will try to generate paths like /category/sub-category/page-slug
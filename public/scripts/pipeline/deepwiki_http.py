@@ -0,0 +1,205 @@
+# deepwiki_http.py
+# HTTP-only access to DeepWiki pages for CDI (no browser required)
+
+import gzip
+import time
+import zlib
+from html.parser import HTMLParser
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+HTML_HEADERS = {"Accept": "text/html,application/xhtml+xml"}
+# Asking a Next.js app-router page for its flight payload instead of HTML
+RSC_HEADERS = {"Accept": "text/x-component", "RSC": "1"}
+
+_VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+
+
+class DeepWikiHttpClient:
+    """
+    Fetches DeepWiki page HTML and RSC (flight) responses over plain HTTP.
+    With a ScrapeArchive, responses are recorded to it or replayed from it (no network).
+    """
+
+    def __init__(self, timeout=30, user_agent=None, archive=None):
+        self.timeout = timeout
+        self.user_agent = user_agent or DEFAULT_USER_AGENT
+        self.archive = archive
+        self.requests_made = 0
+
+    def fetch(self, url, extra_headers=None):
+        """Performs a GET request and returns the (decompressed) response body as bytes."""
+        return self.fetch_conditional(url, extra_headers=extra_headers)[1]
+
+    def fetch_conditional(self, url, etag=None, last_modified=None, extra_headers=None):
+        """
+        Performs a GET request, revalidating with If-None-Match/If-Modified-Since when validators are given.
+        Returns (status, body bytes or None on 304, {"etag": ..., "last_modified": ...}).
+        """
+        archive_key = f"GET {(extra_headers or {}).get('Accept', '*/*')} {url}"
+        if self.archive is not None and self.archive.replaying:
+            self.requests_made += 1
+            return self.archive.replay_response("http", archive_key, etag, last_modified)
+        if self.archive is not None:
+            # Always record full responses, so the archive can serve them without validators.
+            etag = last_modified = None
+        headers = {
+            "User-Agent": self.user_agent,
+            "Accept-Encoding": "gzip, deflate",
+        }
+        if extra_headers:
+            headers.update(extra_headers)
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        request = Request(url, headers=headers)
+        self.requests_made += 1
+        start_time = time.monotonic()
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                status = response.status
+                body = response.read()
+                response_headers = response.headers
+        except HTTPError as e:
+            if e.code != 304:
+                raise
+            return 304, None, {"etag": e.headers.get("ETag") or etag, "last_modified": e.headers.get("Last-Modified") or last_modified}
+        encoding = (response_headers.get("Content-Encoding") or "").lower()
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "deflate":
+            body = zlib.decompress(body)
+        validators = {"etag": response_headers.get("ETag"), "last_modified": response_headers.get("Last-Modified")}
+        if self.archive is not None:
+            self.archive.record_response("http", archive_key, status, body, validators, time.monotonic() - start_time)
+        return status, body, validators
+
+    def fetch_html(self, url, etag=None, last_modified=None):
+        """Returns (status, server-rendered HTML or None on 304, validators) for a page."""
+        status, body, validators = self.fetch_conditional(url, etag, last_modified, HTML_HEADERS)
+        return status, (body.decode("utf-8", "replace") if body is not None else None), validators
+
+    def fetch_rsc(self, url, etag=None, last_modified=None):
+        """Returns (status, raw React Server Components (flight) response bytes or None on 304, validators)."""
+        return self.fetch_conditional(url, etag, last_modified, RSC_HEADERS)
+
+
+class _ScriptCollector(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.scripts = []
+        self._current = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "script":
+            self._current = []
+
+    def handle_endtag(self, tag):
+        if tag == "script" and self._current is not None:
+            self.scripts.append("".join(self._current))
+            self._current = None
+
+    def handle_data(self, data):
+        if self._current is not None:
+            self._current.append(data)
+
+
+def extract_script_bodies(html):
+    """Returns the inner text of every <script> element in document order."""
+    collector = _ScriptCollector()
+    collector.feed(html)
+    collector.close()
+    return collector.scripts
+
+
+class _NavCollector(HTMLParser):
+    """
+    Mirrors the Selenium lookup in run_cdi.py:
+    div.border-r-border[class*='md:sticky'] > ... > ul.flex-1 > li > a
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.items = []
+        self.found_nav = False
+        self._stack = []
+        self._container_depth = None
+        self._ul_depth = None
+        self._current_li = None
+        self._li_depth = None
+        self._a_depth = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_TAGS:
+            return
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        self._stack.append(tag)
+        depth = len(self._stack)
+
+        if self._container_depth is None:
+            if tag == "div" and "border-r-border" in classes and any("md:sticky" in c for c in classes):
+                self._container_depth = depth
+            return
+
+        if self._ul_depth is None:
+            if tag == "ul" and "flex-1" in classes:
+                self._ul_depth = depth
+                self.found_nav = True
+            return
+
+        if tag == "li" and depth == self._ul_depth + 1:
+            self._current_li = {"title": "", "href": None, "style": attrs.get("style") or "", "_text": []}
+            self._li_depth = depth
+        elif tag == "a" and self._current_li is not None and self._a_depth is None and self._current_li["href"] is None:
+            self._current_li["href"] = attrs.get("href")
+            self._a_depth = depth
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_TAGS or tag not in self._stack:
+            return
+        # Pop up to and including the matching start tag (tolerates unclosed children).
+        while self._stack:
+            depth = len(self._stack)
+            popped = self._stack.pop()
+            if self._a_depth is not None and depth == self._a_depth:
+                self._a_depth = None
+            if self._li_depth is not None and depth == self._li_depth:
+                li = self._current_li
+                li["title"] = " ".join("".join(li.pop("_text")).split())
+                self.items.append(li)
+                self._current_li = None
+                self._li_depth = None
+            if self._ul_depth is not None and depth == self._ul_depth:
+                # Only the first matching list is the navigation tree.
+                self._ul_depth = -1
+            if self._container_depth is not None and depth == self._container_depth and self._ul_depth is None:
+                self._container_depth = None
+            if popped == tag:
+                break
+
+    def handle_data(self, data):
+        if self._a_depth is not None and self._current_li is not None:
+            self._current_li["_text"].append(data)
+
+
+def extract_navigation_items(html):
+    """
+    Returns the DeepWiki sidebar entries as a list of
+    {"title": ..., "href": ..., "style": ...} dicts, or None if the nav tree is missing.
+    """
+    collector = _NavCollector()
+    collector.feed(html)
+    collector.close()
+    if not collector.found_nav:
+        return None
+    return collector.items
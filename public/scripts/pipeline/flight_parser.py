@@ -0,0 +1,146 @@
+# flight_parser.py
+# Incremental parser for the Next.js flight (RSC) stream pushed through self.__next_f
+
+import base64
+import json
+import re
+
+PUSH_CALL = "self.__next_f.push("
+
+# Row tags whose payload is "<hex byte length>,<bytes>" instead of newline terminated.
+# 'T' is text; the others are typed-array/binary rows from newer React versions.
+LENGTH_PREFIXED_TAGS = frozenset(b"TAOoUSsLlGgMmV")
+_ROW_LENGTH_RE = re.compile(rb"([0-9a-fA-F]{1,8}),")
+_MAX_LENGTH_HEADER = 9 # 8 hex digits + ','
+
+_json_decoder = json.JSONDecoder()
+
+
+def iter_push_payloads(script_body):
+    """
+    Yields the decoded argument of every `self.__next_f.push([...])` call in a script body,
+    e.g. [0], [1, "..."], [3, "<base64>"]. Arguments that are not plain JSON are skipped.
+    """
+    pos = script_body.find(PUSH_CALL)
+    while pos != -1:
+        start = pos + len(PUSH_CALL)
+        while start < len(script_body) and script_body[start].isspace():
+            start += 1
+        try:
+            payload, end = _json_decoder.raw_decode(script_body, start)
+        except json.JSONDecodeError:
+            end = start
+        else:
+            if isinstance(payload, list) and payload:
+                yield payload
+        pos = script_body.find(PUSH_CALL, end)
+
+
+class FlightStreamParser:
+    """
+    Reassembles flight rows ("<hex id>:<tag><data>") from a stream that arrives in arbitrary pieces,
+    as Next.js splits it across several `push` calls. Text rows ("<id>:T<hex byte length>,<text>")
+    are yielded once complete; other rows are skipped.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._row_colon = None # offset of the ':' of the row currently being assembled
+        self._search_from = 0 # where to resume scanning, so partial rows are not rescanned
+        self.text_rows_seen = 0
+
+    def feed_push(self, payload):
+        """Feeds one decoded push argument; returns the text rows it completes."""
+        kind = payload[0]
+        if kind == 1 and len(payload) > 1 and isinstance(payload[1], str):
+            return self.feed(payload[1].encode("utf-8", "surrogatepass"))
+        if kind == 3 and len(payload) > 1 and isinstance(payload[1], str):
+            return self.feed(base64.b64decode(payload[1]))
+        return []
+
+    def feed(self, data):
+        """Feeds raw flight bytes (e.g. an RSC response body or a decoded push); returns completed text rows."""
+        self._buffer += data
+        buf = self._buffer
+        size = len(buf)
+        pos = 0
+        completed = []
+        while pos < size:
+            colon = self._row_colon
+            if colon is None:
+                colon = buf.find(b":", max(pos, self._search_from))
+                if colon == -1:
+                    self._search_from = size
+                    break
+                stray_newline = buf.find(b"\n", pos, colon)
+                if stray_newline != -1:
+                    # Not a row header; resynchronise on the next line.
+                    pos = stray_newline + 1
+                    self._search_from = pos
+                    continue
+                self._row_colon = colon
+                self._search_from = colon + 1
+            if colon + 1 >= size:
+                break
+            tag = buf[colon + 1]
+            if tag in LENGTH_PREFIXED_TAGS:
+                header = _ROW_LENGTH_RE.match(buf, colon + 2)
+                if header:
+                    end = header.end() + int(header.group(1), 16)
+                    if end > size:
+                        break # wait for the rest of the row
+                    if tag == ord("T"):
+                        self.text_rows_seen += 1
+                        completed.append(bytes(buf[header.end():end]).decode("utf-8", "replace"))
+                    pos = end
+                    self._row_colon = None
+                    self._search_from = pos
+                    continue
+                if tag == ord("T") and size - (colon + 2) < _MAX_LENGTH_HEADER and buf.find(b"\n", colon + 2) == -1:
+                    break # length header itself not complete yet
+            newline = buf.find(b"\n", max(colon + 1, self._search_from))
+            if newline == -1:
+                self._search_from = size
+                break
+            pos = newline + 1
+            self._row_colon = None
+            self._search_from = pos
+        if pos:
+            del buf[:pos]
+            self._search_from -= pos
+            if self._row_colon is not None:
+                self._row_colon -= pos
+        return completed
+
+
+def _looks_like_markdown_document(text):
+    return text.lstrip().startswith("# ")
+
+
+def iter_markdown_documents(script_bodies):
+    """
+    Consumes `self.__next_f.push` script bodies in document order and yields candidate markdown
+    documents (text rows starting with a '# ' heading) as soon as each one is complete.
+    If the scripts carry no row framing at all, pushed strings starting with '# ' are yielded instead.
+    """
+    parser = FlightStreamParser()
+    unframed_candidates = []
+    for script_body in script_bodies:
+        if not script_body:
+            continue
+        for payload in iter_push_payloads(script_body):
+            for text in parser.feed_push(payload):
+                if _looks_like_markdown_document(text):
+                    yield text
+            if parser.text_rows_seen == 0 and len(payload) > 1 and payload[0] == 1 \
+                    and isinstance(payload[1], str) and _looks_like_markdown_document(payload[1]):
+                unframed_candidates.append(payload[1])
+    if parser.text_rows_seen == 0:
+        yield from unframed_candidates
+
+
+def iter_markdown_documents_from_flight(flight_body):
+    """Yields candidate markdown documents from a raw flight response (e.g. a `RSC: 1` request)."""
+    for text in FlightStreamParser().feed(flight_body):
+        if _looks_like_markdown_document(text):
+            yield text
@@ -0,0 +1,106 @@
+# lean_load.py
+# "Lean load" profile for the headless scrapers (run_cdi.py, run_scrape_gitbook.py): skips the
+# subresources neither scraper reads (images, fonts, CSS, media, analytics) and counts what was skipped
+
+import threading
+from urllib.parse import urlparse
+
+# Playwright/CDP resource types that are never needed to read a page's content.
+DEFAULT_BLOCKED_RESOURCE_TYPES = ("image", "media", "font", "stylesheet")
+
+# Analytics, tracking and chat widget hosts (subdomains included). Their beacons also keep "networkidle" from settling.
+DEFAULT_BLOCKED_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "segment.com",
+    "segment.io",
+    "mixpanel.com",
+    "hotjar.com",
+    "intercom.io",
+    "intercomcdn.com",
+    "sentry.io",
+    "plausible.io",
+    "posthog.com",
+    "fullstory.com",
+    "clarity.ms",
+)
+
+# File extensions standing in for the resource types where blocking goes by URL pattern
+# (CDP Network.setBlockedURLs only matches URLs).
+RESOURCE_TYPE_EXTENSIONS = {
+    "image": ("png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico"),
+    "media": ("mp4", "webm", "mov", "mp3", "ogg", "wav", "m4a"),
+    "font": ("woff", "woff2", "ttf", "otf", "eot"),
+    "stylesheet": ("css",),
+}
+
+
+def domain_matches(host, domains):
+    """Returns the entry of `domains` that host is, or is a subdomain of, or None."""
+    host = (host or "").lower()
+    for domain in domains:
+        if host == domain or host.endswith("." + domain):
+            return domain
+    return None
+
+
+class LeanLoadProfile:
+    """
+    What a lean page load blocks: resource types and domains. The scrapers apply it with
+    Playwright request routing (block_reason) or CDP Network.setBlockedURLs (blocked_url_patterns),
+    and record the outcome in `stats`.
+    """
+
+    def __init__(self, resource_types=None, domains=None):
+        self.resource_types = tuple(DEFAULT_BLOCKED_RESOURCE_TYPES if resource_types is None else resource_types)
+        self.domains = tuple(d.lower().lstrip(".") for d in (DEFAULT_BLOCKED_DOMAINS if domains is None else domains))
+        self.stats = LeanLoadStats()
+
+    def block_reason(self, resource_type, url):
+        """'type:<resource type>' or 'domain:<domain>' if the request is to be blocked, else None."""
+        if resource_type in self.resource_types:
+            return f"type:{resource_type}"
+        domain = domain_matches(urlparse(url).hostname, self.domains)
+        return f"domain:{domain}" if domain else None
+
+    def blocked_url_patterns(self):
+        """URL patterns (with '*' wildcards) for CDP Network.setBlockedURLs."""
+        patterns = [f"*.{extension}" for resource_type in self.resource_types
+                    for extension in RESOURCE_TYPE_EXTENSIONS.get(resource_type, ())]
+        patterns += [f"*.{extension}?*" for resource_type in self.resource_types
+                     for extension in RESOURCE_TYPE_EXTENSIONS.get(resource_type, ())]
+        for domain in self.domains:
+            patterns += [f"*://{domain}/*", f"*.{domain}/*"]
+        return patterns
+
+    def describe(self):
+        return f"blocking {', '.join(self.resource_types) or 'no resource types'} and {len(self.domains)} domains"
+
+
+class LeanLoadStats:
+    """Thread-safe counts of blocked requests (by reason) and of the requests and bytes that were loaded."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.blocked = {} # reason -> request count
+        self.loaded_requests = 0
+        self.loaded_bytes = 0
+
+    def add_blocked(self, reason):
+        with self._lock:
+            self.blocked[reason] = self.blocked.get(reason, 0) + 1
+
+    def add_loaded(self, transferred_bytes):
+        with self._lock:
+            self.loaded_requests += 1
+            self.loaded_bytes += max(0, int(transferred_bytes or 0))
+
+    def summary(self):
+        blocked_total = sum(self.blocked.values())
+        total = blocked_total + self.loaded_requests
+        lines = [f"Lean load: blocked {blocked_total} of {total} requests; "
+                 f"{self.loaded_requests} loaded, {self.loaded_bytes / 1_000_000:.2f} MB transferred."]
+        for reason, count in sorted(self.blocked.items(), key=lambda kv: (-kv[1], kv[0])):
+            lines.append(f"  {reason}: {count}")
+        return "\n".join(lines)
@@ -0,0 +1,145 @@
+# link_graph.py
+# Persisted link graph of the site (page titles, page links and the title references of the generated pages)
+
+import json
+import os
+
+LINK_GRAPH_VERSION = 1
+
+def normalize_title(title):
+    """Titles are matched case-insensitively, like run_convert_internal_anchors.py always did."""
+    return title.lower().strip()
+
+
+class LinkGraph:
+    """
+    The site's link graph, kept in a JSON file between runs:
+
+      pages             {deepwiki_href: {"title", "path", "links": [astro paths it links to], "written"}}
+                        from CDI and SPBCP; "written" is the mtime of the page's last write by SPBCP
+      anchor_refs       {astro path: {"file", "written", "stat", "titles"}}: the titles each generated page's
+                        anchor links refer to, and the page version they were read from (run_convert_internal_anchors.py)
+      converted_titles  the title map the anchor links were last converted with
+
+    The title map and the reverse indexes (pages linking to a path, pages referring to a title) are
+    derived from these; save() also writes them out as "titles", "linked_from" and "title_refs".
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+        self.anchor_refs = {}
+        self.converted_titles = None
+        self._previous_pages = {}
+        self._indexes = None
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    loaded = json.load(f)
+                if loaded.get("version") == LINK_GRAPH_VERSION:
+                    self.pages = loaded["pages"]
+                    self.anchor_refs = loaded["anchor_refs"]
+                    self.converted_titles = loaded["converted_titles"]
+                else:
+                    print(f"Ignoring link graph with unsupported version at {path}.")
+            except (OSError, json.JSONDecodeError, KeyError) as e:
+                print(f"Warning: Could not read link graph {path}: {e}. Starting with an empty graph.")
+
+    # --- Site map (CDI, SPBCP) ---
+
+    def update_site_map(self, pages):
+        """Replaces the pages with (deepwiki_href, page_data) pairs."""
+        self.begin_site_map()
+        for deepwiki_href, page_data in pages:
+            self.add_page(deepwiki_href, page_data)
+
+    def begin_site_map(self):
+        """Starts replacing the pages; add_page() then adds them one by one, keeping what SPBCP recorded for pages that did not move."""
+        self._previous_pages = self.pages
+        self.pages = {}
+        self._indexes = None
+
+    def add_page(self, deepwiki_href, page_data):
+        previous_entry = self._previous_pages.get(deepwiki_href)
+        links = []
+        for link in page_data.get("resolved_links", []):
+            if link["context"] == "internal_page_link_from_content_body":
+                target_path = link["href"].split("#", 1)[0]
+                if target_path and target_path not in links:
+                    links.append(target_path)
+        entry = {"title": page_data.get("title"), "path": page_data.get("target_astro_path"), "links": links}
+        if previous_entry and previous_entry.get("path") == entry["path"] and "written" in previous_entry:
+            entry["written"] = previous_entry["written"]
+        self.pages[deepwiki_href] = entry
+        self._indexes = None
+
+    def set_written(self, deepwiki_href, written):
+        self.pages[deepwiki_href]["written"] = written
+
+    # --- Anchor references (run_convert_internal_anchors.py) ---
+
+    def set_anchor_refs(self, astro_path, entry):
+        self.anchor_refs[astro_path] = entry
+        self._indexes = None
+
+    def remove_anchor_refs(self, astro_path):
+        if self.anchor_refs.pop(astro_path, None) is not None:
+            self._indexes = None
+
+    def changed_titles(self):
+        """Titles whose Astro path was added, moved or removed since the anchor links were last converted."""
+        current, previous = self.titles(), self.converted_titles or {}
+        return {title for title in current.keys() | previous.keys() if current.get(title) != previous.get(title)}
+
+    # --- Queries ---
+
+    def _build_indexes(self):
+        if self._indexes is None:
+            titles, by_path, linked_from, title_refs = {}, {}, {}, {}
+            for deepwiki_href, entry in self.pages.items():
+                if entry["title"] and entry["path"]:
+                    titles[normalize_title(entry["title"])] = entry["path"] # later pages win, as in the JSON-based map
+                if entry["path"]:
+                    by_path.setdefault(entry["path"], deepwiki_href)
+                    for target_path in entry["links"]:
+                        linked_from.setdefault(target_path, []).append(entry["path"])
+            for astro_path, refs in self.anchor_refs.items():
+                for title in refs["titles"]:
+                    title_refs.setdefault(title, []).append(astro_path)
+            self._indexes = (titles, by_path, linked_from, title_refs)
+        return self._indexes
+
+    def titles(self):
+        """{lowercase title: astro path}, the map run_convert_internal_anchors.py converts links with."""
+        return self._build_indexes()[0]
+
+    def page_for_path(self, astro_path):
+        """The page entry built to astro_path, or None."""
+        deepwiki_href = self._build_indexes()[1].get(astro_path)
+        return self.pages[deepwiki_href] if deepwiki_href else None
+
+    def pages_linking_to(self, astro_path):
+        """Astro paths of the pages whose content links to astro_path."""
+        return self._build_indexes()[2].get(astro_path, [])
+
+    def pages_referring_to_title(self, title):
+        """Astro paths of the generated pages with anchor links whose text is this title."""
+        return self._build_indexes()[3].get(normalize_title(title), [])
+
+    # --- Persistence ---
+
+    def save(self):
+        titles, _, linked_from, title_refs = self._build_indexes()
+        data = {
+            "version": LINK_GRAPH_VERSION,
+            "pages": self.pages,
+            "anchor_refs": self.anchor_refs,
+            "converted_titles": self.converted_titles,
+            "titles": titles,
+            "linked_from": linked_from,
+            "title_refs": title_refs,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
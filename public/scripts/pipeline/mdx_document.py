@@ -0,0 +1,207 @@
+# mdx_document.py
+# Span-based model of an .mdx page, parsed once and shared by the post-processing transforms
+
+import io
+import re
+from collections import namedtuple
+
+_TITLE_RE = re.compile(r'^\s*title:\s*["\']?(.*?)["\']?\s*$', re.IGNORECASE)
+_HEADING_RE = re.compile(r'(#{1,6})\s+(.+)')
+_FENCE_RE = re.compile(r'(`{3,}|~{3,})(.*)')
+# Start of a line that may be a fence, a heading or an import (leading whitespace as stripped by str.strip)
+_BLOCK_LINE_RE = re.compile(r'^[^\S\n]*(?:`{3}|~{3}|#|import )', re.MULTILINE)
+# A JSX component tag (<Name ...>, <Name ... />, </Name>; quoted attribute values may contain '>')
+# or a markdown link. Tags are matched first at a position, so links inside attributes are not reported.
+_INLINE_TOKEN_RE = re.compile(
+    r'(?P<tag><(?P<closing>/?)(?P<name>[A-Z][\w.]*)(?:[^<>"\']|"[^"]*"|\'[^\']*\')*>)'
+    r'|(?P<link>\[(?P<text>[^\[\]]*)\]\((?P<href>[^)]*)\))'
+)
+
+Frontmatter = namedtuple("Frontmatter", "start end body_start body_end title")
+ImportLine = namedtuple("ImportLine", "start end in_frontmatter")
+CodeBlock = namedtuple("CodeBlock", "start end info")
+Component = namedtuple("Component", "start end name closing self_closing")
+Heading = namedtuple("Heading", "start end level text")
+
+def _line_end(text, line_start):
+    """Offset just past the '\n' ending the line at line_start (lines split like f.readlines())."""
+    newline = text.find('\n', line_start)
+    return len(text) if newline == -1 else newline + 1
+
+class Link(namedtuple("Link", "start end text href is_image")):
+    """A markdown [text](href) (or ![alt](src)) link; start/end cover the whole link, without the '!'."""
+
+    @property
+    def href_start(self):
+        return self.end - 1 - len(self.href)
+
+    @property
+    def href_end(self):
+        return self.end - 1
+
+
+class MdxDocument:
+    """
+    An .mdx page as text plus the spans the fixers care about, found in one pass:
+
+      frontmatter  the leading '---' block (with its title), or None
+      imports      'import ...' lines, in the frontmatter (misplaced) or the page body
+      code_blocks  fenced code (``` or ~~~, unclosed fences run to the end)
+      components   JSX component tags, e.g. <SourceLink ... />
+      headings     ATX headings outside frontmatter and code
+      links        [text](href) links outside frontmatter, code and component tags
+
+    All spans are (start, end) character offsets into `text`; line spans include the newline.
+    Transforms edit through apply_edits(), after which the spans are re-parsed on next access.
+    """
+
+    def __init__(self, text):
+        self._text = text
+        self._parsed = False
+
+    @property
+    def text(self):
+        return self._text
+
+    def _ensure_parsed(self):
+        if not self._parsed:
+            self._parse()
+            self._parsed = True
+
+    def _parse(self):
+        text = self._text
+        self._frontmatter = None
+        self._imports = []
+        self._code_blocks = []
+        self._components = []
+        self._headings = []
+        self._links = []
+        self._prose_ranges = []
+
+        body_start = 0
+        first_line_end = _line_end(text, 0)
+        if text[:first_line_end].strip() == '---':
+            title = None
+            frontmatter_imports = []
+            line_start = first_line_end
+            while line_start < len(text):
+                line_end = _line_end(text, line_start)
+                stripped = text[line_start:line_end].strip()
+                if stripped == '---':
+                    self._frontmatter = Frontmatter(0, line_end, first_line_end, line_start, title)
+                    self._imports = frontmatter_imports
+                    body_start = line_end
+                    break
+                if stripped.startswith('import '):
+                    frontmatter_imports.append(ImportLine(line_start, line_end, True))
+                elif title is None:
+                    title_match = _TITLE_RE.match(stripped)
+                    if title_match:
+                        title = title_match.group(1).strip()
+                line_start = line_end
+
+        # Only lines that can open/close a fence, or be a heading or an import, are looked at individually.
+        prose_start = body_start
+        fence = None # (marker char, marker length, block start, info) while inside a fenced block
+        for candidate in _BLOCK_LINE_RE.finditer(text, body_start):
+            line_start = candidate.start()
+            line_end = _line_end(text, line_start)
+            stripped = text[line_start:line_end].strip()
+            if fence is not None:
+                if stripped.startswith(fence[0] * fence[1]) and not stripped.lstrip(fence[0]):
+                    self._code_blocks.append(CodeBlock(fence[2], line_end, fence[3]))
+                    fence = None
+                    prose_start = line_end
+                continue
+            fence_match = _FENCE_RE.match(stripped)
+            if fence_match:
+                if not (fence_match.group(1)[0] == '`' and '`' in fence_match.group(2)):
+                    fence = (fence_match.group(1)[0], len(fence_match.group(1)), line_start, fence_match.group(2).strip())
+                    self._add_prose_range(prose_start, line_start)
+            elif stripped.startswith('import '):
+                self._imports.append(ImportLine(line_start, line_end, False))
+            elif stripped.startswith('#'):
+                heading_match = _HEADING_RE.fullmatch(stripped)
+                if heading_match:
+                    self._headings.append(Heading(line_start, line_end, len(heading_match.group(1)), heading_match.group(2).strip()))
+        if fence is not None:
+            self._code_blocks.append(CodeBlock(fence[2], len(text), fence[3]))
+        else:
+            self._add_prose_range(prose_start, len(text))
+
+    def _add_prose_range(self, start, end):
+        if start >= end:
+            return
+        self._prose_ranges.append((start, end))
+        text = self._text
+        for match in _INLINE_TOKEN_RE.finditer(text, start, end):
+            token_start, token_end = match.span()
+            if match.lastgroup == 'tag':
+                self._components.append(Component(token_start, token_end, match.group('name'),
+                                                  bool(match.group('closing')), text[token_end - 2] == '/'))
+            else:
+                is_image = token_start > 0 and text[token_start - 1] == '!'
+                self._links.append(Link(token_start, token_end, match.group('text'), match.group('href'), is_image))
+
+    # --- Queries ---
+
+    @property
+    def lines(self):
+        return io.StringIO(self._text).readlines() # split on '\n' only, like f.readlines()
+
+    @property
+    def frontmatter(self):
+        self._ensure_parsed()
+        return self._frontmatter
+
+    @property
+    def imports(self):
+        self._ensure_parsed()
+        return self._imports
+
+    @property
+    def code_blocks(self):
+        self._ensure_parsed()
+        return self._code_blocks
+
+    @property
+    def components(self):
+        self._ensure_parsed()
+        return self._components
+
+    @property
+    def headings(self):
+        self._ensure_parsed()
+        return self._headings
+
+    @property
+    def links(self):
+        self._ensure_parsed()
+        return self._links
+
+    def prose_ranges(self):
+        """(start, end) ranges of the page body outside fenced code, in order."""
+        self._ensure_parsed()
+        return self._prose_ranges
+
+    # --- Editing ---
+
+    def apply_edits(self, edits):
+        """
+        Applies (start, end, replacement) edits, all relative to the current text, in one pass.
+        Edits must not overlap; insertions use start == end. Returns the number of edits applied.
+        """
+        if not edits:
+            return 0
+        parts = []
+        position = 0
+        for start, end, replacement in sorted(edits, key=lambda edit: (edit[0], edit[1])):
+            if start < position:
+                raise ValueError(f"Overlapping MDX edits at offset {start}")
+            parts.append(self._text[position:start])
+            parts.append(replacement)
+            position = end
+        parts.append(self._text[position:])
+        self._text = "".join(parts)
+        self._parsed = False
+        return len(edits)
@@ -0,0 +1,85 @@
+# page_pool.py
+# Runs independent per-page work (SPBCP, the .mdx fixers) in a process pool with ordered output
+
+import contextlib
+import io
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+
+def add_jobs_argument(parser, default=1):
+    """Adds the --jobs option to an argparse parser."""
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=default, metavar="N",
+        help=f"Number of worker processes (default: {default}; 1 = serial, 0 = one per CPU core)."
+    )
+
+def resolve_jobs(jobs):
+    if jobs is None or jobs == 1:
+        return 1
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+_NO_CONTEXT = object()
+_worker_context = _NO_CONTEXT
+
+def _set_worker_context(context):
+    global _worker_context
+    _worker_context = context
+
+def _run_captured(func, args):
+    """Runs func(*args) with its printed output captured; returns (result, output, error)."""
+    if _worker_context is not _NO_CONTEXT:
+        args = (_worker_context,) + tuple(args)
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            result = func(*args)
+        return result, output.getvalue(), None
+    except Exception as e:
+        return None, output.getvalue(), f"{type(e).__name__}: {e}"
+
+def run_ordered(func, tasks, jobs=1, context=_NO_CONTEXT):
+    """
+    Runs func(*task) for every task and yields (task, result, error) in task order; error is None
+    or a one-line description of the exception the task raised. If `context` is given (e.g. a
+    lookup table every task needs), it is sent to each worker once and passed as func's first argument.
+
+    With jobs > 1 the tasks run in a process pool (func must be a module-level function).
+    What each task prints is captured and written out in task order, so the log is the same
+    as a serial run whatever order the workers finish in.
+    """
+    tasks = list(tasks)
+    jobs = min(resolve_jobs(jobs), len(tasks))
+    executor = None
+    if jobs > 1:
+        if context is _NO_CONTEXT: # the sentinel would arrive as a different object in spawned workers
+            executor = ProcessPoolExecutor(max_workers=jobs)
+        else:
+            executor = ProcessPoolExecutor(max_workers=jobs, initializer=_set_worker_context, initargs=(context,))
+        outcomes = executor.map(_run_captured, itertools.repeat(func), tasks,
+                                chunksize=max(1, len(tasks) // (jobs * 4)))
+    else:
+        _set_worker_context(context)
+        outcomes = (_run_captured(func, task) for task in tasks)
+    try:
+        for task, (result, output, error) in zip(tasks, outcomes):
+            if output:
+                sys.stdout.write(output)
+            yield task, result, error
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        else:
+            _set_worker_context(_NO_CONTEXT)
+
+def print_errors(errors):
+    """Prints the per-file errors collected from run_ordered, as [(file, error)]."""
+    if not errors:
+        return
+    print(f"\n{len(errors)} file(s) failed:")
+    for path, error in errors:
+        print(f"  {path}: {error}")
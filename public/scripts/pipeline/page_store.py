@@ -0,0 +1,217 @@
+# page_store.py
+# SQLite-backed store for the CDI site map (pages, resolved links and mermaid diagrams)
+
+import json
+import os
+import sqlite3
+
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    deepwiki_href TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    title TEXT,
+    title_lower TEXT,
+    full_deepwiki_url TEXT,
+    level INTEGER,
+    target_astro_path TEXT,
+    main_markdown_content TEXT,
+    potential_frontmatter TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pages_title_lower ON pages (title_lower);
+CREATE INDEX IF NOT EXISTS idx_pages_target_astro_path ON pages (target_astro_path);
+CREATE INDEX IF NOT EXISTS idx_pages_position ON pages (position);
+
+CREATE TABLE IF NOT EXISTS links (
+    page_href TEXT NOT NULL REFERENCES pages (deepwiki_href) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    text TEXT,
+    href TEXT,
+    original_deepwiki_href TEXT,
+    context TEXT,
+    PRIMARY KEY (page_href, position)
+);
+CREATE INDEX IF NOT EXISTS idx_links_href ON links (href);
+CREATE INDEX IF NOT EXISTS idx_links_original_href ON links (original_deepwiki_href);
+
+CREATE TABLE IF NOT EXISTS diagrams (
+    page_href TEXT NOT NULL REFERENCES pages (deepwiki_href) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    source TEXT,
+    PRIMARY KEY (page_href, position)
+);
+"""
+
+
+class PageStore:
+    """
+    Indexed alternative to ingested_deepwiki_data.json. Pages are keyed by their DeepWiki href
+    and keep the site map order; export_json() writes the exact JSON layout CDI used to produce.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- Writing ---
+
+    def upsert_page(self, deepwiki_href, page_data, position=None):
+        """Inserts or replaces one page together with its links and diagrams."""
+        with self.conn:
+            self._upsert_page(deepwiki_href, page_data, position)
+
+    def _upsert_page(self, deepwiki_href, page_data, position):
+        if position is None:
+            row = self.conn.execute("SELECT position FROM pages WHERE deepwiki_href = ?", (deepwiki_href,)).fetchone()
+            if row is None:
+                row = self.conn.execute("SELECT COALESCE(MAX(position) + 1, 0) AS position FROM pages").fetchone()
+            position = row["position"]
+        title = page_data.get("title")
+        self.conn.execute(
+            "INSERT INTO pages (deepwiki_href, position, title, title_lower, full_deepwiki_url, level, "
+            "target_astro_path, main_markdown_content, potential_frontmatter) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (deepwiki_href) DO UPDATE SET position = excluded.position, title = excluded.title, "
+            "title_lower = excluded.title_lower, full_deepwiki_url = excluded.full_deepwiki_url, level = excluded.level, "
+            "target_astro_path = excluded.target_astro_path, main_markdown_content = excluded.main_markdown_content, "
+            "potential_frontmatter = excluded.potential_frontmatter",
+            (
+                deepwiki_href, position, title, title.lower().strip() if title else None,
+                page_data.get("full_deepwiki_url"), page_data.get("level"), page_data.get("target_astro_path"),
+                page_data.get("main_markdown_content"),
+                json.dumps(page_data.get("potential_frontmatter", {}), ensure_ascii=False),
+            ),
+        )
+        self.conn.execute("DELETE FROM links WHERE page_href = ?", (deepwiki_href,))
+        self.conn.executemany(
+            "INSERT INTO links (page_href, position, text, href, original_deepwiki_href, context) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (deepwiki_href, i, link.get("text"), link.get("href"), link.get("original_deepwiki_href"), link.get("context"))
+                for i, link in enumerate(page_data.get("resolved_links", []))
+            ],
+        )
+        self.conn.execute("DELETE FROM diagrams WHERE page_href = ?", (deepwiki_href,))
+        self.conn.executemany(
+            "INSERT INTO diagrams (page_href, position, source) VALUES (?, ?, ?)",
+            [(deepwiki_href, i, source) for i, source in enumerate(page_data.get("mermaid_diagrams", []))],
+        )
+
+    def upsert_pages(self, pages):
+        """Upserts (deepwiki_href, page_data, position) triples in one transaction."""
+        with self.conn:
+            for deepwiki_href, page_data, position in pages:
+                self._upsert_page(deepwiki_href, page_data, position)
+
+    def replace_site_map(self, site_map):
+        """Upserts every page of a CDI site map (in order) and drops pages that are no longer in it."""
+        with self.conn:
+            for position, (deepwiki_href, page_data) in enumerate(site_map.items()):
+                self._upsert_page(deepwiki_href, page_data, position)
+            stale = [row["deepwiki_href"] for row in self.conn.execute("SELECT deepwiki_href FROM pages")
+                     if row["deepwiki_href"] not in site_map]
+            self.conn.executemany("DELETE FROM pages WHERE deepwiki_href = ?", [(href,) for href in stale])
+
+    # --- Reading ---
+
+    def _page_from_row(self, row):
+        deepwiki_href = row["deepwiki_href"]
+        links = self.conn.execute(
+            "SELECT text, href, original_deepwiki_href, context FROM links WHERE page_href = ? ORDER BY position",
+            (deepwiki_href,),
+        ).fetchall()
+        diagrams = self.conn.execute(
+            "SELECT source FROM diagrams WHERE page_href = ? ORDER BY position", (deepwiki_href,)
+        ).fetchall()
+        return {
+            "original_deepwiki_href": deepwiki_href,
+            "title": row["title"],
+            "full_deepwiki_url": row["full_deepwiki_url"],
+            "level": row["level"],
+            "target_astro_path": row["target_astro_path"],
+            "main_markdown_content": row["main_markdown_content"],
+            "resolved_links": [dict(link) for link in links],
+            "mermaid_diagrams": [d["source"] for d in diagrams],
+            "potential_frontmatter": json.loads(row["potential_frontmatter"] or "{}"),
+        }
+
+    def page_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def get_page(self, deepwiki_href):
+        row = self.conn.execute("SELECT * FROM pages WHERE deepwiki_href = ?", (deepwiki_href,)).fetchone()
+        return self._page_from_row(row) if row else None
+
+    def iter_pages(self):
+        """Yields (deepwiki_href, page_data) in site map order, one page at a time."""
+        for row in self.conn.execute("SELECT * FROM pages ORDER BY position"):
+            yield row["deepwiki_href"], self._page_from_row(row)
+
+    def find_pages_by_title(self, title):
+        rows = self.conn.execute(
+            "SELECT * FROM pages WHERE title_lower = ? ORDER BY position", (title.lower().strip(),)
+        ).fetchall()
+        return [self._page_from_row(row) for row in rows]
+
+    def find_page_by_astro_path(self, target_astro_path):
+        row = self.conn.execute("SELECT * FROM pages WHERE target_astro_path = ?", (target_astro_path,)).fetchone()
+        return self._page_from_row(row) if row else None
+
+    def title_to_astro_path_map(self):
+        """{lowercase title: target_astro_path}, as built by run_convert_internal_anchors.py from the JSON."""
+        rows = self.conn.execute(
+            "SELECT title_lower, target_astro_path FROM pages "
+            "WHERE title IS NOT NULL AND title != '' AND target_astro_path IS NOT NULL AND target_astro_path != '' "
+            "ORDER BY position"
+        )
+        return {row["title_lower"]: row["target_astro_path"] for row in rows}
+
+    def pages_linking_to(self, target):
+        """
+        Returns [(page title, page href, link dict)] for every resolved link pointing at `target`
+        (or an anchor within it), which may be an Astro path, a DeepWiki href or a source file path/URL.
+        """
+        rows = self.conn.execute(
+            "SELECT p.title, p.deepwiki_href, l.text, l.href, l.original_deepwiki_href, l.context "
+            "FROM links l JOIN pages p ON p.deepwiki_href = l.page_href "
+            "WHERE l.href = ? OR (l.href >= ? AND l.href < ?) OR l.original_deepwiki_href = ? "
+            "ORDER BY p.position, l.position",
+            # The range matches "<target>#<anchor>" while still using the href index ('$' follows '#').
+            (target, target + "#", target + "$", target),
+        ).fetchall()
+        return [
+            (row["title"], row["deepwiki_href"],
+             {"text": row["text"], "href": row["href"], "original_deepwiki_href": row["original_deepwiki_href"], "context": row["context"]})
+            for row in rows
+        ]
+
+    # --- Export ---
+
+    def export_json(self, json_path):
+        """Writes the store as ingested_deepwiki_data.json (same layout and formatting CDI used)."""
+        site_map = dict(self.iter_pages())
+        output_dir = os.path.dirname(json_path)
+        if output_dir and not os.path.exists(output_dir): os.makedirs(output_dir)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(site_map, f, indent=2, ensure_ascii=False)
+        return len(site_map)
+
+
+def load_configured_pages():
+    """Returns the ingested (deepwiki_href, page_data) pairs, from the page store if enabled, else from INGESTED_DATA_JSON_PATH."""
+    if config.PAGE_STORE_ENABLED and os.path.exists(config.PAGE_STORE_PATH):
+        with PageStore(config.PAGE_STORE_PATH) as store:
+            return list(store.iter_pages())
+    with open(config.INGESTED_DATA_JSON_PATH, "r", encoding="utf-8") as f:
+        return list(json.load(f).items())
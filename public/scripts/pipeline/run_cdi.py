@@ -1,20 +1,38 @@
 # run_cdi.py
 # Comprehensive DeepWiki Ingestor (Corrected "Relevant source files" parsing)
 
+import argparse
+import base64
 import config # Import project configurations
 import json
 import os
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from cdi_cache import IngestionCache, content_hash
+from deepwiki_http import (
+    DeepWikiHttpClient,
+    extract_navigation_items,
+    extract_script_bodies,
+)
+from flight_parser import iter_markdown_documents, iter_markdown_documents_from_flight
+from lean_load import LeanLoadProfile
+from link_graph import LinkGraph
+from page_store import PageStore
+from scrape_archive import ArchivedBrowser, add_archive_arguments, open_archive_from_args
+
+# Selenium is only required for the "selenium" backend (or as fallback for the HTTP backend).
+try:
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options as ChromeOptions
+    from selenium.webdriver.chrome.service import Service as ChromeService
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException
+except ImportError:
+    webdriver = None
 
 # BeautifulSoup is not strictly needed for the corrected logic below,
 # but keeping the import if other parts might use it or for future.
@@ -24,21 +42,296 @@ except ImportError:
     BeautifulSoup = None
     # print("BeautifulSoup not installed. Some HTML parsing features in markdown might be limited.")
 
+NAV_CONTAINER_SELECTOR = "div.border-r-border[class*='md:sticky']"
+
+# Reads the whole sidebar in one WebDriver round trip. Returns null while the container is not
+# rendered yet (so it can be polled), {items: null} if the list is missing, else {items: [...]}.
+READ_NAV_TREE_JS = """
+const container = document.querySelector(arguments[0]);
+if (!container) return null;
+const ul = container.querySelector('ul.flex-1');
+if (!ul) return {items: null};
+return {items: Array.from(ul.children).filter(li => li.tagName === 'LI').map(li => {
+    const a = li.querySelector('a');
+    return a ? {title: a.innerText, href: a.href, style: li.getAttribute('style')} : null;
+})};
+"""
+
+# Returns the bodies of all Next.js flight scripts in one WebDriver round trip.
+READ_NEXT_F_SCRIPTS_JS = """
+return Array.from(document.scripts, s => s.innerHTML).filter(t => t && t.includes('self.__next_f.push'));
+"""
+
+# Readiness probe shared by the "polling" and "mutation_observer" strategies, a port of flight_parser's
+# iter_markdown_documents: the __next_f pushes are read in document order as one flight stream, and the page
+# is ready once it holds a complete text row ("<id>:T<hex byte length>,<text>") with a '# ' heading of at
+# least minLength characters, so a row header and markdown sharing a push, or markdown split across several
+# pushes, are detected as they are parsed. Without any text rows, a pushed string with a heading counts.
+# tests/test_cdi_payload_scanner.py runs it in Node and compares it with flight_parser.
+PAGE_PAYLOAD_SCANNER_JS = r"""
+const PUSH_CALL = 'self.__next_f.push(';
+const LENGTH_PREFIXED_TAGS = new Set(Array.from('TAOoUSsLlGgMmV', c => c.charCodeAt(0)));
+const COLON = 58, NEWLINE = 10, T_TAG = 84;
+const isMarkdown = (text, minLength) => /^\s*# /.test(text) && text.trim().length >= minLength;
+const decodePushArgument = (body, start) => {
+    // Returns [kind, string, end] for a `push([<kind>, "<string>"])` argument at `start`, else null.
+    const match = /^\s*\[\s*(\d+)\s*,\s*"/.exec(body.slice(start, start + 32));
+    if (!match) return null;
+    let end = start + match[0].length;
+    while (end < body.length && body[end] !== '"') end += body[end] === '\\' ? 2 : 1;
+    try { return [Number(match[1]), JSON.parse(body.slice(start + match[0].length - 1, end + 1)), end + 1]; } catch (e) { return null; }
+};
+const makePayloadScanner = minLength => {
+    const encoder = new TextEncoder(), decoder = new TextDecoder();
+    let buf = new Uint8Array(0), rowColon = null, textRows = 0, found = false, unframedFound = false;
+    const feed = data => {
+        const merged = new Uint8Array(buf.length + data.length);
+        merged.set(buf); merged.set(data, buf.length); buf = merged;
+        let pos = 0;
+        while (pos < buf.length) {
+            let colon = rowColon;
+            if (colon === null) {
+                colon = buf.indexOf(COLON, pos);
+                if (colon === -1) break;
+                const strayNewline = buf.subarray(pos, colon).indexOf(NEWLINE);
+                if (strayNewline !== -1) { pos += strayNewline + 1; continue; } // not a row header
+                rowColon = colon;
+            }
+            if (colon + 1 >= buf.length) break;
+            const tag = buf[colon + 1];
+            if (LENGTH_PREFIXED_TAGS.has(tag)) {
+                let digitsEnd = colon + 2;
+                while (digitsEnd < buf.length && digitsEnd - colon - 2 < 8 && /[0-9a-fA-F]/.test(String.fromCharCode(buf[digitsEnd]))) digitsEnd++;
+                if (digitsEnd > colon + 2 && buf[digitsEnd] === 44) { // ','
+                    const end = digitsEnd + 1 + parseInt(decoder.decode(buf.subarray(colon + 2, digitsEnd)), 16);
+                    if (end > buf.length) break; // wait for the rest of the row
+                    if (tag === T_TAG) {
+                        textRows++;
+                        if (isMarkdown(decoder.decode(buf.subarray(digitsEnd + 1, end)), minLength)) found = true;
+                    }
+                    pos = end; rowColon = null;
+                    continue;
+                }
+                if (tag === T_TAG && buf.length - (colon + 2) < 9 && buf.indexOf(NEWLINE, colon + 2) === -1) break;
+            }
+            const newline = buf.indexOf(NEWLINE, colon + 1);
+            if (newline === -1) break;
+            pos = newline + 1; rowColon = null;
+        }
+        buf = buf.slice(pos);
+        if (rowColon !== null) rowColon -= pos;
+    };
+    return {
+        feedScript(body) {
+            let at = body.indexOf(PUSH_CALL);
+            while (at !== -1) {
+                const argument = decodePushArgument(body, at + PUSH_CALL.length);
+                if (argument && argument[0] === 1) {
+                    feed(encoder.encode(argument[1]));
+                    if (textRows === 0 && isMarkdown(argument[1], minLength)) unframedFound = true;
+                } else if (argument && argument[0] === 3) {
+                    feed(Uint8Array.from(atob(argument[1]), c => c.charCodeAt(0)));
+                }
+                at = body.indexOf(PUSH_CALL, argument ? argument[2] : at + PUSH_CALL.length);
+            }
+        },
+        ready: () => found || (textRows === 0 && unframedFound),
+    };
+};
+const isPushScript = node => node.tagName === 'SCRIPT' && node.text.includes(PUSH_CALL);
+"""
+
+# Returns [payload ready, document.readyState is 'complete'].
+PAGE_PAYLOAD_READY_JS = PAGE_PAYLOAD_SCANNER_JS + """
+const scanner = makePayloadScanner(arguments[0]);
+for (const script of document.scripts) { if (isPushScript(script)) scanner.feedScript(script.text); }
+return [scanner.ready(), document.readyState === 'complete'];
+"""
+
+# Async variant: resolves true as soon as an inserted script completes the payload (MutationObserver), or false
+# after timeoutMs, or graceMs after document.readyState is 'complete' if no payload has appeared by then.
+WAIT_FOR_PAGE_PAYLOAD_JS = PAGE_PAYLOAD_SCANNER_JS + """
+const minLength = arguments[0], timeoutMs = arguments[1], graceMs = arguments[2], done = arguments[arguments.length - 1];
+const scanner = makePayloadScanner(minLength);
+for (const script of document.scripts) { if (isPushScript(script)) scanner.feedScript(script.text); }
+if (scanner.ready()) { done(true); return; }
+const deadline = Date.now() + timeoutMs;
+let timer = null, observer = null;
+const finish = result => {
+    observer.disconnect(); clearTimeout(timer); document.removeEventListener('readystatechange', onReadyStateChange); done(result);
+};
+const startGrace = () => { clearTimeout(timer); timer = setTimeout(() => finish(false), Math.max(0, Math.min(graceMs, deadline - Date.now()))); };
+const onReadyStateChange = () => { if (document.readyState === 'complete') startGrace(); };
+observer = new MutationObserver(mutations => {
+    for (const mutation of mutations) {
+        for (const node of mutation.addedNodes) {
+            if (isPushScript(node)) scanner.feedScript(node.text);
+        }
+    }
+    if (scanner.ready()) finish(true);
+});
+observer.observe(document.documentElement, {childList: true, subtree: true});
+timer = setTimeout(() => finish(false), timeoutMs);
+document.addEventListener('readystatechange', onReadyStateChange);
+if (document.readyState === 'complete') startGrace();
+"""
+
+# Client-side route change to arguments[0] (a path) in the already loaded Next.js app:
+# clicks a link to it if one is rendered, else uses the router. Returns how, or null if it cannot.
+CLIENT_SIDE_NAVIGATE_JS = """
+const path = arguments[0];
+const link = Array.from(document.querySelectorAll('a[href]')).find(a => new URL(a.href, location.href).pathname === path);
+if (link) { link.click(); return 'link'; }
+if (window.next && window.next.router && typeof window.next.router.push === 'function') { window.next.router.push(path); return 'router'; }
+return null;
+"""
+
+# Link grammars used by _extract_page_links. Each is matched (anchored) at a '[' of the page,
+# so the page is walked once instead of running one finditer pass per link context.
+RELEVANT_SOURCES_DETAILS_RE = re.compile(
+    r"<details>\s*<summary>Relevant source files</summary>(.*?)<\/details>", re.IGNORECASE | re.DOTALL
+)
+COLLAPSIBLE_LINK_RE = re.compile(r"\[([^\]]+)\]\(([^)]+)\)") # preceded by "-\s*" inside the details block
+INLINE_SOURCE_LINK_RE = re.compile(r"\[([^\]]+?)\]\(([^)]*?)\)") # on "Sources:" lines
+INTERNAL_LINK_RE = re.compile(r"\[([^!][^\]]*)\]\(([^)]+)\)")
+MERMAID_OPEN, MERMAID_CLOSE = "```mermaid\n", "\n```"
+
+# Phases recorded in the checkpoint file, in run order.
+CHECKPOINT_VERSION = 1
+CHECKPOINT_PHASES = ("navigation", "bulk_content", "content", "links")
+
 class ComprehensiveDeepWikiIngestor:
-    def __init__(self):
+    def __init__(self, resume=False, archive=None):
         self.site_map = {}
+        self.archive = archive # ScrapeArchive to record to / replay from, or None
         self.link_resolution_map = {}
-        self.driver = self._init_driver()
+        self.driver_round_trips = {} # WebDriver command name -> [count, total seconds]
+        self.page_wait_times = {} # URL -> seconds spent waiting for the page to become ready
+        self._stats_lock = threading.Lock()
+        self._flight_responses = {} # id(driver) -> flight requests seen in its performance log (client-side mode)
+        self._performance_log_state = {} # id(driver) -> requests seen in its performance log, for the lean load stats
+        self.lean_load = None
+        if config.LEAN_LOAD_ENABLED:
+            self.lean_load = LeanLoadProfile(config.LEAN_LOAD_BLOCKED_RESOURCE_TYPES, config.LEAN_LOAD_BLOCKED_DOMAINS)
+        self.driver = None
+        self.http_client = None
+        self._last_http_page = (None, None, None)
+        self.selenium_fallback = bool(config.CDI_SELENIUM_FALLBACK)
+        self.backend = (config.CDI_INGESTION_BACKEND or "selenium").lower()
+        if self.backend == "http":
+            print("Using HTTP ingestion backend (no browser).")
+            self.http_client = DeepWikiHttpClient(timeout=config.CDI_HTTP_TIMEOUT, user_agent=config.CDI_HTTP_USER_AGENT, archive=archive)
+        elif self.backend == "selenium":
+            self.driver = self._init_driver()
+        else:
+            raise ValueError(f"Unknown CDI_INGESTION_BACKEND: {config.CDI_INGESTION_BACKEND!r} (expected 'http' or 'selenium')")
         self.current_astro_parent_path_for_level = {}
+        self.cache = None
+        self.previous_site_map = {}
+        self.change_report = None
+        if config.CDI_INCREMENTAL:
+            self.cache = IngestionCache(config.CDI_CACHE_PATH)
+            self.previous_site_map = self._load_previous_site_map()
+        self.page_store = None # opened on the first page stored (PAGE_STORE_ENABLED)
+        self._site_map_positions = None
+        self.completed_phase = None # last checkpointed phase restored by --resume
+        if resume:
+            self._load_checkpoint()
+
+    @property
+    def _replaying(self):
+        return self.archive is not None and self.archive.replaying
+
+    def _load_checkpoint(self):
+        """Restores the site map and the last completed phase from CDI_CHECKPOINT_PATH."""
+        if not os.path.exists(config.CDI_CHECKPOINT_PATH):
+            print(f"No checkpoint found at {config.CDI_CHECKPOINT_PATH}. Starting a full run.")
+            return
+        try:
+            with open(config.CDI_CHECKPOINT_PATH, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not read checkpoint {config.CDI_CHECKPOINT_PATH} ({e}). Starting a full run.")
+            return
+        if checkpoint.get("version") != CHECKPOINT_VERSION or checkpoint.get("base_deepwiki_url") != config.BASE_DEEPWIKI_URL \
+                or checkpoint.get("phase") not in CHECKPOINT_PHASES:
+            print(f"Checkpoint at {config.CDI_CHECKPOINT_PATH} is for a different wiki or version. Starting a full run.")
+            return
+        self.site_map = checkpoint["site_map"]
+        self.link_resolution_map = checkpoint["link_resolution_map"]
+        self.completed_phase = checkpoint["phase"]
+        pages_with_content = sum(1 for page_data in self.site_map.values() if page_data.get("main_markdown_content"))
+        print(f"Resuming from checkpoint after phase '{self.completed_phase}': "
+              f"{len(self.site_map)} pages, {pages_with_content} with content.")
+
+    def _phase_completed(self, phase):
+        return self.completed_phase is not None and \
+            CHECKPOINT_PHASES.index(self.completed_phase) >= CHECKPOINT_PHASES.index(phase)
+
+    def save_checkpoint(self, phase):
+        """Writes the run's progress so a crashed run can continue with --resume (atomic replace)."""
+        checkpoint = {
+            "version": CHECKPOINT_VERSION,
+            "base_deepwiki_url": config.BASE_DEEPWIKI_URL,
+            "phase": phase,
+            "site_map": self.site_map,
+            "link_resolution_map": self.link_resolution_map,
+        }
+        tmp_path = f"{config.CDI_CHECKPOINT_PATH}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(checkpoint, f, ensure_ascii=False)
+            os.replace(tmp_path, config.CDI_CHECKPOINT_PATH)
+        except Exception as e: print(f"Warning: Could not write checkpoint {config.CDI_CHECKPOINT_PATH}: {e}")
+
+    def remove_checkpoint(self):
+        if os.path.exists(config.CDI_CHECKPOINT_PATH):
+            os.remove(config.CDI_CHECKPOINT_PATH)
+
+    def _load_previous_site_map(self):
+        """Loads the site map written by the previous run, whose unchanged entries can be reused."""
+        if not os.path.exists(config.INGESTED_DATA_JSON_PATH):
+            return {}
+        try:
+            with open(config.INGESTED_DATA_JSON_PATH, "r", encoding="utf-8") as f:
+                previous_site_map = json.load(f)
+            print(f"Loaded {len(previous_site_map)} pages from the previous run for incremental ingestion.")
+            return previous_site_map
+        except Exception as e:
+            print(f"Warning: Could not load previous ingested data ({e}). All pages will be processed.")
+            return {}
+
+    def _get_fallback_driver(self):
+        """Lazily starts Selenium when the HTTP backend needs the browser fallback."""
+        if self.driver is None:
+            if not self.selenium_fallback:
+                return None
+            print("Falling back to Selenium for pages the HTTP backend could not read.")
+            try:
+                self.driver = self._init_driver()
+            except Exception as e:
+                print(f"Selenium fallback unavailable ({e}). Continuing with HTTP only.")
+                self.selenium_fallback = False
+                return None
+        return self.driver
 
     def _init_driver(self):
+        if self._replaying:
+            print("Replaying archived browser payloads (no WebDriver started).")
+            return ArchivedBrowser()
         print("Initializing Selenium WebDriver...")
+        if webdriver is None:
+            raise ImportError("Selenium is not installed. Install it with 'pip install selenium' or set CDI_INGESTION_BACKEND = \"http\".")
         chrome_options = ChromeOptions()
         chrome_options.add_argument("--headless")
         chrome_options.add_argument("--disable-gpu")
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--window-size=1920,1080")
         chrome_options.add_argument('--log-level=3')
+        if config.CDI_SELENIUM_NAVIGATION == "client_side" or self.lean_load:
+            # Network events in the performance log let us pick up the flight (RSC) responses directly,
+            # and count the requests the lean load profile blocked.
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
 
         if config.BRAVE_EXECUTABLE_PATH and os.path.exists(config.BRAVE_EXECUTABLE_PATH):
             chrome_options.binary_location = config.BRAVE_EXECUTABLE_PATH
@@ -54,11 +347,63 @@ class ComprehensiveDeepWikiIngestor:
         try:
             driver = webdriver.Chrome(service=service, options=chrome_options)
             print("WebDriver initialized successfully.")
+            self._count_driver_round_trips(driver)
+            if self.lean_load:
+                self._apply_lean_load(driver)
+            # Async readiness scripts must be allowed to run for the whole readiness timeout.
+            driver.set_script_timeout(config.CDI_PAGE_READY_TIMEOUT + 5)
             return driver
         except Exception as e:
             print(f"Error initializing WebDriver: {e}")
             raise
 
+    def _apply_lean_load(self, driver):
+        """Blocks the lean load profile's resources in this browser session (CDP Network.setBlockedURLs)."""
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.lean_load.blocked_url_patterns()})
+            print(f"Lean load: {self.lean_load.describe()}.")
+        except Exception as e:
+            print(f"Warning: Could not apply the lean load profile ({e}). Pages are loaded in full.")
+
+    def _count_driver_round_trips(self, driver):
+        """Wraps `driver.execute`, through which every WebDriver/WebElement command passes, to time each round trip."""
+        original_execute = driver.execute
+
+        def counted_execute(driver_command, params=None):
+            start = time.perf_counter()
+            try:
+                return original_execute(driver_command, params)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._stats_lock:
+                    stats = self.driver_round_trips.setdefault(driver_command, [0, 0.0])
+                    stats[0] += 1
+                    stats[1] += elapsed
+
+        driver.execute = counted_execute
+
+    def print_round_trip_stats(self):
+        if self.driver_round_trips:
+            total_count = sum(count for count, _ in self.driver_round_trips.values())
+            total_seconds = sum(seconds for _, seconds in self.driver_round_trips.values())
+            print(f"WebDriver round trips: {total_count} ({total_seconds:.2f}s)")
+            for command, (count, seconds) in sorted(self.driver_round_trips.items(), key=lambda kv: -kv[1][1]):
+                print(f"  {command}: {count} ({seconds:.2f}s)")
+        if self.http_client:
+            print(f"HTTP requests: {self.http_client.requests_made}")
+        if self.lean_load and (self.lean_load.stats.blocked or self.lean_load.stats.loaded_requests):
+            print(self.lean_load.stats.summary())
+        if self.page_wait_times:
+            total_wait = sum(self.page_wait_times.values())
+            slowest_url, slowest_wait = max(self.page_wait_times.items(), key=lambda kv: kv[1])
+            strategy = config.CDI_PAGE_READINESS_STRATEGY
+            if config.CDI_SELENIUM_NAVIGATION == "client_side":
+                strategy += ", client-side navigation"
+            print(f"Page readiness ({strategy}): {len(self.page_wait_times)} pages, "
+                  f"{total_wait:.2f}s waiting in total, {total_wait / len(self.page_wait_times):.2f}s average, "
+                  f"slowest {slowest_wait:.2f}s ({slowest_url})")
+
     def _sanitize_title_for_slug(self, title_str):
         if not title_str: return ""
         slug = title_str.lower()
@@ -100,39 +445,96 @@ class ComprehensiveDeepWikiIngestor:
         self.current_astro_parent_path_for_level[level] = target_astro_path
         return target_astro_path
 
-    def scrape_navigation_and_build_sitemap(self):
+    def _fetch_html(self, url, etag=None, last_modified=None):
+        """
+        HTTP counterpart of `driver.current_url`: the last fetched page is reused instead of re-downloaded.
+        With validators the request is conditional; returns (None, validators) on 304 Not Modified.
+        """
+        last_url, last_html, last_validators = self._last_http_page
+        if last_url == url:
+            return last_html, last_validators
+        status, html, validators = self.http_client.fetch_html(url, etag, last_modified)
+        if status == 304:
+            return None, validators
+        self._last_http_page = (url, html, validators)
+        return html, validators
+
+    def _read_navigation_items_http(self):
+        print(f"Fetching DeepWiki base URL over HTTP: {config.BASE_DEEPWIKI_URL}")
+        try:
+            html, _ = self._fetch_html(config.BASE_DEEPWIKI_URL)
+        except Exception as e:
+            print(f"Error fetching {config.BASE_DEEPWIKI_URL}: {e}")
+            return None
+        nav_items = extract_navigation_items(html)
+        if not nav_items:
+            print("Navigation tree not found in the server-rendered HTML.")
+            return None
+        return nav_items
+
+    def _read_navigation_items_selenium(self):
+        if self._replaying:
+            try:
+                nav_tree = self.archive.replay_payload("selenium_nav", config.BASE_DEEPWIKI_URL)
+            except LookupError as e:
+                print(f"Error: {e}")
+                return None
+        else:
+            start_time = time.monotonic()
+            nav_tree = self._read_nav_tree_selenium()
+            if nav_tree is None:
+                return None
+            if self.archive is not None:
+                self.archive.record_payload("selenium_nav", config.BASE_DEEPWIKI_URL, nav_tree, time.monotonic() - start_time)
+        if nav_tree.get("items") is None:
+            print(f"NoSuchElement: Navigation UL element not found. Check CSS selectors.")
+            return None
+
+        nav_items = []
+        for idx, nav_item in enumerate(nav_tree["items"]):
+            if nav_item is None:
+                print(f"Error reading a navigation item (index {idx}): no <a> element")
+                continue
+            nav_items.append(nav_item)
+        return nav_items
+
+    def _read_nav_tree_selenium(self):
         print(f"Navigating to DeepWiki base URL: {config.BASE_DEEPWIKI_URL}")
         self.driver.get(config.BASE_DEEPWIKI_URL)
-        nav_container_selector = "div.border-r-border[class*='md:sticky']"
 
         try:
-            print(f"Waiting for navigation container: {nav_container_selector}")
-            nav_container = WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, nav_container_selector))
+            print(f"Waiting for navigation container: {NAV_CONTAINER_SELECTOR}")
+            nav_tree = WebDriverWait(self.driver, 20).until(
+                lambda d: d.execute_script(READ_NAV_TREE_JS, NAV_CONTAINER_SELECTOR)
             )
-            print("Navigation container found. Locating UL element within it.")
-            nav_ul_element = nav_container.find_element(By.CSS_SELECTOR, "ul.flex-1")
-            print("Navigation UL element located. Parsing list items...")
         except TimeoutException:
-            print(f"Timeout: Navigation UL element or its container not found using selectors '{nav_container_selector}' or within it.")
+            print(f"Timeout: Navigation UL element or its container not found using selectors '{NAV_CONTAINER_SELECTOR}' or within it.")
             try:
                 page_source_filename = "debug_page_source_at_failure.html"
                 with open(page_source_filename, "w", encoding="utf-8") as f: f.write(self.driver.page_source)
                 print(f"ACTION REQUIRED: Page source at failure has been saved to: {os.path.abspath(page_source_filename)}")
             except Exception as e_ps: print(f"Error saving page source: {e_ps}")
-            return False
-        except NoSuchElementException:
-            print(f"NoSuchElement: Navigation UL element not found. Check CSS selectors.")
-            return False
+            return None
+        return nav_tree
+
+    def _read_navigation_items(self):
+        """Returns the sidebar entries as a list of {"title", "href", "style"} dicts, or None on failure."""
+        if self.backend == "http":
+            nav_items = self._read_navigation_items_http()
+            if nav_items or not self._get_fallback_driver():
+                return nav_items
+        return self._read_navigation_items_selenium()
 
-        list_items = nav_ul_element.find_elements(By.XPATH, "./li")
-        print(f"Found {len(list_items)} navigation list items.")
+    def scrape_navigation_and_build_sitemap(self):
+        nav_items = self._read_navigation_items()
+        if nav_items is None:
+            return False
+        print(f"Found {len(nav_items)} navigation list items.")
 
-        for idx, li in enumerate(list_items):
+        for idx, nav_item in enumerate(nav_items):
             try:
-                a_tag = li.find_element(By.TAG_NAME, "a")
-                raw_title = a_tag.text.strip()
-                deepwiki_href_attr = a_tag.get_attribute("href")
+                raw_title = (nav_item["title"] or "").strip()
+                deepwiki_href_attr = nav_item["href"]
 
                 if not raw_title or not deepwiki_href_attr: continue
                 
@@ -141,7 +543,7 @@ class ComprehensiveDeepWikiIngestor:
                 base_parsed = urlparse(config.BASE_DEEPWIKI_URL)
                 full_deepwiki_url = urljoin(f"{base_parsed.scheme}://{base_parsed.netloc}", deepwiki_path)
 
-                padding_style = li.get_attribute("style")
+                padding_style = nav_item["style"]
                 level = 0
                 match = re.search(r"padding-left:\s*(\d+)px", padding_style if padding_style else "")
                 if match: level = int(match.group(1)) // 12
@@ -167,38 +569,355 @@ class ComprehensiveDeepWikiIngestor:
         print(f"Site map generated with {len(self.site_map)} pages.")
         return bool(self.site_map)
 
-    def _extract_payload_from_js_innerHTML(self, js_innerHTML):
-        match = re.search(r'self\.__next_f\.push\(\s*\[\s*[^,\]]+\s*,\s*"(.*)"\s*\]\s*\)', js_innerHTML, re.DOTALL)
-        if match:
-            js_escaped_string = match.group(1)
-            try: return json.loads('"' + js_escaped_string + '"')
-            except json.JSONDecodeError:
-                try: return bytes(js_escaped_string, "utf-8").decode("unicode_escape", "ignore")
-                except Exception: return js_escaped_string
-        return None
-
-    def _extract_all_markdown_chunks_from_url(self, url_to_scan):
-        print(f"  Extracting markdown chunks from URL: {url_to_scan}")
-        if self.driver.current_url != url_to_scan:
-            self.driver.get(url_to_scan)
-            WebDriverWait(self.driver, 20).until(lambda d: d.execute_script('return document.readyState') == 'complete')
-            time.sleep(3)
-
+    def _collect_markdown_chunks(self, documents, url_to_scan, log=print):
         extracted_markdowns = []
-        script_elements = self.driver.find_elements(By.TAG_NAME, "script")
-        for script_element in script_elements:
+        try:
+            for document in documents:
+                document = document.strip()
+                if len(document) >= config.MIN_PAGE_LEN_HEURISTIC:
+                    extracted_markdowns.append(document)
+        except Exception as e_flight: log(f"    Error parsing the flight payload of {url_to_scan}: {e_flight}")
+        return extracted_markdowns
+
+    def _markdown_chunks_from_scripts(self, script_bodies, url_to_scan, log=print):
+        # Scripts are consumed in document order, so markdown split across several pushes is reassembled.
+        return self._collect_markdown_chunks(iter_markdown_documents(script_bodies), url_to_scan, log)
+
+    def _fetch_markdown_chunks_http(self, url_to_scan, source, etag=None, last_modified=None, log=print):
+        """Returns (chunks or None on 304, validators) read from the page's "html" or "rsc" response."""
+        if source == "html":
+            html, validators = self._fetch_html(url_to_scan, etag, last_modified)
+            if html is None:
+                return None, validators
+            return self._markdown_chunks_from_scripts(extract_script_bodies(html), url_to_scan, log), validators
+        status, rsc_body, validators = self.http_client.fetch_rsc(url_to_scan, etag, last_modified)
+        if status == 304:
+            return None, validators
+        return self._collect_markdown_chunks(iter_markdown_documents_from_flight(rsc_body), url_to_scan, log), validators
+
+    def _extract_markdown_chunks_http(self, url_to_scan, log=print):
+        cached_entry = self.cache.get_url(url_to_scan) if self.cache else None
+        cached_source = cached_entry.get("source") if cached_entry and cached_entry.get("chunks") else None
+        # The page payload is normally inlined in the HTML; otherwise ask for the RSC (flight) response.
+        # Start with whichever response carried the payload last time, revalidating it with its validators.
+        sources = ("rsc", "html") if cached_source == "rsc" else ("html", "rsc")
+        try:
+            for source in sources:
+                etag = last_modified = None
+                if source == cached_source:
+                    etag, last_modified = cached_entry.get("etag"), cached_entry.get("last_modified")
+                extracted_markdowns, validators = self._fetch_markdown_chunks_http(url_to_scan, source, etag, last_modified, log)
+                if extracted_markdowns is None:
+                    log(f"    Not modified since the last run, reusing {len(cached_entry['chunks'])} cached chunks.")
+                    return list(cached_entry["chunks"])
+                if extracted_markdowns:
+                    self._cache_chunks(url_to_scan, extracted_markdowns, source, validators, log)
+                    return extracted_markdowns
+        except Exception as e_http:
+            log(f"    HTTP fetch failed for {url_to_scan}: {e_http}")
+        return []
+
+    def _cache_chunks(self, url_to_scan, extracted_markdowns, source, validators=None, log=print):
+        """Records the chunks read from a URL in the cache and logs how many changed since the last run."""
+        if not self.cache: return
+        validators = validators or {}
+        chunk_changes = self.cache.update_url(url_to_scan, validators.get("etag"), validators.get("last_modified"),
+                                              extracted_markdowns, source)
+        if chunk_changes:
+            changed, removed = chunk_changes
+            if changed or removed:
+                log(f"    {changed} of {len(extracted_markdowns)} chunks changed since the last run, {removed} removed.")
+            else:
+                log(f"    All {len(extracted_markdowns)} chunks unchanged since the last run.")
+
+    def _wait_for_page_ready(self, driver, url, log=print):
+        """
+        Blocks until the loaded page exposes its markdown payload, using CDI_PAGE_READINESS_STRATEGY,
+        for at most CDI_PAGE_READY_TIMEOUT seconds, or CDI_PAGE_READY_GRACE seconds once the document has
+        finished loading without a payload. Records the time spent in `page_wait_times`.
+        """
+        strategy = config.CDI_PAGE_READINESS_STRATEGY
+        timeout = config.CDI_PAGE_READY_TIMEOUT
+        grace = min(config.CDI_PAGE_READY_GRACE, timeout)
+        start = time.perf_counter()
+        ready = True
+        try:
+            if strategy == "mutation_observer":
+                ready = bool(driver.execute_async_script(WAIT_FOR_PAGE_PAYLOAD_JS, config.MIN_PAGE_LEN_HEURISTIC,
+                                                         int(timeout * 1000), int(grace * 1000)))
+            elif strategy == "polling":
+                deadline = start + timeout
+                grace_started = False
+                while True:
+                    ready, complete = driver.execute_script(PAGE_PAYLOAD_READY_JS, config.MIN_PAGE_LEN_HEURISTIC)
+                    now = time.perf_counter()
+                    if complete and not grace_started:
+                        grace_started = True
+                        deadline = min(deadline, now + grace)
+                    if ready or now >= deadline:
+                        break
+                    time.sleep(config.CDI_PAGE_READY_POLL_INTERVAL)
+            elif strategy == "fixed_sleep":
+                WebDriverWait(driver, timeout).until(lambda d: d.execute_script('return document.readyState') == 'complete')
+                time.sleep(3)
+            else:
+                raise ValueError(f"Unknown CDI_PAGE_READINESS_STRATEGY: {strategy!r}")
+        except TimeoutException:
+            ready = False
+        waited = time.perf_counter() - start
+        with self._stats_lock:
+            self.page_wait_times[url] = waited
+        if not ready:
+            log(f"    Warning: no markdown payload appeared on {url} within {waited:.1f}s; scanning what is there.")
+        return ready
+
+    def _extract_markdown_chunks_browser(self, url_to_scan, driver, log=print):
+        """Reads a page through the browser, by client-side navigation when enabled (CDI_SELENIUM_NAVIGATION)."""
+        force_reload = False
+        if self._replaying:
+            client_side = self.archive.has("selenium_rsc", url_to_scan)
+        else:
+            client_side = config.CDI_SELENIUM_NAVIGATION == "client_side" and self._can_navigate_client_side(driver, url_to_scan)
+        if client_side:
+            extracted_markdowns = self._extract_markdown_chunks_client_side(url_to_scan, driver, log)
+            if extracted_markdowns is not None:
+                return extracted_markdowns
+            # The route may already have changed client-side, so the DOM does not hold this page's scripts.
+            force_reload = True
+        return self._extract_markdown_chunks_selenium(url_to_scan, driver, log, force_reload)
+
+    def _can_navigate_client_side(self, driver, url_to_scan):
+        """True if the app is already loaded on the same origin (on another page) in this browser."""
+        current = urlparse(driver.current_url or "")
+        target = urlparse(url_to_scan)
+        return (current.scheme, current.netloc) == (target.scheme, target.netloc) and current.path != target.path
+
+    def _extract_markdown_chunks_client_side(self, url_to_scan, driver, log=print):
+        """
+        Moves the already loaded app to `url_to_scan` with a client-side route change and parses the
+        flight response it fetches (`?_rsc=`), captured from Chrome's performance log via CDP.
+        Returns None when that fails, so the caller falls back to a full page load.
+        """
+        if self._replaying:
+            flight_body = base64.b64decode(self.archive.replay_payload("selenium_rsc", url_to_scan))
+            return self._collect_markdown_chunks(iter_markdown_documents_from_flight(flight_body), url_to_scan, log)
+
+        target = urlparse(url_to_scan)
+        start_time = time.monotonic()
+        try:
+            self._read_performance_log(driver) # drain events from before the route change
+            if not driver.execute_script(CLIENT_SIDE_NAVIGATE_JS, target.path):
+                return None
+            flight_body = self._wait_for_flight_response(driver, target.path)
+        except Exception as e_cdp:
+            log(f"    Client-side navigation to {url_to_scan} failed ({e_cdp}); doing a full page load.")
+            return None
+        if flight_body is None:
+            log(f"    No flight response for {url_to_scan} within {config.CDI_PAGE_READY_TIMEOUT}s; doing a full page load.")
+            return None
+        with self._stats_lock:
+            self.page_wait_times[url_to_scan] = time.monotonic() - start_time
+        extracted_markdowns = self._collect_markdown_chunks(iter_markdown_documents_from_flight(flight_body), url_to_scan, log)
+        if not extracted_markdowns:
+            return None
+        if self.archive is not None:
+            self.archive.record_payload("selenium_rsc", url_to_scan, base64.b64encode(flight_body).decode("ascii"),
+                                        time.monotonic() - start_time)
+        log(f"    Read {url_to_scan} from its flight response ({len(flight_body)} bytes) via client-side navigation.")
+        return extracted_markdowns
+
+    def _read_performance_log(self, driver):
+        """
+        Reads the pending performance log entries of `driver`. Records every finished flight (RSC) request
+        by path ({path: [(requestId, is_prefetch)]}, client-side mode) and adds the blocked and loaded
+        requests to the lean load stats. Returns the flight index for this driver.
+        """
+        track_flights = config.CDI_SELENIUM_NAVIGATION == "client_side"
+        with self._stats_lock:
+            state = self._flight_responses.setdefault(id(driver), {"requests": {}, "finished": {}})
+            request_urls = self._performance_log_state.setdefault(id(driver), {})
+        for entry in driver.get_log("performance"):
+            message = json.loads(entry["message"]).get("message", {})
+            method, params = message.get("method"), message.get("params", {})
+            if method == "Network.requestWillBeSent":
+                request = params.get("request", {})
+                headers = {name.lower(): value for name, value in request.get("headers", {}).items()}
+                if track_flights and ("_rsc=" in request.get("url", "") or headers.get("rsc") == "1"):
+                    state["requests"][params.get("requestId")] = (
+                        urlparse(request["url"]).path, headers.get("next-router-prefetch") == "1")
+                if self.lean_load:
+                    request_urls[params.get("requestId")] = request.get("url", "")
+            elif method == "Network.loadingFinished":
+                if params.get("requestId") in state["requests"]:
+                    path, is_prefetch = state["requests"].pop(params["requestId"])
+                    state["finished"].setdefault(path, []).append((params["requestId"], is_prefetch))
+                if self.lean_load:
+                    request_urls.pop(params.get("requestId"), None)
+                    self.lean_load.stats.add_loaded(params.get("encodedDataLength"))
+            elif method == "Network.loadingFailed" and self.lean_load:
+                url = request_urls.pop(params.get("requestId"), "")
+                if params.get("blockedReason") == "inspector": # blocked by Network.setBlockedURLs
+                    resource_type = (params.get("type") or "").lower()
+                    self.lean_load.stats.add_blocked(self.lean_load.block_reason(resource_type, url) or f"type:{resource_type}")
+        return state["finished"]
+
+    def _wait_for_flight_response(self, driver, path):
+        """
+        Polls the performance log until a flight response for `path` that carries a markdown page has
+        finished; returns its body bytes, or None on timeout.
+        """
+        deadline = time.monotonic() + config.CDI_PAGE_READY_TIMEOUT
+        while True:
+            finished = self._read_performance_log(driver).get(path, [])
+            # Prefer the navigation's own response; a (full) prefetch of the same route may be all there is.
+            finished.sort(key=lambda item: item[1])
+            while finished:
+                request_id, _ = finished.pop(0)
+                try:
+                    response = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+                except Exception:
+                    continue # body no longer buffered
+                body = response.get("body", "")
+                body = base64.b64decode(body) if response.get("base64Encoded") else body.encode("utf-8")
+                if next(iter_markdown_documents_from_flight(body), None) is not None:
+                    return body
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(config.CDI_PAGE_READY_POLL_INTERVAL)
+
+    def _extract_markdown_chunks_selenium(self, url_to_scan, driver, log=print, force_reload=False):
+        if self._replaying:
             try:
-                script_innerHTML = script_element.get_attribute('innerHTML')
-                if script_innerHTML and "self.__next_f.push" in script_innerHTML:
-                    payload_content = self._extract_payload_from_js_innerHTML(script_innerHTML)
-                    if payload_content and payload_content.strip().startswith("# ") and len(payload_content.strip()) >= config.MIN_PAGE_LEN_HEURISTIC:
-                        extracted_markdowns.append(payload_content.strip())
-            except Exception as e_script: print(f"    Error processing a script element on {url_to_scan}: {e_script}")
-        print(f"  Found {len(extracted_markdowns)} potential markdown chunks from {url_to_scan}.")
+                script_bodies = self.archive.replay_payload("selenium_scripts", url_to_scan)
+            except LookupError as e:
+                log(f"    {e}")
+                return []
+        else:
+            start_time = time.monotonic()
+            if force_reload or driver.current_url != url_to_scan:
+                driver.get(url_to_scan)
+                self._wait_for_page_ready(driver, url_to_scan, log)
+
+            script_bodies = driver.execute_script(READ_NEXT_F_SCRIPTS_JS) or []
+            if self.lean_load:
+                self._read_performance_log(driver)
+            if self.archive is not None:
+                self.archive.record_payload("selenium_scripts", url_to_scan, script_bodies, time.monotonic() - start_time)
+        return self._markdown_chunks_from_scripts(script_bodies, url_to_scan, log)
+
+    def _extract_all_markdown_chunks_from_url(self, url_to_scan, get_driver=None, log=print):
+        """
+        Returns the markdown chunks found on a page. `get_driver` returns the WebDriver to use
+        (defaults to the ingestor's own driver); workers pass their own so sessions are never shared.
+        """
+        log(f"  Extracting markdown chunks from URL: {url_to_scan}")
+        get_driver = get_driver or self._get_fallback_driver
+        if self.backend == "http":
+            extracted_markdowns = self._extract_markdown_chunks_http(url_to_scan, log)
+            if not extracted_markdowns:
+                driver = get_driver()
+                if driver:
+                    log(f"    No payload via HTTP, retrying {url_to_scan} with Selenium.")
+                    extracted_markdowns = self._extract_markdown_chunks_browser(url_to_scan, driver, log)
+        else:
+            extracted_markdowns = self._extract_markdown_chunks_browser(url_to_scan, get_driver(), log)
+            if extracted_markdowns:
+                self._cache_chunks(url_to_scan, extracted_markdowns, "selenium", None, log)
+        log(f"  Found {len(extracted_markdowns)} potential markdown chunks from {url_to_scan}.")
         return extracted_markdowns
 
+    def _get_worker_driver(self):
+        """
+        Returns the WebDriver owned by the calling fallback worker thread, starting one on first use.
+        The ingestor's own driver is lent to the first worker; other workers get their own session.
+        """
+        driver = getattr(self._worker_local, "driver", None)
+        if driver is None:
+            if self.backend == "http" and not self.selenium_fallback:
+                return None
+            with self._worker_lock:
+                if self.driver is not None and not self._main_driver_lent:
+                    driver = self.driver
+                    self._main_driver_lent = True
+            if driver is None:
+                try:
+                    driver = self._init_driver()
+                except Exception:
+                    if self.backend == "http":
+                        self.selenium_fallback = False
+                        return None
+                    raise
+                with self._worker_lock:
+                    self._worker_drivers.append(driver)
+            self._worker_local.driver = driver
+        return driver
+
+    def _fetch_fallback_page(self, page_data):
+        """Worker task: fetches one page individually. Returns (markdown or None, buffered log lines)."""
+        log_lines = []
+        log = log_lines.append
+        log(f"  Fallback: No bulk content for '{page_data['title']}'. Fetching from: {page_data['full_deepwiki_url']}")
+        try:
+            individual_page_chunks = self._extract_all_markdown_chunks_from_url(
+                page_data['full_deepwiki_url'], get_driver=self._get_worker_driver, log=log)
+            for chunk in individual_page_chunks:
+                h1_match = re.search(r"^#\s+(.*?)\s*(\n|$)", chunk, re.MULTILINE)
+                if h1_match and h1_match.group(1).strip() == page_data['title']:
+                    log(f"    Successfully fetched content for '{page_data['title']}' via fallback.")
+                    return chunk, log_lines
+            log(f"    Warning: Fallback fetch for '{page_data['title']}' did not yield matching content.")
+        except Exception as e_fallback: log(f"    Error during fallback fetch for '{page_data['title']}': {e_fallback}")
+        return None, log_lines
+
+    def _fetch_fallback_pages(self, fallback_pages):
+        """
+        Fetches pages missing from the bulk extraction with a bounded pool of workers
+        (CDI_FALLBACK_CONCURRENCY). Results and logs are applied in site map order.
+        """
+        concurrency = max(1, min(config.CDI_FALLBACK_CONCURRENCY or 1, len(fallback_pages)))
+        print(f"Fetching {len(fallback_pages)} fallback pages with {concurrency} worker(s)...")
+        self._worker_local = threading.local()
+        self._worker_lock = threading.Lock()
+        self._worker_drivers = []
+        self._main_driver_lent = False
+        checkpoint_every = config.CDI_CHECKPOINT_EVERY or 0
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                futures = [executor.submit(self._fetch_fallback_page, page_data) for page_data in fallback_pages]
+                # Print each page's log block in submission order as soon as it (and its predecessors) finished.
+                for done_count, (page_data, future) in enumerate(zip(fallback_pages, futures), start=1):
+                    content, log_lines = future.result()
+                    for line in log_lines: print(line)
+                    if content:
+                        page_data["main_markdown_content"] = content
+                        self._store_pages([page_data["original_deepwiki_href"]])
+                    if checkpoint_every and done_count % checkpoint_every == 0:
+                        self.save_checkpoint("bulk_content")
+        finally:
+            for driver in self._worker_drivers:
+                try: driver.quit()
+                except Exception as e_quit: print(f"    Error closing fallback WebDriver: {e_quit}")
+            self._worker_drivers = []
+
     def ingest_pages_content(self):
         print("Starting content ingestion phase...")
+        if self._phase_completed("content"):
+            print("Content ingestion already completed in the resumed run.")
+            return True
+        if not self._phase_completed("bulk_content"):
+            self._associate_bulk_content()
+            self._store_pages([href for href, page_data in self.site_map.items() if page_data["main_markdown_content"]])
+            self.save_checkpoint("bulk_content")
+
+        # On resume, pages whose content was already fetched are skipped.
+        fallback_pages = [page_data for page_data in self.site_map.values() if not page_data["main_markdown_content"]]
+        if fallback_pages:
+            self._fetch_fallback_pages(fallback_pages)
+        print(f"Fallback extraction attempted for {len(fallback_pages)} pages.")
+        self.save_checkpoint("content")
+        return True
+
+    def _associate_bulk_content(self):
         bulk_markdown_chunks = self._extract_all_markdown_chunks_from_url(config.BASE_DEEPWIKI_URL)
         bulk_content_by_title = {}
         for chunk in bulk_markdown_chunks:
@@ -218,115 +937,158 @@ class ComprehensiveDeepWikiIngestor:
                 pages_found_in_bulk += 1
         print(f"{pages_found_in_bulk} pages had content associated from bulk extraction.")
 
-        pages_needing_fallback = 0
-        for page_data in self.site_map.values():
-            if not page_data["main_markdown_content"]:
-                pages_needing_fallback +=1
-                print(f"  Fallback: No bulk content for '{page_data['title']}'. Fetching from: {page_data['full_deepwiki_url']}")
-                try:
-                    individual_page_chunks = self._extract_all_markdown_chunks_from_url(page_data['full_deepwiki_url'])
-                    for chunk in individual_page_chunks:
-                        h1_match = re.search(r"^#\s+(.*?)\s*(\n|$)", chunk, re.MULTILINE)
-                        if h1_match and h1_match.group(1).strip() == page_data['title']:
-                            page_data["main_markdown_content"] = chunk
-                            print(f"    Successfully fetched content for '{page_data['title']}' via fallback.")
-                            break
-                    else: print(f"    Warning: Fallback fetch for '{page_data['title']}' did not yield matching content.")
-                except Exception as e_fallback: print(f"    Error during fallback fetch for '{page_data['title']}': {e_fallback}")
-        print(f"Fallback extraction attempted for {pages_needing_fallback} pages.")
-        return True
+    def _processing_signature(self):
+        """Hash of everything besides a page's markdown that affects its processed links."""
+        return content_hash(json.dumps(
+            [sorted(self.link_resolution_map.items()), config.GITHUB_BLOB_URL_PREFIX, config.BASE_DEEPWIKI_URL]))
+
+    def _build_change_report(self):
+        """Sorts the pages into new, changed and unchanged by their content hash in the cache, plus removed ones."""
+        report = {"new": [], "changed": [], "unchanged": [], "removed": []}
+        for deepwiki_href, page_data in self.site_map.items():
+            if deepwiki_href not in self.previous_site_map:
+                report["new"].append(deepwiki_href)
+            elif self.cache.get_page_hash(deepwiki_href) == content_hash(page_data.get("main_markdown_content")):
+                report["unchanged"].append(deepwiki_href)
+            else:
+                report["changed"].append(deepwiki_href)
+        report["removed"] = [href for href in self.previous_site_map if href not in self.site_map]
+        return report
+
+    def print_change_report(self):
+        report = self.change_report
+        if not report: return
+        print(f"Change report: {len(report['new'])} new, {len(report['changed'])} changed, "
+              f"{len(report['unchanged'])} unchanged, {len(report['removed'])} removed.")
+        for kind in ("new", "changed", "removed"):
+            for deepwiki_href in report[kind]:
+                page = self.site_map.get(deepwiki_href) or self.previous_site_map.get(deepwiki_href, {})
+                print(f"  {kind.upper()}: '{page.get('title', deepwiki_href)}' ({deepwiki_href})")
 
     def process_page_links_and_data(self):
         print("Processing links and extracting data from page content...")
-        for page_data in self.site_map.values():
+        reusable = set()
+        if self.cache is not None:
+            self.change_report = self._build_change_report()
+            if self.cache.data.get("processing_signature") == self._processing_signature():
+                reusable = set(self.change_report["unchanged"])
+        for deepwiki_href, page_data in self.site_map.items():
             if not page_data.get("main_markdown_content"): continue
-            
-            # print(f"  Processing page: {page_data['title']}") # Already printed in user's successful SPBCP output
-            markdown_content = page_data["main_markdown_content"]
-            resolved_links_for_page = []
-
-            mermaid_blocks = re.findall(r"```mermaid\n(.*?)\n```", markdown_content, re.DOTALL)
-            page_data["mermaid_diagrams"] = mermaid_blocks
-
-            # --- Start of MODIFIED Section for "Relevant source files" ---
-            relevant_files_details_match = re.search(
-                r"<details>\s*<summary>Relevant source files</summary>(.*?)<\/details>", 
-                markdown_content, 
-                re.IGNORECASE | re.DOTALL
-            )
-            if relevant_files_details_match:
-                details_content = relevant_files_details_match.group(1)
-                # Find Markdown links: typically "- [text](href)"
-                for link_match in re.finditer(r"-\s*\[([^\]]+)\]\(([^)]+)\)", details_content):
-                    text = link_match.group(1).strip()
-                    original_href = link_match.group(2).strip()
-                    
-                    if not text or not original_href: continue
-
-                    github_url = urljoin(config.GITHUB_BLOB_URL_PREFIX, original_href.lstrip('/'))
-                    
-                    resolved_links_for_page.append({
-                        "text": text,
-                        "href": github_url,
-                        "original_deepwiki_href": original_href, 
-                        "context": "collapsible_aside_link"
-                    })
-            # --- End of MODIFIED Section ---
-
-            # New logic for inline source links:
-            for line in markdown_content.splitlines():
-                if line.strip().lower().startswith("sources:"):
-                    # --- CDI DEBUG ---
-                    if "docker-deployment" in page_data.get("target_astro_path", ""):
-                        print(f"CDI DEBUG: Processing line for docker-deployment: '{line}'")
-                    # --- END CDI DEBUG ---
-                    # Find all standard markdown links on this line
-                    for link_match in re.finditer(r"\[([^\]]+?)\]\(([^)]*?)\)", line):
-                        # --- CDI DEBUG ---
-                        if "docker-deployment" in page_data.get("target_astro_path", ""):
-                            print(f"  CDI DEBUG: Found link_match on this line: text='{link_match.group(1)}', href='{link_match.group(2)}'")
-                        # --- END CDI DEBUG ---
-                        text_content = link_match.group(1).strip()
-                        original_href_val = link_match.group(2).strip()
-                        
-                        is_already_added = False
-                        for existing_link in resolved_links_for_page:
-                            if existing_link["text"] == text_content and \
-                               existing_link["original_deepwiki_href"] == original_href_val and \
-                               existing_link["context"] == "inline_source_link":
-                                is_already_added = True
-                                break
-                        if not is_already_added:
-                            resolved_links_for_page.append({
-                                "text": text_content, "href": "", 
-                                "original_deepwiki_href": original_href_val,
+            if deepwiki_href in reusable:
+                previous_page = self.previous_site_map[deepwiki_href]
+                page_data["resolved_links"] = previous_page.get("resolved_links", [])
+                page_data["mermaid_diagrams"] = previous_page.get("mermaid_diagrams", [])
+                continue
+            self._process_single_page(page_data)
+        if reusable:
+            print(f"Reused links and diagrams of {len(reusable)} unchanged pages from the previous run.")
+        self.print_change_report()
+        return True
+
+    def _process_single_page(self, page_data):
+        # print(f"  Processing page: {page_data['title']}") # Already printed in user's successful SPBCP output
+        mermaid_blocks, resolved_links_for_page = self._extract_page_links(page_data["main_markdown_content"])
+        page_data["mermaid_diagrams"] = mermaid_blocks
+        page_data["resolved_links"] = resolved_links_for_page
+
+    def _extract_page_links(self, markdown_content):
+        """
+        Single pass over a page's markdown. Every '[' is visited once and classified by context:
+        "- [text](href)" inside the "Relevant source files" <details> block, [text](href) on a
+        "Sources:" line, and internal [text](href) links anywhere. Each context keeps its own cursor,
+        so matches never overlap within a context (same results as one finditer per context).
+        Returns (mermaid_blocks, resolved_links) with links ordered collapsible, inline, internal.
+        """
+        mermaid_blocks = []
+        search_from = 0
+        while True:
+            block_start = markdown_content.find(MERMAID_OPEN, search_from)
+            if block_start == -1: break
+            block_end = markdown_content.find(MERMAID_CLOSE, block_start + len(MERMAID_OPEN))
+            if block_end == -1: break
+            mermaid_blocks.append(markdown_content[block_start + len(MERMAID_OPEN):block_end])
+            search_from = block_end + len(MERMAID_CLOSE)
+
+        details_match = RELEVANT_SOURCES_DETAILS_RE.search(markdown_content)
+        details_start, details_end = details_match.span(1) if details_match else (-1, -1)
+        deepwiki_base_path_lower = urlparse(config.BASE_DEEPWIKI_URL).path.lower()
+
+        collapsible_links, inline_links, internal_links = [], [], []
+        seen_inline_links = set()
+        collapsible_cursor = inline_cursor = internal_cursor = 0
+        line_start = 0
+        for line in markdown_content.splitlines(keepends=True):
+            line_end = line_start + len(line.rstrip("\r\n\v\f\x1c\x1d\x1e\x85\u2028\u2029"))
+            next_line_start = line_start + len(line)
+            is_sources_line = line.strip().lower().startswith("sources:")
+            bracket = markdown_content.find("[", line_start, line_end)
+            while bracket != -1:
+                if details_start <= bracket < details_end and bracket >= collapsible_cursor:
+                    dash = bracket - 1
+                    while dash >= details_start and markdown_content[dash].isspace(): dash -= 1
+                    if dash >= max(details_start, collapsible_cursor) and markdown_content[dash] == "-":
+                        link_match = COLLAPSIBLE_LINK_RE.match(markdown_content, bracket, details_end)
+                        if link_match:
+                            collapsible_cursor = link_match.end()
+                            text = link_match.group(1).strip()
+                            original_href = link_match.group(2).strip()
+                            if text and original_href:
+                                collapsible_links.append({
+                                    "text": text,
+                                    "href": urljoin(config.GITHUB_BLOB_URL_PREFIX, original_href.lstrip('/')),
+                                    "original_deepwiki_href": original_href,
+                                    "context": "collapsible_aside_link"
+                                })
+
+                if is_sources_line and bracket >= inline_cursor:
+                    link_match = INLINE_SOURCE_LINK_RE.match(markdown_content, bracket, line_end)
+                    if link_match:
+                        inline_cursor = link_match.end()
+                        key = (link_match.group(1).strip(), link_match.group(2).strip())
+                        if key not in seen_inline_links:
+                            seen_inline_links.add(key)
+                            inline_links.append({
+                                "text": key[0], "href": "",
+                                "original_deepwiki_href": key[1],
                                 "context": "inline_source_link"
                             })
-            
-            for internal_link_match in re.finditer(r"\[([^!][^\]]*)\]\(([^)]+)\)", markdown_content):
-                link_text = internal_link_match.group(1)
-                original_internal_href = internal_link_match.group(2)
-                resolved_astro_path = None
-                parsed_original_href = urlparse(original_internal_href)
-                original_path_lower = parsed_original_href.path.lower()
-
-                if original_path_lower in self.link_resolution_map:
-                    resolved_astro_path = self.link_resolution_map[original_path_lower]
-                elif original_internal_href.startswith("#") and link_text.lower() in self.link_resolution_map:
-                    resolved_astro_path = self.link_resolution_map[link_text.lower()] + original_internal_href
-                elif original_path_lower.startswith(urlparse(config.BASE_DEEPWIKI_URL).path.lower()):
-                     if original_path_lower in self.link_resolution_map:
-                        resolved_astro_path = self.link_resolution_map[original_path_lower]
-                if resolved_astro_path:
-                    resolved_links_for_page.append({
-                        "text": link_text, "href": resolved_astro_path,
-                        "original_deepwiki_href": original_internal_href,
-                        "context": "internal_page_link_from_content_body"
-                    })
-            page_data["resolved_links"] = resolved_links_for_page
-        return True
+
+                if bracket >= internal_cursor:
+                    link_match = INTERNAL_LINK_RE.match(markdown_content, bracket)
+                    if link_match:
+                        internal_cursor = link_match.end()
+                        resolved_link = self._resolve_internal_link(link_match.group(1), link_match.group(2), deepwiki_base_path_lower)
+                        if resolved_link:
+                            internal_links.append(resolved_link)
+
+                bracket = markdown_content.find("[", bracket + 1, line_end)
+            line_start = next_line_start
+        return mermaid_blocks, collapsible_links + inline_links + internal_links
+
+    def _resolve_internal_link(self, link_text, original_internal_href, deepwiki_base_path_lower):
+        resolved_astro_path = None
+        parsed_original_href = urlparse(original_internal_href)
+        original_path_lower = parsed_original_href.path.lower()
+
+        if original_path_lower in self.link_resolution_map:
+            resolved_astro_path = self.link_resolution_map[original_path_lower]
+        elif original_internal_href.startswith("#") and link_text.lower() in self.link_resolution_map:
+            resolved_astro_path = self.link_resolution_map[link_text.lower()] + original_internal_href
+        elif original_path_lower.startswith(deepwiki_base_path_lower):
+             if original_path_lower in self.link_resolution_map:
+                resolved_astro_path = self.link_resolution_map[original_path_lower]
+        if not resolved_astro_path:
+            return None
+        return {
+            "text": link_text, "href": resolved_astro_path,
+            "original_deepwiki_href": original_internal_href,
+            "context": "internal_page_link_from_content_body"
+        }
 
     def save_ingested_data(self):
+        if config.PAGE_STORE_ENABLED:
+            self.save_page_store()
+            return
         print(f"Saving ingested data to: {config.INGESTED_DATA_JSON_PATH}")
         try:
             output_dir = os.path.dirname(config.INGESTED_DATA_JSON_PATH)
@@ -336,24 +1098,96 @@ class ComprehensiveDeepWikiIngestor:
             print("Ingested data saved successfully.")
         except Exception as e: print(f"Error saving ingested data: {e}")
 
+    def _store_pages(self, deepwiki_hrefs):
+        """
+        Upserts pages into the page store as soon as their content is in, so the store keeps up with the
+        checkpoints and a crashed or resumed run does not lose them. save_page_store adds the links at the end.
+        """
+        if not config.PAGE_STORE_ENABLED or not deepwiki_hrefs: return
+        if self._site_map_positions is None:
+            self._site_map_positions = {href: position for position, href in enumerate(self.site_map)}
+        try:
+            if self.page_store is None:
+                self.page_store = PageStore(config.PAGE_STORE_PATH)
+            self.page_store.upsert_pages([(href, self.site_map[href], self._site_map_positions[href]) for href in deepwiki_hrefs])
+        except Exception as e: print(f"Warning: Could not store {len(deepwiki_hrefs)} page(s) in {config.PAGE_STORE_PATH}: {e}")
+
+    def save_page_store(self):
+        print(f"Saving ingested data to page store: {config.PAGE_STORE_PATH}")
+        try:
+            store = self.page_store or PageStore(config.PAGE_STORE_PATH)
+            self.page_store = None
+            with store:
+                # Pages were stored as they were fetched; this adds their links and diagrams and drops stale pages.
+                store.replace_site_map(self.site_map)
+                # Keep the JSON file for tools that still read it.
+                exported_count = store.export_json(config.INGESTED_DATA_JSON_PATH)
+            print(f"Page store saved; exported {exported_count} pages to {config.INGESTED_DATA_JSON_PATH}.")
+        except Exception as e: print(f"Error saving page store: {e}")
+
+    def save_link_graph(self):
+        if not config.LINK_GRAPH_ENABLED: return
+        try:
+            graph = LinkGraph(config.LINK_GRAPH_PATH)
+            graph.update_site_map(self.site_map.items())
+            graph.save()
+            print(f"Link graph saved to: {config.LINK_GRAPH_PATH}")
+        except Exception as e: print(f"Error saving link graph: {e}")
+
+    def save_cache(self):
+        if self.cache is None: return
+        self.cache.set_pages({href: content_hash(page_data["main_markdown_content"])
+                              for href, page_data in self.site_map.items() if page_data.get("main_markdown_content")})
+        self.cache.data["processing_signature"] = self._processing_signature()
+        try:
+            self.cache.save()
+            print(f"CDI cache saved to: {config.CDI_CACHE_PATH}")
+        except Exception as e: print(f"Error saving CDI cache: {e}")
+
     def run(self):
         print("Starting Comprehensive DeepWiki Ingestion...")
         start_time = time.time()
-        if not self.scrape_navigation_and_build_sitemap(): print("Failed to scrape navigation. Aborting."); return
+        if self._phase_completed("navigation"):
+            print(f"Navigation already scraped in the resumed run ({len(self.site_map)} pages).")
+        else:
+            if not self.scrape_navigation_and_build_sitemap(): print("Failed to scrape navigation. Aborting."); return
+            self.save_checkpoint("navigation")
         if not self.ingest_pages_content(): print("Failed to ingest page content.")
-        if not self.process_page_links_and_data(): print("Failed during link processing.")
+        if self._phase_completed("links"):
+            print("Link processing already completed in the resumed run.")
+        else:
+            if not self.process_page_links_and_data(): print("Failed during link processing.")
+            self.save_checkpoint("links")
         self.save_ingested_data()
+        self.save_link_graph()
+        self.save_cache()
+        self.remove_checkpoint()
+        self.print_round_trip_stats()
         print(f"CDI run completed in {time.time() - start_time:.2f} seconds.")
 
     def close_driver(self):
+        if self.page_store: self.page_store.close(); self.page_store = None
         if self.driver: print("Closing WebDriver..."); self.driver.quit(); self.driver = None
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comprehensive DeepWiki Ingestor: scrape DeepWiki into the CDI site map.")
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Continue from the last checkpoint (CDI_CHECKPOINT_PATH) instead of starting over."
+    )
+    add_archive_arguments(parser)
+    args = parser.parse_args()
+
     ingestor = None
+    archive = None
     try:
-        ingestor = ComprehensiveDeepWikiIngestor()
+        archive = open_archive_from_args(args)
+        ingestor = ComprehensiveDeepWikiIngestor(resume=args.resume, archive=archive)
         ingestor.run()
     except Exception as e:
         print(f"An unhandled error occurred during CDI execution: {e}")
+        if os.path.exists(config.CDI_CHECKPOINT_PATH):
+            print("Progress was checkpointed. Re-run with --resume to continue from it.")
     finally:
-        if ingestor: ingestor.close_driver()
\ No newline at end of file
+        if ingestor: ingestor.close_driver()
+        if archive: archive.close()
\ No newline at end of file
@@ -0,0 +1,110 @@
+# run_check_source_links.py
+# Checks every source link in the ingested data and in the generated pages against the offline source tree index
+# (no network access)
+
+import argparse
+import json
+import os
+
+import config
+from mdx_document import MdxDocument
+from page_store import load_configured_pages
+from run_remap_source_links import ATTRIBUTE_RE, blob_url_prefix
+from source_index import SourceIndexError, build_source_index, parse_source_href, parse_source_reference
+
+def source_references(page_data):
+    """Yields (link text, filename, line_start, line_end) for the page's "Relevant source files" and inline "Sources:" links."""
+    for link in page_data.get("resolved_links", []):
+        if link["context"] == "collapsible_aside_link":
+            yield (link["text"],) + parse_source_href(link["original_deepwiki_href"])[:3]
+        elif link["context"] == "inline_source_link":
+            yield (link["text"],) + parse_source_reference(link["text"])
+
+def generated_source_links(docs_dir):
+    """Yields (file path, text, href) for every <SourceLink> in the .mdx pages under docs_dir."""
+    for root, dirs, files in os.walk(docs_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if not file.endswith(".mdx"):
+                continue
+            filepath = os.path.join(root, file)
+            with open(filepath, 'r', encoding='utf-8') as f:
+                doc = MdxDocument(f.read())
+            for component in doc.components:
+                if component.name == "SourceLink" and not component.closing:
+                    attributes = dict(ATTRIBUTE_RE.findall(doc.text[component.start:component.end]))
+                    yield filepath, attributes.get("text", ""), attributes.get("href", "")
+
+def check_reference(index, filename, line_start, line_end):
+    """Returns (problem or None, whether the filename had to be resolved to a full path)."""
+    path, problem = index.lookup(filename)
+    if path is None:
+        return problem, False
+    return index.check_lines(path, line_start, line_end), path != filename.strip().lstrip("/")
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the source links of the ingested pages and of the generated .mdx pages "
+                                                 "against a local checkout of the source repository.")
+    parser.add_argument("--checkout", default=config.SOURCE_CHECKOUT_PATH,
+                        help="Local clone of GITHUB_REPO_URL (default: SOURCE_CHECKOUT_PATH).")
+    parser.add_argument("--ref", default=config.GITHUB_REF, help="Ref to check against (default: GITHUB_REF).")
+    parser.add_argument("--docs", default=config.TARGET_DOCS_DIR,
+                        help="Directory of generated .mdx pages whose <SourceLink>s are checked (default: TARGET_DOCS_DIR).")
+    args = parser.parse_args()
+
+    if not args.checkout:
+        print("Error: No source checkout given. Set SOURCE_CHECKOUT_PATH in config.py or pass --checkout.")
+        return
+    try:
+        index = build_source_index(args.checkout, args.ref,
+                                   config.SOURCE_INDEX_CACHE_PATH if args.ref == config.GITHUB_REF else None)
+    except (SourceIndexError, OSError) as e:
+        print(f"Error: Could not index {args.checkout} at {args.ref}: {e}")
+        return
+    try:
+        pages = load_configured_pages()
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read ingested data ({e}); only the generated pages are checked.")
+        pages = []
+
+    checked_count = resolved_count = 0
+    problems = 0
+    for deepwiki_href, page_data in pages:
+        for text, filename, line_start, line_end in source_references(page_data):
+            checked_count += 1
+            problem, resolved = check_reference(index, filename, line_start, line_end)
+            resolved_count += resolved
+            if problem:
+                problems += 1
+                print(f"{deepwiki_href}: [{text}] {problem}")
+
+    # The generated pages also hold the links the .mdx fixers converted, which the ingested data does not list.
+    generated_count = pinned_count = generated_problems = 0
+    if args.docs and os.path.isdir(args.docs):
+        ref_prefix = blob_url_prefix(args.ref)
+        repo_prefix = f"{config.GITHUB_REPO_URL}/blob/"
+        for filepath, text, href in generated_source_links(args.docs):
+            generated_count += 1
+            if not href.startswith(ref_prefix):
+                if href.startswith(repo_prefix):
+                    pinned_count += 1 # e.g. left at DEEPWIKI_SOURCE_REF because its lines changed
+                    continue
+                problem = f"href '{href}' is not a {config.GITHUB_REPO_URL} link"
+            else:
+                filename, line_start, line_end, _ = parse_source_href(href[len(ref_prefix):])
+                problem, resolved = check_reference(index, filename, line_start, line_end)
+                if resolved and not problem:
+                    problem = f"links '{filename}', which is not a full path"
+            if problem:
+                generated_problems += 1
+                print(f"{os.path.relpath(filepath, args.docs)}: <SourceLink text=\"{text}\"> {problem}")
+    elif args.docs:
+        print(f"Warning: Generated pages directory '{args.docs}' not found; only the ingested data is checked.")
+
+    print(f"\nChecked {checked_count} source links in the ingested data against {len(index.line_counts)} files at "
+          f"{index.commit[:12]}: {problems} problem(s), {resolved_count} short filename(s) resolved to a full path.")
+    print(f"Checked {generated_count - pinned_count} <SourceLink>s at {args.ref} in the generated pages: "
+          f"{generated_problems} problem(s); {pinned_count} link(s) at other refs were not checked.")
+
+if __name__ == "__main__":
+    main()
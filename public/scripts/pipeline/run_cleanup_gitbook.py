@@ -1,47 +1,46 @@
+import io
 import os
 
+def strip_gitbook_footer(text):
+    """
+    Returns the text without the GitBook navigation footer, which starts with the first line
+    containing '[Previous' (and may include a 'Last updated' line), or unchanged if it has none.
+    """
+    lines = io.StringIO(text, newline=None).readlines() # universal newlines, like reading the file
+    for i, line in enumerate(lines):
+        # The navigation footer in GitBook scrapes often starts with this
+        if '[Previous' in line:
+            # We truncate the text from this line onwards
+            cleaned_lines = lines[:i]
+
+            # Also, trim any trailing whitespace or empty lines from the end
+            while cleaned_lines and not cleaned_lines[-1].strip():
+                cleaned_lines.pop()
+            return ''.join(cleaned_lines)
+    return text
+
 def cleanup_gitbook_file(filepath):
     """
-    Reads a .md file and removes the GitBook navigation footer.
-    The footer typically starts with a line containing '[Previous' and
-    may include a 'Last updated' line.
+    Reads a .md file and removes the GitBook navigation footer. run_scrape_gitbook.py strips
+    it before writing, so this is only needed for pages scraped by older versions.
     """
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+            content = f.read()
     except Exception as e:
         print(f"Error reading file {filepath}: {e}")
         return False
 
-    if not lines:
-        return False
-
-    original_line_count = len(lines)
-    line_to_cut_from = -1
-
-    for i, line in enumerate(lines):
-        # The navigation footer in GitBook scrapes often starts with this
-        if '[Previous' in line:
-            line_to_cut_from = i
-            break
-
-    if line_to_cut_from != -1:
-        # We truncate the file from this line onwards
-        cleaned_lines = lines[:line_to_cut_from]
-        
-        # Also, trim any trailing whitespace or empty lines from the end
-        while cleaned_lines and not cleaned_lines[-1].strip():
-            cleaned_lines.pop()
-
-        if len(cleaned_lines) < original_line_count:
-            try:
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.writelines(cleaned_lines)
-                print(f"Cleaned up footer from: {filepath}")
-                return True
-            except Exception as e:
-                print(f"Error writing updated file {filepath}: {e}")
-                return False
+    cleaned_content = strip_gitbook_footer(content)
+    if cleaned_content != content:
+        try:
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(cleaned_content)
+            print(f"Cleaned up footer from: {filepath}")
+            return True
+        except Exception as e:
+            print(f"Error writing updated file {filepath}: {e}")
+            return False
     
     return False
 
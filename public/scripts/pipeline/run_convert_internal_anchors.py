@@ -1,11 +1,16 @@
 # run_convert_internal_anchors.py
 
+import argparse
 import os
-import re
 import json
 import config # Assuming config.py has TARGET_DOCS_DIR and INGESTED_DATA_JSON_PATH
 from pathlib import Path
 
+from mdx_document import MdxDocument
+from page_pool import add_jobs_argument, print_errors, run_ordered
+from link_graph import LinkGraph
+from page_store import PageStore, load_configured_pages
+
 def load_title_to_astro_path_map(json_path):
     """
     Loads the ingested_deepwiki_data.json and creates a mapping from
@@ -30,6 +35,18 @@ def load_title_to_astro_path_map(json_path):
         print(f"An unexpected error occurred while loading title map: {e}")
     return title_map
 
+def load_title_to_astro_path_map_from_store(store_path):
+    """
+    Same mapping as load_title_to_astro_path_map, read with one indexed query
+    from the CDI page store instead of parsing the whole JSON file.
+    """
+    try:
+        with PageStore(store_path) as store:
+            return store.title_to_astro_path_map()
+    except Exception as e:
+        print(f"An unexpected error occurred while loading title map from page store {store_path}: {e}")
+        return {}
+
 def get_astro_path_from_filepath(filepath, base_docs_dir):
     """
     Determines the canonical Astro path for a given .mdx file.
@@ -59,24 +76,29 @@ def get_astro_path_from_filepath(filepath, base_docs_dir):
         return None
 
 
-def convert_anchors_in_file(filepath, title_map, current_file_astro_path):
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except Exception as e:
-        print(f"Error reading file {filepath}: {e}")
-        return False
+def is_page_anchor(href):
+    """A simple anchor link (e.g. #some-id, not /page#some-id, and not just "#")."""
+    return href.startswith('#') and len(href) > 1 and not ('/' in href or ':' in href or '.' in href.split('#')[0])
 
-    original_content = content
-    
-    # Regex for Markdown links: [text](href), ensuring not an image link ![...]
-    def replace_link_callback(match):
-        link_text = match.group(1)
-        href = match.group(2)
+def convert_anchors_in_document(doc, filepath, title_map, current_file_astro_path, previous_title_map=None):
+    """
+    Converts title-based anchor links ([Page Title](#anchor)) that point at another page
+    in a parsed .mdx document; links inside code blocks and component tags are left alone.
+    With previous_title_map (the map of an earlier conversion), links converted then are
+    pointed at the title's new path, or back at the bare anchor if the title is gone.
+    Returns the number of links converted; `filepath` is only used for messages.
+    """
+    edits = []
+    for link in doc.links:
+        link_text = link.text
+        href = link.href
+        # Link text must not start with '!' (as in the original [^!] pattern)
+        if not link_text or link_text.startswith('!'):
+            continue
 
         # Only process simple anchor links (e.g., #some-id, not /page#some-id)
         # And ensure href is not just "#"
-        if href.startswith('#') and len(href) > 1 and not ('/' in href or ':' in href or '.' in href.split('#')[0]):
+        if is_page_anchor(href):
             link_text_lower_stripped = link_text.lower().strip()
             
             if link_text_lower_stripped in title_map:
@@ -87,61 +109,192 @@ def convert_anchors_in_file(filepath, title_map, current_file_astro_path):
                 if target_page_astro_path != current_file_astro_path:
                     new_href = target_page_astro_path + href # href already includes the '#'
                     print(f"  Converting in {Path(filepath).name}: '[{link_text}]({href})' -> '[{link_text}]({new_href})'")
-                    return f"[{link_text}]({new_href})"
-        
-        return match.group(0) # Return original match if no changes needed
+                    edits.append((link.href_start, link.href_end, new_href))
+        elif previous_title_map and link_text.lower().strip() in previous_title_map:
+            previous_target_path = previous_title_map[link_text.lower().strip()]
+            if href.startswith(previous_target_path + '#'):
+                anchor = href[len(previous_target_path):]
+                target_page_astro_path = title_map.get(link_text.lower().strip())
+                new_href = anchor
+                if target_page_astro_path and target_page_astro_path != current_file_astro_path:
+                    new_href = target_page_astro_path + anchor
+                if new_href != href:
+                    print(f"  Retargeting in {Path(filepath).name}: '[{link_text}]({href})' -> '[{link_text}]({new_href})'")
+                    edits.append((link.href_start, link.href_end, new_href))
+
+    return doc.apply_edits(edits)
+
+def anchor_title_refs(doc, title_map):
+    """
+    Lowercase texts of the document's links that depend on the title map: simple anchor links
+    (converted if a page with that title appears) and links already converted with it.
+    """
+    titles = set()
+    for link in doc.links:
+        if not link.text or link.text.startswith('!'):
+            continue
+        title = link.text.lower().strip()
+        if is_page_anchor(link.href) or (title in title_map and link.href.startswith(title_map[title] + '#')):
+            titles.add(title)
+    return sorted(titles)
 
-    # Using re.sub with a callback
-    # Pattern: [ followed by not !, then anything not ], then ], then (, then anything not ), then )
-    content = re.sub(r"\[([^!][^\]]*)\]\(([^)]+)\)", replace_link_callback, content)
+def convert_anchors_in_file(filepath, title_map, current_file_astro_path, previous_title_map=None):
+    """Converts the anchor links of one file. Returns (modified, anchor_title_refs of the result or None if it could not be read)."""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except Exception as e:
+        print(f"Error reading file {filepath}: {e}")
+        return False, None
 
-    if content != original_content:
+    doc = MdxDocument(content)
+    modified = False
+    if convert_anchors_in_document(doc, filepath, title_map, current_file_astro_path, previous_title_map):
         try:
             with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
+                f.write(doc.text)
             # print(f"  Updated anchors in: {filepath}") # Covered by the print inside callback
-            return True
+            modified = True
         except Exception as e:
             print(f"  Error writing updated file {filepath}: {e}")
-    return False
+            return False, None
+    return modified, anchor_title_refs(doc, title_map)
+
+def convert_anchors_in_docs_file(title_maps, filepath, target_docs_dir):
+    """
+    convert_anchors_in_file for a file under target_docs_dir (its Astro path is derived from its location);
+    title_maps is (title map, title map of the previous conversion or None).
+    """
+    current_page_astro_path = get_astro_path_from_filepath(filepath, target_docs_dir)
+    if current_page_astro_path is None:
+        print(f"Warning: Could not determine Astro path for {filepath}, skipping anchor conversion for it.")
+        return False, None
+    return convert_anchors_in_file(filepath, title_maps[0], current_page_astro_path, title_maps[1])
+
+def needs_conversion(graph, astro_path, relative_path, filepath):
+    """
+    Whether a file has to be (re)scanned: it is new to the graph, SPBCP rewrote it since its last
+    conversion, or (for pages SPBCP does not track) its size or mtime changed.
+    """
+    refs = graph.anchor_refs.get(astro_path)
+    if refs is None or refs["file"] != relative_path:
+        return True
+    page = graph.page_for_path(astro_path)
+    if page is not None and page.get("written") is not None:
+        return refs["written"] != page["written"]
+    stat = os.stat(filepath)
+    return refs["stat"] != [stat.st_mtime_ns, stat.st_size]
+
+def load_link_graph():
+    """The LinkGraph at LINK_GRAPH_PATH (seeded from the ingested data on its first use), or None if LINK_GRAPH_ENABLED is off."""
+    if not config.LINK_GRAPH_ENABLED:
+        return None
+    graph = LinkGraph(config.LINK_GRAPH_PATH)
+    if not graph.pages:
+        # First run with the link graph: seed it from the ingested data.
+        try:
+            graph.update_site_map(load_configured_pages())
+        except Exception as e:
+            print(f"Error loading ingested data for the link graph: {e}")
+    return graph
+
+def record_anchor_refs(graph, astro_path, filepath, target_docs_dir, title_refs):
+    """
+    Records the anchor_title_refs of a converted file with its SPBCP write and its size and mtime, which
+    needs_conversion checks on the next run. title_refs None (the file could not be converted) drops its entry.
+    """
+    if title_refs is None:
+        graph.remove_anchor_refs(astro_path)
+        return
+    page = graph.page_for_path(astro_path)
+    stat = os.stat(filepath)
+    graph.set_anchor_refs(astro_path, {
+        "file": os.path.relpath(filepath, target_docs_dir),
+        "written": page.get("written") if page else None,
+        "stat": [stat.st_mtime_ns, stat.st_size],
+        "titles": title_refs,
+    })
+
+def save_converted_titles(graph, astro_paths, title_map):
+    """Drops the anchor refs of pages that are gone, records the title map the pages were converted with and saves the graph."""
+    for astro_path in set(graph.anchor_refs) - set(astro_paths):
+        graph.remove_anchor_refs(astro_path) # deleted pages
+    graph.converted_titles = dict(title_map)
+    try:
+        graph.save()
+    except Exception as e:
+        print(f"Error saving link graph {config.LINK_GRAPH_PATH}: {e}")
+
+def load_configured_title_map():
+    """Loads the title-to-Astro path map from the page store if enabled, else from INGESTED_DATA_JSON_PATH."""
+    if config.PAGE_STORE_ENABLED and os.path.exists(config.PAGE_STORE_PATH):
+        return load_title_to_astro_path_map_from_store(config.PAGE_STORE_PATH)
+    if not os.path.exists(config.INGESTED_DATA_JSON_PATH):
+        print(f"Error: JSON data file not found at {config.INGESTED_DATA_JSON_PATH}. Please run CDI first.")
+        return {}
+    return load_title_to_astro_path_map(config.INGESTED_DATA_JSON_PATH)
 
 def main():
+    parser = argparse.ArgumentParser(description="Convert title-based anchor links that point at other pages.")
+    parser.add_argument("--force", action="store_true", help="Re-scan every page, ignoring the link graph.")
+    add_jobs_argument(parser)
+    args = parser.parse_args()
+
     print("Starting script to convert title-based internal anchor links...")
-    json_data_path = config.INGESTED_DATA_JSON_PATH
     target_docs_dir = config.TARGET_DOCS_DIR
 
-    if not os.path.exists(json_data_path):
-        print(f"Error: JSON data file not found at {json_data_path}. Please run CDI first.")
-        return
     if not os.path.exists(target_docs_dir):
         print(f"Error: Target documents directory '{target_docs_dir}' not found.")
         return
 
-    title_to_astro_path = load_title_to_astro_path_map(json_data_path)
+    graph = load_link_graph()
+    title_to_astro_path = graph.titles() if graph is not None else load_configured_title_map()
     if not title_to_astro_path:
         print("Failed to load title-to-Astro path map. Aborting.")
         return
 
+    mdx_files = [os.path.join(root, file) for root, _, files in os.walk(target_docs_dir)
+                 for file in files if file.endswith(".mdx")]
+    incremental = graph is not None and not args.force and graph.converted_titles is not None
+    affected_paths = set()
+    if incremental:
+        changed_titles = graph.changed_titles()
+        for title in changed_titles:
+            affected_paths.update(graph.pages_referring_to_title(title))
+        if changed_titles:
+            print(f"{len(changed_titles)} titles changed or moved; {len(affected_paths)} pages refer to them.")
+
+    tasks = []
+    astro_paths = {}
+    for filepath in mdx_files:
+        astro_path = get_astro_path_from_filepath(filepath, target_docs_dir)
+        astro_paths[filepath] = astro_path
+        if incremental and astro_path is not None and astro_path not in affected_paths \
+                and not needs_conversion(graph, astro_path, os.path.relpath(filepath, target_docs_dir), filepath):
+            continue
+        tasks.append((filepath, target_docs_dir))
+
     modified_files_count = 0
-    processed_files_count = 0
+    errors = []
+    title_maps = (title_to_astro_path, graph.converted_titles if graph is not None else None)
+    for (filepath, _), outcome, error in run_ordered(convert_anchors_in_docs_file, tasks, args.jobs, context=title_maps):
+        if error:
+            errors.append((filepath, error))
+            continue
+        modified, title_refs = outcome
+        if modified:
+            modified_files_count += 1
+        astro_path = astro_paths[filepath]
+        if graph is not None and astro_path is not None:
+            record_anchor_refs(graph, astro_path, filepath, target_docs_dir, title_refs)
 
-    for root, _, files in os.walk(target_docs_dir):
-        for file in files:
-            if file.endswith(".mdx"):
-                filepath = os.path.join(root, file)
-                processed_files_count += 1
-                
-                current_page_astro_path = get_astro_path_from_filepath(filepath, target_docs_dir)
-                if current_page_astro_path is None:
-                    print(f"Warning: Could not determine Astro path for {filepath}, skipping anchor conversion for it.")
-                    continue
-                
-                if convert_anchors_in_file(filepath, title_to_astro_path, current_page_astro_path):
-                    modified_files_count += 1
-    
-    print(f"\nProcessed {processed_files_count} .mdx files.")
+    if graph is not None:
+        save_converted_titles(graph, astro_paths.values(), title_to_astro_path)
+
+    print(f"\nProcessed {len(tasks)} .mdx files" + (f" (skipped {len(mdx_files) - len(tasks)} unchanged)." if incremental else "."))
     print(f"Converted title-based anchor links in {modified_files_count} files.")
+    print_errors(errors)
     print("Internal anchor conversion complete.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,9 +1,38 @@
 # run_fix_misplaced_imports.py
 
+import argparse
 import os
-import re
 import config # Assuming your config.py has TARGET_DOCS_DIR
 
+from mdx_document import MdxDocument
+from page_pool import add_jobs_argument, print_errors, run_ordered
+
+def fix_misplaced_imports_in_document(doc, filepath):
+    """
+    Finds any import statements within the frontmatter of a parsed .mdx document
+    and moves them to appear immediately after the frontmatter.
+    Returns the number of imports moved; `filepath` is only used for messages.
+    """
+    # Imports inside the frontmatter ('import ...' and 'import type ...' lines)
+    misplaced_imports = [imp for imp in doc.imports if imp.in_frontmatter]
+    if not misplaced_imports:
+        return 0
+
+    print(f"Found and moving misplaced imports in: {filepath}")
+    text = doc.text
+    frontmatter_end = doc.frontmatter.end
+    moved_lines = "".join(text[imp.start:imp.end].rstrip('\n') + '\n' for imp in misplaced_imports) # Ensure each has a newline
+
+    # Add a blank line after the imports if content follows and doesn't start with a blank line
+    content_after_frontmatter = text[frontmatter_end:]
+    if content_after_frontmatter and content_after_frontmatter.split('\n', 1)[0].strip() != "":
+        moved_lines += '\n'
+
+    edits = [(imp.start, imp.end, "") for imp in misplaced_imports]
+    edits.append((frontmatter_end, frontmatter_end, moved_lines))
+    doc.apply_edits(edits)
+    return len(misplaced_imports)
+
 def fix_misplaced_imports_in_file(filepath):
     """
     Reads an .mdx file, finds any import statements within the frontmatter,
@@ -11,87 +40,29 @@ def fix_misplaced_imports_in_file(filepath):
     """
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+            content = f.read()
     except Exception as e:
         print(f"Error reading file {filepath}: {e}")
         return False
 
-    if not lines or not lines[0].strip() == '---':
-        # Not a valid frontmatter file or empty
+    doc = MdxDocument(content)
+    if not fix_misplaced_imports_in_document(doc, filepath):
         return False
 
-    frontmatter_end_index = -1
-    for i in range(1, len(lines)):
-        if lines[i].strip() == '---':
-            frontmatter_end_index = i
-            break
-    
-    if frontmatter_end_index == -1:
-        # No closing frontmatter found
+    try:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(doc.text)
+        print(f"  Fixed: {filepath}")
+        return True
+    except Exception as e:
+        print(f"  Error writing fixed file {filepath}: {e}")
         return False
 
-    frontmatter_lines = lines[1:frontmatter_end_index]
-    content_after_frontmatter = lines[frontmatter_end_index+1:]
-    
-    misplaced_imports = []
-    remaining_frontmatter_lines = []
-    modified = False
-
-    for line in frontmatter_lines:
-        # Basic check for import statements (can be made more robust if needed)
-        # Handles 'import ...' and 'import type ...'
-        if line.strip().startswith('import ') or line.strip().startswith('import type '):
-            misplaced_imports.append(line)
-            modified = True
-        else:
-            remaining_frontmatter_lines.append(line)
-
-    if modified:
-        print(f"Found and moving misplaced imports in: {filepath}")
-        
-        # Reconstruct the file content
-        new_lines = [lines[0]] # Start with '---'
-        new_lines.extend(remaining_frontmatter_lines)
-        new_lines.append(lines[frontmatter_end_index]) # Add closing '---'
-        
-        # Add a blank line after frontmatter if there are imports and content following
-        if misplaced_imports and (content_after_frontmatter or any(l.strip() for l in misplaced_imports)):
-             # Check if there's already a blank line or if imports already have one
-            if not (content_after_frontmatter and not content_after_frontmatter[0].strip() == "" ) and \
-               not (misplaced_imports and misplaced_imports[-1].strip() == ""):
-                 # Add blank line if needed before adding imports,
-                 # but only if there's content after or imports themselves don't end with a blank line.
-                 # This logic is a bit tricky to ensure perfect spacing. A simpler approach is to always add one
-                 # if there wasn't one after frontmatter.
-                 # Let's ensure imports are followed by a blank line if there's main content.
-                pass # The natural flow will handle spacing
-
-        # Add the misplaced imports
-        for imp_line in misplaced_imports:
-            new_lines.append(imp_line.rstrip('\n') + '\n') # Ensure it has a newline
-
-        # Add a blank line after imports if there's content following and imports don't end with one
-        if content_after_frontmatter and misplaced_imports and misplaced_imports[-1].strip() != "":
-            if not content_after_frontmatter[0].strip() == "": # If content doesn't start with blank
-                 new_lines.append('\n')
-        elif not content_after_frontmatter and misplaced_imports and misplaced_imports[-1].strip() != "":
-            # If no content after, but imports don't end blank, ensure it's clean.
-             pass
-
-
-        new_lines.extend(content_after_frontmatter)
-        
-        try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.writelines(new_lines)
-            print(f"  Fixed: {filepath}")
-            return True
-        except Exception as e:
-            print(f"  Error writing fixed file {filepath}: {e}")
-            return False
-    return False
-
 def main():
+    parser = argparse.ArgumentParser(description="Move import statements out of the frontmatter of .mdx files.")
+    add_jobs_argument(parser)
+    args = parser.parse_args()
+
     print("Starting script to fix misplaced imports...")
     target_docs_dir = config.TARGET_DOCS_DIR
     
@@ -99,19 +70,20 @@ def main():
         print(f"Error: Target documents directory '{target_docs_dir}' not found.")
         return
 
+    mdx_files = [os.path.join(root, file) for root, _, files in os.walk(target_docs_dir)
+                 for file in files if file.endswith(".mdx")] # Or .md if you use those too
     fixed_files_count = 0
-    processed_files_count = 0
+    errors = []
 
-    for root, _, files in os.walk(target_docs_dir):
-        for file in files:
-            if file.endswith(".mdx"): # Or .md if you use those too
-                filepath = os.path.join(root, file)
-                processed_files_count += 1
-                if fix_misplaced_imports_in_file(filepath):
-                    fixed_files_count += 1
+    for (filepath,), fixed, error in run_ordered(fix_misplaced_imports_in_file, [(f,) for f in mdx_files], args.jobs):
+        if error:
+            errors.append((filepath, error))
+        elif fixed:
+            fixed_files_count += 1
     
-    print(f"\nProcessed {processed_files_count} .mdx files.")
+    print(f"\nProcessed {len(mdx_files)} .mdx files.")
     print(f"Found and fixed misplaced imports in {fixed_files_count} files.")
+    print_errors(errors)
     print("Misplaced imports check complete.")
 
 if __name__ == "__main__":
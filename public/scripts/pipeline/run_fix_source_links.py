@@ -1,9 +1,20 @@
+import argparse
 import os
 import re
+import time
 from pathlib import Path
-from urllib.parse import urljoin
 import config # type: ignore
 
+from mdx_document import MdxDocument
+from page_pool import add_jobs_argument, print_errors, run_ordered
+from source_index import (configured_sources, line_fragment_for, parse_source_reference, remap_link_text, resolve_source_link,
+                          use_configured_sources)
+
+# Link text that can be a source file reference, e.g. "neurons/validator.py:356-437"
+SOURCE_LINK_TEXT_RE = re.compile(r"[\w\.\-\/:]+")
+# Characters that make link text look like a file path
+FILE_PATH_CHARS_RE = re.compile(r"[./\\]")
+
 def sanitize_filename_component(name_str: str) -> str:
     """
     Sanitizes a string to be a valid filename component.
@@ -31,23 +42,8 @@ def parse_filename_and_lines(text_content: str) -> tuple[str, str]:
     Returns:
         tuple[str, str]: A tuple containing the filename and the line fragment (e.g., #L10-L20).
     """
-    # Regex to capture:
-    # 1. Filename (group 1): Allows a-z, A-Z, 0-9, _, ., /, -
-    # 2. Optional line start (group 2): Digits
-    # 3. Optional line end (group 3): Digits, preceded by a hyphen
-    match = re.match(r"([\w\._/-]+)(?::(\d+)(?:-(\d+))?)?", text_content)
-    if match:
-        filename = match.group(1)
-        line_start = match.group(2)
-        line_end = match.group(3)
-
-        line_fragment = ""
-        if line_start and line_end:
-            line_fragment = f"#L{line_start}-L{line_end}"
-        elif line_start:
-            line_fragment = f"#L{line_start}"
-        return filename, line_fragment
-    return text_content, ""
+    filename, line_start, line_end = parse_source_reference(text_content)
+    return filename, line_fragment_for(line_start, line_end)
 
 def create_source_link_component(text: str, href: str) -> str:
     """
@@ -65,156 +61,166 @@ def create_source_link_component(text: str, href: str) -> str:
     href_attr = href.replace('"', "&quot;")
     return f'<SourceLink text="{text_attr}" href="{href_attr}" />'
 
-def process_mdx_file(file_path: Path, github_prefix: str) -> None:
+def follows_source_prefix(text: str, position: int) -> bool:
+    """
+    Checks whether "Sources:", "-" or "*" comes directly before `position`, ignoring whitespace
+    (including newlines) in between.
+    """
+    position -= 1
+    while position >= 0 and text[position].isspace():
+        position -= 1
+    if position < 0:
+        return False
+    return text[position] in "-*" or text[max(0, position - 7):position + 1].lower() == "sources:"
+
+def fix_source_links_in_document(doc: MdxDocument, github_prefix: str) -> int:
+    """
+    Finds source links in a parsed .mdx document and replaces them with <SourceLink> components.
+    Links inside code blocks and inside existing component tags are left alone.
+
+    A link is converted when its text looks like a file path (optionally with lines) and it either
+    follows a list marker or "Sources:" (any href), or its href is empty or the same as its text.
+    Its URL comes from source_index.resolve_source_link, so with SOURCE_CHECKOUT_PATH set the
+    filename is resolved and checked against the source index like SPBCP's own source links, and with
+    DEEPWIKI_SOURCE_REF set the lines (and the 'file:x-y' link text) are moved to GITHUB_REF.
+
+    Args:
+        doc (MdxDocument): The parsed .mdx document; it is edited in place.
+        github_prefix (str): The GitHub blob URL prefix.
+
+    Returns:
+        int: The number of replacements made.
+    """
+    text = doc.text
+    edits = []
+    source_urls = {} # (filename, line_start, line_end) -> (GitHub URL, moved); pages cite the same files many times
+    for link in doc.links:
+        link_text_content = link.text # e.g., "neurons/validator.py:356-437"
+        original_href_content = link.href # e.g., "neurons/validator.py:356-437" or empty
+        if not SOURCE_LINK_TEXT_RE.fullmatch(link_text_content):
+            continue
+
+        # Check if link_text_content looks like a file path.
+        # Basic check: contains '.', '/', or '\' and optionally ':' for line numbers.
+        # And does not contain multiple spaces which might indicate it's not a file path.
+        if not (FILE_PATH_CHARS_RE.search(link_text_content) and "  " not in link_text_content):
+            continue # Not a file path, skip.
+
+        # Links after "Sources:", "- " or "* " are converted whatever their href; others only
+        # if the href is empty or the same as the text (indicating it needs conversion).
+        if not (original_href_content == "" or original_href_content == link_text_content
+                or follows_source_prefix(text, link.start)):
+            continue
+
+        filename_part, line_start, line_end = parse_source_reference(link_text_content)
+        if not filename_part:
+            continue # Could not parse, skip
+
+        source_key = (filename_part, line_start, line_end)
+        if source_key not in source_urls:
+            source_urls[source_key] = resolve_source_link(*source_key, github_prefix=github_prefix)
+        resolved_github_url, moved = source_urls[source_key]
+        if moved:
+            link_text_content = remap_link_text(link_text_content, moved[0], line_start, line_end, *moved[1:])
+        edits.append((link.start, link.end, create_source_link_component(link_text_content, resolved_github_url)))
+
+    return doc.apply_edits(edits)
+
+
+def process_mdx_file(file_path: Path, github_prefix: str) -> int:
     """
     Processes a single .mdx file to find and replace source links.
+    The file is tokenized once and rewritten in a single pass (linear in its size).
 
     Args:
         file_path (Path): The path to the .mdx file.
         github_prefix (str): The GitHub blob URL prefix.
+
+    Returns:
+        int: The number of replacements made. Read/write errors are raised to the caller.
+    """
+    doc = MdxDocument(file_path.read_text(encoding="utf-8"))
+    replacements_made = fix_source_links_in_document(doc, github_prefix)
+
+    if replacements_made > 0:
+        print(f"  Processed: {file_path.name} - {replacements_made} replacements made.")
+        file_path.write_text(doc.text, encoding="utf-8")
+    # else:
+        # print(f"  No changes for: {file_path.name}")
+    return replacements_made
+
+def process_mdx_file_with_sources(sources: tuple, file_path: Path, github_prefix: str) -> int:
     """
-    try:
-        content = file_path.read_text(encoding="utf-8")
-        original_content = content
-        
-        replacements_made = 0
-
-        def replacer_function(match: re.Match) -> str:
-            nonlocal replacements_made
-            full_match_text = match.group(0)
-            
-            # If the match already contains <SourceLink, skip it.
-            if "<SourceLink" in full_match_text:
-                return full_match_text
-
-            prefix = match.group(1) # "Sources: " or "- " or "  - " etc.
-            link_text_content = match.group(3) # e.g., "neurons/validator.py:356-437"
-            original_href_content = match.group(4) # e.g., "neurons/validator.py:356-437" or empty
-
-            # Check if link_text_content looks like a file path.
-            # Basic check: contains '.', '/', or '\' and optionally ':' for line numbers.
-            # And does not contain multiple spaces which might indicate it's not a file path.
-            if not (re.search(r"[./\\]", link_text_content) and "  " not in link_text_content):
-                 # print(f"    Skipping potential non-file link text: {link_text_content}")
-                 return full_match_text # Not a file path, skip.
-
-            filename_part, line_fragment = parse_filename_and_lines(link_text_content)
-
-            if not filename_part:
-                # print(f"    Could not parse filename from: {link_text_content}")
-                return full_match_text # Could not parse, skip
-
-            # Construct GitHub URL
-            target_url = github_prefix
-            if not target_url.endswith('/'):
-                target_url += '/'
-            
-            resolved_github_url = urljoin(target_url, filename_part.lstrip('/')) + line_fragment
-            
-            component = create_source_link_component(link_text_content, resolved_github_url)
-            replacements_made += 1
-            # print(f"    Replacing: '[{link_text_content}]({original_href_content or ''})' with '{component}'")
-            return f"{prefix}{component}"
-
-        # Simplified regex pattern without variable-width lookbehind
-        # Pattern matches: prefix + [text](optional_href)
-        # where text looks like a file path and href is empty or same as text
-        specific_pattern = r"(Sources:\s*|\*\s*|\-\s*|\s*\-\s+)(\[([\w\.\-\/:]+)\]\(([^\)]*)\))"
-        
-        # Apply the regex substitution
-        content = re.sub(specific_pattern, replacer_function, content, flags=re.IGNORECASE)
-        
-        # Second pass: Find any remaining unconverted markdown links
-        # This catches links on mixed lines that have both SourceLink components and unconverted links
-        # Use a more targeted approach to find [filename:lines]() patterns that are NOT inside SourceLink components
-        
-        def final_replacer(match: re.Match) -> str:
-            nonlocal replacements_made
-            link_text_content = match.group(1)
-            original_href_content = match.group(2)
-            
-            # Check if it looks like a file path
-            if not (re.search(r"[./\\]", link_text_content) and "  " not in link_text_content):
-                return match.group(0)
-                
-            # Check if href is empty or same as text (indicating it needs conversion)
-            if original_href_content == "" or original_href_content == link_text_content:
-                filename_part, line_fragment = parse_filename_and_lines(link_text_content)
-                
-                if filename_part:
-                    target_url = github_prefix
-                    if not target_url.endswith('/'):
-                        target_url += '/'
-                    
-                    resolved_github_url = urljoin(target_url, filename_part.lstrip('/')) + line_fragment
-                    component = create_source_link_component(link_text_content, resolved_github_url)
-                    replacements_made += 1
-                    return component
-            
-            return match.group(0)
-        
-        # Pattern to find [text](href) that are NOT inside SourceLink text or href attributes
-        # Split content around SourceLink components and only process the parts outside them
-        sourcelink_pattern = r'<SourceLink[^>]*>'
-        parts = re.split(sourcelink_pattern, content)
-        processed_parts = []
-        
-        for i, part in enumerate(parts):
-            if i % 2 == 0:  # This is content outside SourceLink components
-                # Apply conversion to markdown links in this part
-                link_pattern = r'\[([\w\.\-\/:]+)\]\(([^\)]*)\)'
-                processed_part = re.sub(link_pattern, final_replacer, part)
-                processed_parts.append(processed_part)
-            else:  # This would be SourceLink component content, but we split on tags, so this shouldn't happen
-                processed_parts.append(part)
-        
-        # Reconstruct content by finding and reinserting the SourceLink components
-        final_content = content
-        link_pattern = r'\[([\w\.\-\/:]+)\]\(([^\)]*)\)'
-        
-        # Use a different approach: process the content while preserving SourceLink components
-        # Find all SourceLink components and their positions
-        sourcelink_matches = list(re.finditer(r'<SourceLink[^>]*>', content))
-        
-        if sourcelink_matches:
-            # Process content in segments between SourceLink components
-            new_content = ""
-            last_end = 0
-            
-            for sl_match in sourcelink_matches:
-                # Process content before this SourceLink
-                segment = content[last_end:sl_match.start()]
-                processed_segment = re.sub(link_pattern, final_replacer, segment)
-                new_content += processed_segment
-                
-                # Add the SourceLink component unchanged
-                new_content += sl_match.group(0)
-                last_end = sl_match.end()
-            
-            # Process remaining content after the last SourceLink
-            remaining_segment = content[last_end:]
-            processed_remaining = re.sub(link_pattern, final_replacer, remaining_segment)
-            new_content += processed_remaining
-            
-            content = new_content
-        else:
-            # No SourceLink components found, process the whole content
-            content = re.sub(link_pattern, final_replacer, content)
-
-        if replacements_made > 0:
-            print(f"  Processed: {file_path.name} - {replacements_made} replacements made.")
-            file_path.write_text(content, encoding="utf-8")
-        # else:
-            # print(f"  No changes for: {file_path.name}")
-
-    except Exception as e:
-        print(f"Error processing file {file_path}: {e}")
+    process_mdx_file in a page_pool worker, with the (source index, line map) main() loaded
+    (source_index.configured_sources) instead of loading them again in every worker process.
+    """
+    use_configured_sources(sources)
+    return process_mdx_file(file_path, github_prefix)
+
+
+BENCHMARK_SECTION = """## Section {n}
+
+The validator compares scores where a < b and c >= d. See [Overview](#overview) for details.
+
+Sources: [neurons/validator.py:{n}-{m}]() [compute/utils/math.py:{n}]()
+
+- [neurons/miner.py](neurons/miner.py)
+* [scripts/run_{n}.sh:1-4]()
+<SourceLink text="neurons/api.py:{n}" href="https://github.com/org/repo/blob/main/neurons/api.py#L{n}" /> and [docs/{n}.md]()
+
+```python
+# Not a heading, and [not/a/link.py]() inside code
+value = compute({n})
+```
+
+```mermaid
+graph TD
+    A["score = {n}"] --> B["weight"]
+```
+
+"""
+
+def build_benchmark_mdx(size_bytes: int) -> str:
+    """Builds a synthetic .mdx page of at least `size_bytes` characters."""
+    parts = ['---\ntitle: "Benchmark"\n---\n\nimport SourceLink from \'@components/SourceLink.astro\';\n\n']
+    total = len(parts[0])
+    n = 0
+    while total < size_bytes:
+        n += 1
+        section = BENCHMARK_SECTION.format(n=n, m=n + 40)
+        parts.append(section)
+        total += len(section)
+    return "".join(parts)
+
+def run_benchmark(size_mb: float, github_prefix: str) -> None:
+    """Times tokenizing and rewriting synthetic pages of growing size (linear scaling keeps MB/s flat)."""
+    print(f"Benchmarking source link rewriting on synthetic MDX up to {size_mb:g} MB...")
+    for fraction in (0.25, 0.5, 1.0):
+        content = build_benchmark_mdx(int(size_mb * fraction * 1024 * 1024))
+        size = len(content.encode("utf-8")) / (1024 * 1024)
+        start = time.perf_counter()
+        doc = MdxDocument(content)
+        replacements_made = fix_source_links_in_document(doc, github_prefix)
+        elapsed = time.perf_counter() - start
+        second_pass = fix_source_links_in_document(MdxDocument(doc.text), github_prefix)
+        print(f"  {size:6.2f} MB: {elapsed:6.2f}s ({size / elapsed:5.1f} MB/s), {replacements_made} replacements, "
+              f"{second_pass} on a second pass")
 
 
 def main():
     """
     Main function to iterate through .mdx files and process them.
     """
+    parser = argparse.ArgumentParser(description="Convert source file links in .mdx files into <SourceLink> components.")
+    parser.add_argument("--benchmark", action="store_true", help="Time the rewriter on a synthetic MDX file instead of processing TARGET_DOCS_DIR.")
+    parser.add_argument("--benchmark-size-mb", type=float, default=10, help="Size of the synthetic file for --benchmark (default: 10).")
+    add_jobs_argument(parser)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark_size_mb, config.GITHUB_BLOB_URL_PREFIX or "https://github.com/org/repo/blob/main/")
+        return
+
     print("Starting Source Link Fixer script...")
     
     target_docs_dir = Path(config.TARGET_DOCS_DIR)
@@ -230,18 +236,23 @@ def main():
     
     print(f"Scanning .mdx files in: {target_docs_dir}")
     print(f"Using GitHub prefix: {github_url_prefix}")
+    sources = configured_sources() # index (or load) the source checkout and line maps once, and hand them to the workers
 
     mdx_files_processed = 0
-    for mdx_file in target_docs_dir.rglob("*.mdx"):
-        # print(f"Found file: {mdx_file}")
-        process_mdx_file(mdx_file, github_url_prefix)
+    errors = []
+    tasks = [(mdx_file, github_url_prefix) for mdx_file in target_docs_dir.rglob("*.mdx")]
+    for (mdx_file, _), _, error in run_ordered(process_mdx_file_with_sources, tasks, args.jobs, context=sources):
         mdx_files_processed += 1
+        if error:
+            print(f"Error processing file {mdx_file}: {error}")
+            errors.append((mdx_file, error))
     
     if mdx_files_processed == 0:
         print("No .mdx files found in the target directory.")
     else:
         print(f"Finished processing {mdx_files_processed} .mdx files.")
 
+    print_errors(errors)
     print("Source Link Fixer script completed.")
 
 if __name__ == "__main__":
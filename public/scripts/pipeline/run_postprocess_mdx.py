@@ -0,0 +1,164 @@
+# run_postprocess_mdx.py
+# Runs all .mdx post-processing passes (steps 4-7 and the sanitizer) in a single sweep of TARGET_DOCS_DIR
+
+import argparse
+import os
+
+import config
+from mdx_document import MdxDocument
+from page_pool import add_jobs_argument, print_errors, run_ordered
+from run_convert_internal_anchors import (anchor_title_refs, convert_anchors_in_document, get_astro_path_from_filepath,
+                                         load_configured_title_map, load_link_graph, record_anchor_refs, save_converted_titles)
+from run_fix_misplaced_imports import fix_misplaced_imports_in_document
+from run_fix_source_links import fix_source_links_in_document
+from run_remove_redundant_h1s import remove_redundant_h1_in_document
+from run_sanitize_mdx import sanitize_mdx_document
+from source_index import configured_sources, use_configured_sources
+
+# Registered transforms, in pipeline order: (name, function(doc, filepath, context) -> change_count).
+# Each one queries and edits the shared MdxDocument of the file.
+TRANSFORMS = []
+
+def register_transform(name):
+    def decorator(func):
+        TRANSFORMS.append((name, func))
+        return func
+    return decorator
+
+@register_transform("remove_redundant_h1s")
+def transform_remove_redundant_h1s(doc, filepath, context):
+    return remove_redundant_h1_in_document(doc, filepath)
+
+@register_transform("fix_misplaced_imports")
+def transform_fix_misplaced_imports(doc, filepath, context):
+    return fix_misplaced_imports_in_document(doc, filepath)
+
+@register_transform("convert_internal_anchors")
+def transform_convert_internal_anchors(doc, filepath, context):
+    current_page_astro_path = get_astro_path_from_filepath(filepath, context["docs_dir"])
+    if current_page_astro_path is None:
+        print(f"Warning: Could not determine Astro path for {filepath}, skipping anchor conversion for it.")
+        return 0
+    return convert_anchors_in_document(doc, filepath, context["title_map"], current_page_astro_path, context["previous_title_map"])
+
+@register_transform("fix_source_links")
+def transform_fix_source_links(doc, filepath, context):
+    return fix_source_links_in_document(doc, context["github_prefix"])
+
+@register_transform("sanitize_mdx")
+def transform_sanitize_mdx(doc, filepath, context):
+    return sanitize_mdx_document(doc)
+
+
+def postprocess_file(context, filepath):
+    """
+    Reads and parses an .mdx file once, runs context["transforms"] on the document and writes it back
+    only if it changed. Returns (written, {transform name: change count}, anchor title refs), where the
+    anchor title refs (run_convert_internal_anchors.anchor_title_refs of the result) are None unless
+    convert_internal_anchors ran and the file was read and written without errors.
+    """
+    change_counts = {}
+    use_configured_sources(context["sources"])
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            original_content = f.read()
+    except Exception as e:
+        print(f"Error reading file {filepath}: {e}")
+        return False, change_counts, None
+
+    doc = MdxDocument(original_content)
+    anchors_converted = False
+    for name, transform in context["transforms"]:
+        try:
+            change_count = transform(doc, filepath, context)
+        except Exception as e:
+            print(f"Error in {name} for {filepath}: {e}")
+            continue
+        if name == "convert_internal_anchors":
+            anchors_converted = True
+        if change_count:
+            change_counts[name] = change_count
+    title_refs = anchor_title_refs(doc, context["title_map"]) if anchors_converted else None
+
+    if doc.text == original_content:
+        return False, change_counts, title_refs
+    try:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(doc.text)
+        return True, change_counts, title_refs
+    except Exception as e:
+        print(f"  Error writing updated file {filepath}: {e}")
+        return False, change_counts, None
+
+def main():
+    transform_names = [name for name, _ in TRANSFORMS]
+    parser = argparse.ArgumentParser(
+        description="Run the .mdx post-processing passes (" + ", ".join(transform_names) + ") in one read/write sweep."
+    )
+    parser.add_argument("directory", nargs="?", default=config.TARGET_DOCS_DIR,
+                        help="Directory to scan for .mdx files (default: TARGET_DOCS_DIR).")
+    parser.add_argument("--skip", action="append", default=[], choices=transform_names, metavar="TRANSFORM",
+                        help="Leave out a transform (repeatable). One of: " + ", ".join(transform_names) + ".")
+    add_jobs_argument(parser)
+    args = parser.parse_args()
+
+    print("Starting fused .mdx post-processing...")
+    docs_dir = args.directory
+    if not os.path.isdir(docs_dir):
+        print(f"Error: Target documents directory '{docs_dir}' not found.")
+        return
+
+    skipped = set(args.skip)
+    context = {"docs_dir": docs_dir, "title_map": {}, "previous_title_map": None, "github_prefix": config.GITHUB_BLOB_URL_PREFIX}
+    graph = None
+    if "convert_internal_anchors" not in skipped:
+        # Same title map and link graph bookkeeping as run_convert_internal_anchors.py, so its incremental
+        # runs know which pages were converted here and with which titles. The graph describes TARGET_DOCS_DIR only.
+        if os.path.abspath(docs_dir) == os.path.abspath(config.TARGET_DOCS_DIR):
+            graph = load_link_graph()
+        context["title_map"] = graph.titles() if graph is not None else load_configured_title_map()
+        context["previous_title_map"] = graph.converted_titles if graph is not None else None
+        if not context["title_map"]:
+            graph = None
+            print("Failed to load title-to-Astro path map. Skipping convert_internal_anchors.")
+            skipped.add("convert_internal_anchors")
+    if "fix_source_links" not in skipped and not context["github_prefix"]:
+        print("Error: GITHUB_BLOB_URL_PREFIX is not configured in config.py. Skipping fix_source_links.")
+        skipped.add("fix_source_links")
+    # Index (or load) the source checkout and line maps once, and hand them to the workers in the context.
+    context["sources"] = configured_sources() if "fix_source_links" not in skipped else (None, None)
+    transforms = [(name, transform) for name, transform in TRANSFORMS if name not in skipped]
+    print("Transforms: " + ", ".join(name for name, _ in transforms))
+
+    context["transforms"] = transforms
+    mdx_files = [os.path.join(root, file) for root, _, files in os.walk(docs_dir)
+                 for file in files if file.endswith(".mdx")]
+    stats = {name: {"files": 0, "changes": 0} for name, _ in transforms}
+    processed_files_count = 0
+    written_files_count = 0
+    errors = []
+    for (filepath,), outcome, error in run_ordered(postprocess_file, [(f,) for f in mdx_files], args.jobs, context=context):
+        processed_files_count += 1
+        if error:
+            errors.append((filepath, error))
+            continue
+        written, change_counts, title_refs = outcome
+        if written:
+            written_files_count += 1
+        astro_path = get_astro_path_from_filepath(filepath, docs_dir) if graph is not None else None
+        if astro_path is not None:
+            record_anchor_refs(graph, astro_path, filepath, docs_dir, title_refs)
+        for name, change_count in change_counts.items():
+            stats[name]["files"] += 1
+            stats[name]["changes"] += change_count
+    print_errors(errors)
+    if graph is not None:
+        save_converted_titles(graph, [get_astro_path_from_filepath(f, docs_dir) for f in mdx_files], context["title_map"])
+
+    print(f"\nProcessed {processed_files_count} .mdx files, wrote {written_files_count}.")
+    for name, _ in transforms:
+        print(f"  {name}: {stats[name]['changes']} changes in {stats[name]['files']} files")
+    print("Post-processing complete.")
+
+if __name__ == "__main__":
+    main()
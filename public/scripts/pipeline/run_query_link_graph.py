@@ -0,0 +1,67 @@
+# run_query_link_graph.py
+# Queries the persisted link graph (titles, page links and anchor link references)
+
+import argparse
+import os
+
+import config
+from link_graph import LinkGraph, normalize_title
+
+def cmd_title(graph, args):
+    astro_path = graph.titles().get(normalize_title(args.title))
+    print(f"'{args.title}' -> {astro_path or '(no page with this title)'}")
+    referring_pages = graph.pages_referring_to_title(args.title)
+    print(f"{len(referring_pages)} pages have anchor links with this text:")
+    for page_path in referring_pages:
+        print(f"  {page_path}")
+
+def cmd_links_from(graph, args):
+    page = graph.page_for_path(args.path)
+    if page is None:
+        print(f"No page with Astro path '{args.path}'.")
+        return
+    print(f"'{page['title']}' ({args.path}) links to {len(page['links'])} pages:")
+    for target_path in page["links"]:
+        print(f"  {target_path}")
+
+def cmd_links_to(graph, args):
+    linking_pages = graph.pages_linking_to(args.path)
+    print(f"{len(linking_pages)} pages link to '{args.path}':")
+    for page_path in linking_pages:
+        print(f"  {page_path}")
+
+def cmd_changed_titles(graph, args):
+    changed_titles = sorted(graph.changed_titles())
+    print(f"{len(changed_titles)} titles changed since the last anchor conversion:")
+    for title in changed_titles:
+        print(f"  '{title}': {(graph.converted_titles or {}).get(title)} -> {graph.titles().get(title)} "
+              f"({len(graph.pages_referring_to_title(title))} referring pages)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the link graph kept by CDI, SPBCP and run_convert_internal_anchors.py.")
+    parser.add_argument("--graph", default=config.LINK_GRAPH_PATH, help="Path to the link graph JSON file.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    title = subparsers.add_parser("title", help="Show a title's Astro path and the pages whose anchor links refer to it.")
+    title.add_argument("title")
+    title.set_defaults(func=cmd_title)
+
+    links_from = subparsers.add_parser("links-from", help="List the pages a page links to.")
+    links_from.add_argument("path", help="Astro path, e.g. /miner-system")
+    links_from.set_defaults(func=cmd_links_from)
+
+    links_to = subparsers.add_parser("links-to", help="List the pages that link to a page.")
+    links_to.add_argument("path", help="Astro path, e.g. /miner-system")
+    links_to.set_defaults(func=cmd_links_to)
+
+    changed = subparsers.add_parser("changed-titles", help="List titles added, moved or removed since the last anchor conversion.")
+    changed.set_defaults(func=cmd_changed_titles)
+
+    args = parser.parse_args()
+    if not os.path.exists(args.graph):
+        print(f"Error: Link graph not found at {args.graph}. Run CDI, SPBCP or run_convert_internal_anchors.py first.")
+        return
+    args.func(LinkGraph(args.graph), args)
+
+if __name__ == "__main__":
+    main()
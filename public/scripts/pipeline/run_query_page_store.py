@@ -0,0 +1,87 @@
+# run_query_page_store.py
+# Queries, imports and exports the CDI SQLite page store
+
+import argparse
+import json
+import os
+
+import config
+from page_store import PageStore
+
+def print_page_summary(page_data):
+    print(f"'{page_data['title']}' ({page_data['original_deepwiki_href']}) -> '{page_data['target_astro_path']}'")
+    print(f"  Level {page_data['level']}, {len(page_data['main_markdown_content'] or '')} chars, "
+          f"{len(page_data['resolved_links'])} links, {len(page_data['mermaid_diagrams'])} diagrams")
+
+def cmd_links_to(store, args):
+    results = store.pages_linking_to(args.target)
+    if not results:
+        print(f"No pages link to '{args.target}'.")
+        return
+    print(f"{len(results)} links to '{args.target}':")
+    for title, deepwiki_href, link in results:
+        print(f"  '{title}' ({deepwiki_href}): [{link['text']}] ({link['context']})")
+
+def cmd_page(store, args):
+    page_data = store.get_page(args.key) or store.find_page_by_astro_path(args.key)
+    if not page_data:
+        print(f"No page with DeepWiki href or Astro path '{args.key}'.")
+        return
+    print_page_summary(page_data)
+    for link in page_data["resolved_links"]:
+        print(f"  [{link['context']}] {link['text']} -> {link['href'] or link['original_deepwiki_href']}")
+
+def cmd_title(store, args):
+    pages = store.find_pages_by_title(args.title)
+    if not pages:
+        print(f"No page titled '{args.title}'.")
+    for page_data in pages:
+        print_page_summary(page_data)
+
+def cmd_import(store, args):
+    with open(args.json, "r", encoding="utf-8") as f:
+        site_map = json.load(f)
+    store.replace_site_map(site_map)
+    print(f"Imported {len(site_map)} pages from {args.json} into {store.path}.")
+
+def cmd_export(store, args):
+    exported_count = store.export_json(args.json)
+    print(f"Exported {exported_count} pages from {store.path} to {args.json}.")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Query the CDI page store, or convert it to/from ingested_deepwiki_data.json."
+    )
+    parser.add_argument("--store", default=config.PAGE_STORE_PATH, help="Path to the SQLite page store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    links_to = subparsers.add_parser("links-to", help="List the pages that link to an Astro path, DeepWiki href or source file.")
+    links_to.add_argument("target")
+    links_to.set_defaults(func=cmd_links_to)
+
+    page = subparsers.add_parser("page", help="Show a page by DeepWiki href or target Astro path.")
+    page.add_argument("key")
+    page.set_defaults(func=cmd_page)
+
+    title = subparsers.add_parser("title", help="Find pages by title (case-insensitive).")
+    title.add_argument("title")
+    title.set_defaults(func=cmd_title)
+
+    import_json = subparsers.add_parser("import", help="Load an ingested_deepwiki_data.json into the store.")
+    import_json.add_argument("--json", default=config.INGESTED_DATA_JSON_PATH)
+    import_json.set_defaults(func=cmd_import)
+
+    export_json = subparsers.add_parser("export", help="Write the store out as ingested_deepwiki_data.json.")
+    export_json.add_argument("--json", default=config.INGESTED_DATA_JSON_PATH)
+    export_json.set_defaults(func=cmd_export)
+
+    args = parser.parse_args()
+    if args.command != "import" and not os.path.exists(args.store):
+        print(f"Error: Page store not found at {args.store}. Run CDI with PAGE_STORE_ENABLED or use 'import' first.")
+        return
+
+    with PageStore(args.store) as store:
+        args.func(store, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# run_remap_source_links.py
+# Moves the SourceLink line anchors of the generated .mdx pages from one source ref to another (no re-scraping)
+
+import argparse
+import os
+import re
+
+import config
+from mdx_document import MdxDocument
+from page_pool import add_jobs_argument, print_errors, run_ordered
+from source_index import SourceIndexError, build_line_map, line_fragment_for, parse_source_href, remap_link_text
+
+ATTRIBUTE_RE = re.compile(r'(?<![\w-])(href|text)="([^"]*)"')
+
+def blob_url_prefix(ref):
+    return f"{config.GITHUB_REPO_URL}/blob/{ref}/"
+
+def remap_source_links_in_document(doc, filepath, line_map, from_ref, to_ref):
+    """
+    Points every <SourceLink> at from_ref to to_ref, moving its #Lx-Ly range (and a matching 'file:x-y' text)
+    by the line map. Links whose lines changed are left at from_ref, where they are still accurate.
+    Returns (links moved to to_ref, links left at from_ref).
+    """
+    from_prefix, to_prefix = blob_url_prefix(from_ref), blob_url_prefix(to_ref)
+    edits = []
+    left_count = 0
+    for component in doc.components:
+        if component.name != "SourceLink" or component.closing:
+            continue
+        tag = doc.text[component.start:component.end]
+        attributes = dict(ATTRIBUTE_RE.findall(tag))
+        href = attributes.get("href", "")
+        if not href.startswith(from_prefix):
+            continue
+        filename, line_start, line_end, fragment = parse_source_href(href[len(from_prefix):])
+        new_filename, new_start, new_end, problem = line_map.map_range(filename, line_start, line_end)
+        if problem:
+            print(f"  Warning: {filepath}: {filename}{line_fragment_for(line_start, line_end)}: {problem}; left at {from_ref}.")
+            left_count += 1
+            continue
+        new_values = {
+            "href": to_prefix + new_filename + (line_fragment_for(new_start, new_end) or (f"#{fragment}" if fragment else "")),
+            "text": remap_link_text(attributes.get("text", ""), filename, line_start, line_end, new_filename, new_start, new_end),
+        }
+        new_tag = ATTRIBUTE_RE.sub(lambda match: f'{match.group(1)}="{new_values[match.group(1)]}"', tag)
+        edits.append((component.start, component.end, new_tag))
+    doc.apply_edits(edits)
+    return len(edits), left_count
+
+def remap_source_links_in_file(remap_context, filepath):
+    """Remaps one .mdx file (remap_context is (line_map, from_ref, to_ref)); returns remap_source_links_in_document's counts."""
+    line_map, from_ref, to_ref = remap_context
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except Exception as e:
+        print(f"Error reading file {filepath}: {e}")
+        return 0, 0
+
+    doc = MdxDocument(content)
+    moved_count, left_count = remap_source_links_in_document(doc, filepath, line_map, from_ref, to_ref)
+    if doc.text != content:
+        try:
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(doc.text)
+            print(f"  Remapped {moved_count} source links in: {filepath}")
+        except Exception as e:
+            print(f"  Error writing updated file {filepath}: {e}")
+            return 0, left_count
+    return moved_count, left_count
+
+def main():
+    parser = argparse.ArgumentParser(description="Move SourceLink line anchors in the generated pages from one source ref to another.")
+    parser.add_argument("directory", nargs="?", default=config.TARGET_DOCS_DIR,
+                        help="Directory to scan for .mdx files (default: TARGET_DOCS_DIR).")
+    parser.add_argument("--from", dest="from_ref", default=config.DEEPWIKI_SOURCE_REF,
+                        help="Ref the links currently point at (default: DEEPWIKI_SOURCE_REF).")
+    parser.add_argument("--to", dest="to_ref", default=config.GITHUB_REF, help="Ref to move them to (default: GITHUB_REF).")
+    parser.add_argument("--checkout", default=config.SOURCE_CHECKOUT_PATH,
+                        help="Local clone of GITHUB_REPO_URL with both refs fetched (default: SOURCE_CHECKOUT_PATH).")
+    add_jobs_argument(parser)
+    args = parser.parse_args()
+
+    if not args.from_ref or args.from_ref == args.to_ref:
+        print("Error: Give the ref the links point at with --from (or DEEPWIKI_SOURCE_REF), different from the target ref.")
+        return
+    if not args.checkout:
+        print("Error: No source checkout given. Set SOURCE_CHECKOUT_PATH in config.py or pass --checkout.")
+        return
+    if not os.path.isdir(args.directory):
+        print(f"Error: Target documents directory '{args.directory}' not found.")
+        return
+    try:
+        line_map = build_line_map(args.checkout, args.from_ref, args.to_ref, config.SOURCE_LINE_MAP_CACHE_PATH)
+    except (SourceIndexError, OSError) as e:
+        print(f"Error: Could not compute line maps from {args.from_ref} to {args.to_ref}: {e}")
+        return
+
+    print(f"Remapping source links in '{args.directory}' from {args.from_ref} to {args.to_ref}...")
+    mdx_files = [os.path.join(root, file) for root, _, files in os.walk(args.directory)
+                 for file in files if file.endswith(".mdx")]
+    moved_total = left_total = 0
+    errors = []
+    remap_context = (line_map, args.from_ref, args.to_ref)
+    for (filepath,), counts, error in run_ordered(remap_source_links_in_file, [(f,) for f in mdx_files], args.jobs, context=remap_context):
+        if error:
+            errors.append((filepath, error))
+            continue
+        moved_total += counts[0]
+        left_total += counts[1]
+    print_errors(errors)
+
+    print(f"\nMoved {moved_total} source links to {args.to_ref}; left {left_total} whose file or lines changed at {args.from_ref}.")
+
+if __name__ == "__main__":
+    main()
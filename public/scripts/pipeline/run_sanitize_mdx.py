@@ -2,6 +2,70 @@ import os
 import re
 import argparse
 
+from mdx_document import MdxDocument
+from page_pool import add_jobs_argument, print_errors, run_ordered
+
+def sanitize_mermaid_block(block_text):
+    """
+    Replaces '=' with ':' inside quoted Mermaid node labels, e.g. A["key = value"].
+    Returns the sanitized block and the number of substitutions made.
+    """
+    substitutions = 0
+
+    def sanitize_mermaid_label(match):
+        nonlocal substitutions
+        label_content = match.group(1)
+        substitutions += label_content.count('=')
+        return f'["{label_content.replace("=", ":")}"]'
+
+    # This regex finds labels in Mermaid nodes and applies the sanitization.
+    return re.sub(r'\[\"(.*?)\"\]', sanitize_mermaid_label, block_text), substitutions
+
+def sanitize_markdown_text(text):
+    """
+    Escapes unescaped '<' and '>' characters in Markdown text (outside code blocks).
+    Returns the sanitized text and the number of substitutions made.
+    """
+    substitutions = text.count('<=')
+    text = text.replace('<=', '&lt;=')
+    substitutions += text.count('>=')
+    text = text.replace('>=', '&gt;=')
+    # Handle standalone '<' and '>' carefully to avoid breaking JSX tags.
+    # We use spaces to target relational operators, e.g., "a < b".
+    text, count = re.subn(r'\s<\s', ' &lt; ', text)
+    substitutions += count
+    text, count = re.subn(r'\s>\s', ' &gt; ', text)
+    return text, substitutions + count
+
+def sanitize_mdx_document(doc):
+    """
+    Sanitizes a parsed .mdx document to prevent common parsing errors: Mermaid labels
+    in ```mermaid blocks, and relational operators in the Markdown text. Other code
+    blocks and the frontmatter are left alone.
+
+    Args:
+        doc (MdxDocument): The parsed .mdx document; it is edited in place.
+
+    Returns:
+        int: The number of substitutions made.
+    """
+    text = doc.text
+    edits = []
+    substitutions = 0
+    for block in doc.code_blocks:
+        if block.info.startswith('mermaid'):
+            sanitized, count = sanitize_mermaid_block(text[block.start:block.end])
+            if count:
+                edits.append((block.start, block.end, sanitized))
+                substitutions += count
+    for start, end in doc.prose_ranges():
+        sanitized, count = sanitize_markdown_text(text[start:end])
+        if count:
+            edits.append((start, end, sanitized))
+            substitutions += count
+    doc.apply_edits(edits)
+    return substitutions
+
 def sanitize_mdx_file(file_path):
     """
     Reads an .mdx file, sanitizes its content to prevent common parsing errors,
@@ -17,47 +81,12 @@ def sanitize_mdx_file(file_path):
         print(f"Error reading {file_path}: {e}")
         return
 
-    original_content = content
-    
-    # We split the file into parts: code blocks and markdown text.
-    # This allows us to apply different sanitization rules to each part.
-    parts = re.split(r'(```[\s\S]*?```)', content)
-    
-    sanitized_parts = []
-    for i, part in enumerate(parts):
-        if i % 2 == 1:
-            # This part is a code block.
-            if part.startswith('```mermaid'):
-                # This is a Mermaid diagram. We need to sanitize node labels.
-                # The issue is with '=' inside labels, e.g., A["key = value"].
-                # We replace '=' with ':' inside the quoted label text.
-                def sanitize_mermaid_label(match):
-                    label_content = match.group(1)
-                    sanitized_label = label_content.replace('=', ':')
-                    return f'["{sanitized_label}"]'
-
-                # This regex finds labels in Mermaid nodes and applies the sanitization.
-                part = re.sub(r'\[\"(.*?)\"\]', sanitize_mermaid_label, part)
-            sanitized_parts.append(part)
-        else:
-            # This part is Markdown text.
-            # The issue here is with unescaped '<' and '>' characters.
-            # We replace them with their HTML entity equivalents.
-            part = part.replace('<=', '&lt;=')
-            part = part.replace('>=', '&gt;=')
-            # Handle standalone '<' and '>' carefully to avoid breaking JSX tags.
-            # We use spaces to target relational operators, e.g., "a < b".
-            part = re.sub(r'\s<\s', ' &lt; ', part)
-            part = re.sub(r'\s>\s', ' &gt; ', part)
-            sanitized_parts.append(part)
-
-    sanitized_content = "".join(sanitized_parts)
-
-    if sanitized_content != original_content:
+    doc = MdxDocument(content)
+    if sanitize_mdx_document(doc):
         print(f"Sanitizing {file_path}...")
         try:
             with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(sanitized_content)
+                f.write(doc.text)
         except Exception as e:
             print(f"Error writing to {file_path}: {e}")
 
@@ -72,6 +101,7 @@ def main():
         "directory", 
         help="The directory to scan for .mdx files (e.g., 'src/content/docs')."
     )
+    add_jobs_argument(parser)
     args = parser.parse_args()
 
     if not os.path.isdir(args.directory):
@@ -79,10 +109,13 @@ def main():
         return
 
     print(f"Starting sanitization in '{args.directory}'...")
-    for root, _, files in os.walk(args.directory):
-        for file in files:
-            if file.endswith(".mdx"):
-                sanitize_mdx_file(os.path.join(root, file))
+    mdx_files = [os.path.join(root, file) for root, _, files in os.walk(args.directory)
+                 for file in files if file.endswith(".mdx")]
+    errors = []
+    for (file_path,), _, error in run_ordered(sanitize_mdx_file, [(f,) for f in mdx_files], args.jobs):
+        if error:
+            errors.append((file_path, error))
+    print_errors(errors)
     
     print("Sanitization complete.")
 
@@ -1,16 +1,83 @@
+import argparse
 import asyncio
+import importlib.util
+import json
 import os
 import re
-from playwright.async_api import async_playwright
+import time
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 from markdownify import markdownify as md
 
+from flight_parser import iter_push_payloads
+from lean_load import DEFAULT_BLOCKED_DOMAINS, LeanLoadProfile
+from page_pool import add_jobs_argument, resolve_jobs, run_ordered
+from run_cleanup_gitbook import strip_gitbook_footer
+from scrape_archive import add_archive_arguments, open_archive_from_args
+
+# Playwright is not needed when replaying a recorded archive.
+try:
+    from playwright.async_api import async_playwright
+except ImportError:
+    async_playwright = None
+
 # The URL of the GitBook to scrape.
 BASE_URL = 'https://docs.neuralinternet.ai/'
 
 # The directory where the scraped Markdown files will be saved.
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'new pages', 'from_gitbook')
 
+# BeautifulSoup parser for the page HTML. 'lxml' is several times faster (pip install lxml), but parsers repair
+# broken markup differently, so the Markdown can differ; use one parser for all runs into the same OUTPUT_DIR.
+HTML_PARSER = 'html.parser'
+
+# Incremental scraping: what was fetched when (the sitemap's lastmod per page) and the file it was written to.
+STATE_PATH = os.path.join(OUTPUT_DIR, '.scrape_state.json')
+STATE_VERSION = 1
+# A navigation with fewer pages than this fraction of the state's is taken to be incomplete (no files are deleted).
+MIN_NAV_FRACTION = 0.5
+# Where collect_nav_tree can read the navigation from. The state records which one the last run used: only the
+# page data has section headings, so the folders differ by source and no files are deleted when it changes.
+NAV_SOURCES = {
+    'page_data': 'the embedded page data',
+    'sitemap': 'the sitemap',
+    'menu': 'the expanded menu',
+}
+
+# Number of browser pages (tabs) that load GitBook pages in parallel, in one browser context.
+CONCURRENCY = 4
+# Seconds a page may take to load before the attempt is abandoned, and how often a failed page is retried.
+PAGE_TIMEOUT = 60
+PAGE_RETRIES = 2
+# Seconds to wait before a retry, multiplied by the attempt number.
+RETRY_DELAY = 2
+# Pages that may be loaded (or loading) ahead of the next page to write, at least CONCURRENCY. Pages are written
+# in navigation order, so a slow page holds back the HTML of every page loaded after it until it is done.
+MAX_PENDING_PAGES = 16
+
+# Bodies of the Next.js flight scripts, which carry the page data GitBook renders the table of contents from.
+READ_NEXT_F_SCRIPTS_JS = """
+() => Array.from(document.scripts, s => s.innerHTML).filter(t => t && t.includes('self.__next_f.push'))
+"""
+
+# Every link of the table of contents that is rendered, with how many lists deep it sits.
+READ_NAV_LINKS_JS = """
+(container) => Array.from(container.querySelectorAll('a')).map(a => {
+    let depth = 0;
+    for (let node = a.parentElement; node && node !== container; node = node.parentElement) {
+        if (node.tagName === 'UL' || node.tagName === 'OL') depth++;
+    }
+    return {href: a.href, title: a.innerText.trim(), depth: depth};
+})
+"""
+
+NAV_CONTAINER_SELECTOR = 'aside[data-testid="table-of-contents"]'
+SITEMAP_NAMESPACE = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+_json_decoder = json.JSONDecoder()
+
 def sanitize_filename(title):
     """Sanitizes a string to be a valid filename."""
     # Replace special characters and spaces with underscores
@@ -18,110 +85,562 @@ def sanitize_filename(title):
     s_title = re.sub(r'[-\s]+', '_', s_title)
     return f"{s_title.lower()}.md"
 
-async def main():
+async def apply_lean_load(context, profile):
+    """Aborts the requests the lean load profile blocks in every page of the context, and counts what was loaded."""
+    async def route_request(route):
+        request = route.request
+        reason = profile.block_reason(request.resource_type, request.url)
+        if reason:
+            profile.stats.add_blocked(reason)
+            await route.abort('blockedbyclient')
+        else:
+            await route.continue_()
+
+    async def count_loaded(request):
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        profile.stats.add_loaded(sizes['responseHeadersSize'] + sizes['responseBodySize'])
+
+    await context.route('**/*', route_request)
+    context.on('requestfinished', count_loaded)
+    print(f"Lean load: {profile.describe()}.")
+
+def is_site_url(url):
+    """True for URLs of this GitBook (not gitbook.com or other external links)."""
+    return bool(url) and urlparse(url).netloc == urlparse(BASE_URL).netloc
+
+def normalize_url(url):
+    return url.split('#', 1)[0].rstrip('/')
+
+def nav_entry(title, href, parent, depth, order):
+    """
+    One table of contents entry. href is None for section headings without a page; parent is the index
+    of the parent entry in the list (None at the top level), order the position among its siblings.
+    """
+    return {'title': title, 'href': href, 'parent': parent, 'depth': depth, 'order': order}
+
+def nav_entries_from_page_data(script_bodies):
+    """
+    Finds the table of contents in the page data of the Next.js flight scripts: the largest nested list
+    of {"title", "path" or "href", "pages": [...]} objects. Returns nav entries, or [] if there is none.
+    """
+    text = ''.join(payload[1] for body in script_bodies for payload in iter_push_payloads(body)
+                   if len(payload) > 1 and payload[0] == 1 and isinstance(payload[1], str))
+    best_entries = []
+    skip_until = 0
+    for match in re.finditer(r'"pages"\s*:\s*\[', text):
+        if match.start() < skip_until:
+            continue # nested in a tree already read
+        try:
+            tree, end = _json_decoder.raw_decode(text, match.end() - 1)
+        except json.JSONDecodeError:
+            continue
+        entries = []
+        add_page_data_items(tree, entries, None, 0)
+        if sum(1 for entry in entries if entry['href']) > sum(1 for entry in best_entries if entry['href']):
+            best_entries = entries
+            skip_until = end
+    return best_entries
+
+def add_page_data_items(items, entries, parent, depth):
+    order = 0
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict) or not isinstance(item.get('title'), str) or not item['title'].strip():
+            continue
+        location = item.get('href') or item.get('path')
+        href = urljoin(BASE_URL, location) if isinstance(location, str) else None
+        if href is not None and not is_site_url(href):
+            continue # external link
+        if href is None and not isinstance(item.get('pages'), list):
+            continue # neither a page nor a section
+        entries.append(nav_entry(item['title'].strip(), href, parent, depth, order))
+        order += 1
+        add_page_data_items(item.get('pages'), entries, len(entries) - 1, depth + 1)
+
+async def read_sitemap(page, url=None, depth=0):
+    """Returns [(url, lastmod or None)] of the site's sitemap, following sitemap indexes."""
+    url = url or urljoin(BASE_URL, 'sitemap.xml')
+    response = await page.request.get(url)
+    if not response.ok:
+        return []
+    root = ElementTree.fromstring(await response.body())
+    entries = []
+    if root.tag == f'{SITEMAP_NAMESPACE}sitemapindex':
+        if depth < 2:
+            for location in root.iter(f'{SITEMAP_NAMESPACE}loc'):
+                entries += await read_sitemap(page, location.text.strip(), depth + 1)
+        return entries
+    for url_element in root.iter(f'{SITEMAP_NAMESPACE}url'):
+        location = url_element.findtext(f'{SITEMAP_NAMESPACE}loc')
+        if location:
+            entries.append((location.strip(), (url_element.findtext(f'{SITEMAP_NAMESPACE}lastmod') or '').strip() or None))
+    return entries
+
+def nav_entries_from_sitemap(sitemap_urls, titles):
+    """
+    Builds the hierarchy from the sitemap's URL paths (a page's parent is the closest page whose path is a
+    prefix of its own), in sitemap order. Titles come from the rendered menu, else from the URL slug.
     """
-    Main function to scrape the GitBook site.
+    entries = []
+    index_by_path = {}
+    order_by_parent = {}
+    for url in sitemap_urls:
+        if not is_site_url(url):
+            continue
+        path = urlparse(url).path.strip('/')
+        if path in index_by_path:
+            continue
+        parent = None
+        parent_path = path
+        while parent is None and '/' in parent_path:
+            parent_path = parent_path.rsplit('/', 1)[0]
+            parent = index_by_path.get(parent_path)
+        title = titles.get(normalize_url(url)) or (path.rsplit('/', 1)[-1].replace('-', ' ').capitalize() if path else 'Home')
+        depth = entries[parent]['depth'] + 1 if parent is not None else 0
+        order = order_by_parent.get(parent, 0)
+        order_by_parent[parent] = order + 1
+        index_by_path[path] = len(entries)
+        entries.append(nav_entry(title, url, parent, depth, order))
+    return entries
+
+def nav_entries_from_menu(links):
+    """Builds the hierarchy of the rendered menu's links from how deep each is nested (a stack of parents)."""
+    entries = []
+    parents = [] # (list depth, entry index)
+    order_by_parent = {}
+    for link in links:
+        if not link['title'] or not is_site_url(link['href']):
+            continue
+        while parents and parents[-1][0] >= link['depth']:
+            parents.pop()
+        parent = parents[-1][1] if parents else None
+        order = order_by_parent.get(parent, 0)
+        order_by_parent[parent] = order + 1
+        entries.append(nav_entry(link['title'], link['href'], parent, len(parents), order))
+        parents.append((link['depth'], len(entries) - 1))
+    return entries
+
+async def read_menu_links(page):
+    await page.wait_for_selector(NAV_CONTAINER_SELECTOR, timeout=30000)
+    nav_container = await page.query_selector(NAV_CONTAINER_SELECTOR)
+    return await nav_container.evaluate(READ_NAV_LINKS_JS)
+
+async def expand_nav_menus(page):
+    """Clicks every collapsed section of the menu open (slow; only used when the tree cannot be read directly)."""
+    print("Expanding all collapsible navigation menus...")
+    # Based on HTML analysis, expandable links contain a chevron icon.
+    # Using a raw string r'' to avoid syntax warnings with escapes.
+    expandable_links = await page.query_selector_all(r'a.group\/toclink:has(svg[style*="chevron-right"])')
+    
+    for link in expandable_links:
+        try:
+            if await link.is_visible():
+                await link.click()
+                await page.wait_for_timeout(200) # Give it a moment to expand
+        except Exception as e:
+            print(f"Could not click expandable link: {e}")
+
+async def collect_nav_tree(page, sitemap=None):
+    """
+    Reads the whole table of contents of the loaded home page in one go: from the embedded page data,
+    else from the sitemap (read_sitemap's entries, fetched if not given); expanding the menu section by
+    section is the last resort. Returns (nav entries (see nav_entry) in menu order, NAV_SOURCES key).
+    """
+    print("Reading the navigation tree...")
+    try:
+        entries = nav_entries_from_page_data(await page.evaluate(READ_NEXT_F_SCRIPTS_JS))
+        source = 'page_data'
+        if not entries:
+            menu_titles = {normalize_url(link['href']): link['title'] for link in await read_menu_links(page) if link['title']}
+            if sitemap is None:
+                sitemap = await read_sitemap(page)
+            entries = nav_entries_from_sitemap([url for url, _ in sitemap], menu_titles)
+            source = 'sitemap'
+    except Exception as e:
+        print(f"Could not read the navigation tree directly ({e}).")
+        entries = []
+    if not entries:
+        await expand_nav_menus(page)
+        print("Collecting all page links from the navigation...")
+        entries = nav_entries_from_menu(await read_menu_links(page))
+        source = 'menu'
+    print(f"Read {len(entries)} navigation entries from {NAV_SOURCES[source]}.")
+    return entries, source
+
+def load_state():
     """
+    ({normalized url: {"lastmod", "file"}}, NAV_SOURCES key) of the previous run, or ({}, None). States
+    written before the nav source was recorded have None.
+    """
+    if not os.path.exists(STATE_PATH):
+        return {}, None
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') == STATE_VERSION:
+            return state['pages'], state.get('nav_source')
+        print(f"Ignoring scrape state with unsupported version at {STATE_PATH}.")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Warning: Could not read scrape state {STATE_PATH}: {e}. All pages will be scraped.")
+    return {}, None
+
+def save_state(pages, nav_source):
+    tmp_path = f"{STATE_PATH}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': STATE_VERSION, 'nav_source': nav_source, 'pages': pages}, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, STATE_PATH)
+
+def page_file(link):
+    """Path of the page's Markdown file, relative to OUTPUT_DIR."""
+    return os.path.join(link['directory'], sanitize_filename(link['title']))
+
+def plan_incremental_scrape(links, lastmods, state):
+    """
+    Splits the pages into those to fetch and those to keep: a page is kept when the sitemap's lastmod
+    for it is the one it was fetched at and its file is still there. Pages without a lastmod are always
+    fetched. Returns (links to fetch, state entries of the kept pages).
+    """
+    to_fetch, kept = [], {}
+    for link in links:
+        url = normalize_url(link['href'])
+        previous = state.get(url)
+        lastmod = lastmods.get(url)
+        if lastmod and previous and previous['lastmod'] == lastmod and previous['file'] == page_file(link) \
+                and os.path.exists(os.path.join(OUTPUT_DIR, previous['file'])):
+            kept[url] = previous
+        else:
+            to_fetch.append(link)
+    return to_fetch, kept
+
+def nav_looks_incomplete(page_count, state):
+    """
+    True if this run's navigation (page_count pages) is empty, or has less than MIN_NAV_FRACTION of the
+    pages the state knows, as when the menu or page data did not load. Such runs delete no files.
+    """
+    return page_count == 0 or page_count < len(state) * MIN_NAV_FRACTION
+
+def stale_file_removal_blocker(page_count, nav_source, state, state_nav_source):
+    """
+    Why this run must not delete the files of the last run's pages, or None: its navigation looks incomplete
+    (see nav_looks_incomplete), or it was read from another source than the last run's, which can put the
+    same pages in other folders.
+    """
+    if not state:
+        return None
+    if nav_looks_incomplete(page_count, state):
+        return f"The navigation has {page_count} pages, the last run had {len(state)}; it looks incomplete"
+    if nav_source != state_nav_source:
+        return (f"The navigation was read from {NAV_SOURCES[nav_source]}, the last run's from "
+                f"{NAV_SOURCES.get(state_nav_source, 'an unrecorded source')}; the folders can differ")
+    return None
+
+def remove_stale_files(state, current_files):
+    """
+    Deletes the files of the state's pages that no current page writes, and folders left empty by that.
+    Only files recorded in the state are deleted, never other files in OUTPUT_DIR.
+    """
+    removed_count = 0
+    for entry in state.values():
+        if entry['file'] in current_files:
+            continue
+        filepath = os.path.join(OUTPUT_DIR, entry['file'])
+        if os.path.exists(filepath):
+            os.remove(filepath)
+            removed_count += 1
+            print(f"  -> Removed {filepath}")
+            directory = os.path.dirname(filepath)
+            while os.path.abspath(directory) != os.path.abspath(OUTPUT_DIR) and not os.listdir(directory):
+                os.rmdir(directory)
+                directory = os.path.dirname(directory)
+    return removed_count
+
+def pages_to_scrape(entries):
+    """
+    The unique pages of the nav entries, as {"href", "title", "directory"} dicts. directory mirrors the
+    entry's ancestors (one sanitized folder per level), so pages land where they sit in the menu.
+    """
+    pages = []
+    seen_urls = set()
+    for entry in entries:
+        if not entry['href']:
+            continue
+        # Normalize URL by removing trailing slash
+        normalized_url = normalize_url(entry['href'])
+        if normalized_url in seen_urls:
+            continue
+        seen_urls.add(normalized_url)
+        folders = []
+        parent = entry.get('parent')
+        while parent is not None:
+            folders.insert(0, sanitize_filename(entries[parent]['title'])[:-len('.md')])
+            parent = entries[parent].get('parent')
+        pages.append({'href': entry['href'], 'title': entry['title'], 'directory': os.path.join(*folders) if folders else ''})
+    return pages
+
+async def fetch_main_html(page, url, page_timeout=PAGE_TIMEOUT):
+    """Loads a page and returns the inner HTML of its <main> element."""
+    await page.goto(url, wait_until='networkidle', timeout=page_timeout * 1000)
+    
+    # The main content is inside the <main> tag.
+    content_selector = 'main'
+    await page.wait_for_selector(content_selector, timeout=10000)
+    
+    return await page.inner_html(content_selector)
+
+async def fetch_with_retries(context, page, url, options, archive, log):
+    """
+    Fetches a page's <main> HTML, giving each attempt options.page_timeout seconds and retrying up to
+    options.retries times. Returns (html or None, the page to keep using); a crashed page is replaced.
+    """
+    for attempt in range(1, options.retries + 2):
+        try:
+            start_time = time.monotonic()
+            html_content = await asyncio.wait_for(fetch_main_html(page, url, options.page_timeout), options.page_timeout)
+            if archive is not None:
+                archive.record_payload('gitbook_main', url, html_content, time.monotonic() - start_time)
+            return html_content, page
+        except Exception as e:
+            error = f"timed out after {options.page_timeout}s" if isinstance(e, asyncio.TimeoutError) else str(e).strip()
+            if attempt > options.retries:
+                log(f"  -> Error scraping {url}: {error}")
+                return None, page
+            log(f"  -> Attempt {attempt} failed ({error}), retrying...")
+            if page.is_closed():
+                page = await context.new_page()
+            await asyncio.sleep(RETRY_DELAY * attempt)
+
+async def scrape_pages(context, links, options, archive, executor=None):
+    """
+    Scrapes the pages with options.concurrency browser pages fed from a bounded queue. A loaded page's
+    conversion to Markdown runs in `executor` (a process pool; inline if None) while the browser
+    pages move on. Each page's log block is printed and its file written in navigation order as soon as
+    it and all before it are done, so the output (including which page wins a filename collision) does
+    not depend on timing. No page is loaded more than MAX_PENDING_PAGES (or concurrency) pages ahead of
+    the next one to write. Returns the links whose file was written.
+    """
+    if not links:
+        return []
+    concurrency = max(1, min(options.concurrency, len(links)))
+    print(f"Scraping {len(links)} pages with {concurrency} browser page(s)...")
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=concurrency)
+    pending_pages = asyncio.Semaphore(max(concurrency, MAX_PENDING_PAGES))
+    loaded = [loop.create_future() for _ in links]
+    written = []
+
+    async def worker():
+        page = await context.new_page()
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                index, link = item
+                log_lines = [f"Scraping '{link['title']}' ({link['href']})..."]
+                html_content, page = await fetch_with_retries(context, page, link['href'], options, archive, log_lines.append)
+                conversion = None
+                if html_content is not None and executor is not None:
+                    conversion = loop.run_in_executor(executor, convert_page, link['title'], html_content)
+                loaded[index].set_result((log_lines, html_content, conversion))
+        finally:
+            await page.close()
+
+    async def feed():
+        for item in enumerate(links):
+            await pending_pages.acquire() # released once the page is written
+            await queue.put(item)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def write_in_order():
+        for index, link in enumerate(links):
+            log_lines, html_content, conversion = await loaded[index]
+            loaded[index] = None # drop the page's HTML once it is written
+            for line in log_lines: print(line)
+            if html_content is not None:
+                try:
+                    content = await conversion if conversion is not None else convert_page(link['title'], html_content)
+                    write_page(link['title'], content, link.get('directory', ''))
+                    written.append(link)
+                except Exception as e:
+                    print(f"  -> Error saving '{link['title']}': {e}")
+            pending_pages.release()
+
+    await asyncio.gather(feed(), write_in_order(), *(worker() for _ in range(concurrency)))
+    return written
+
+def convert_page(title, html_content):
+    """
+    Converts a page's <main> HTML to the Markdown file content: frontmatter title, the page
+    without breadcrumbs, headers and the GitBook navigation footer.
+    """
+    soup = BeautifulSoup(html_content, HTML_PARSER)
+
+    # Remove breadcrumbs, headers, and footer navigation
+    for nav in soup.select('nav'):
+        nav.decompose()
+    for header in soup.select('header'):
+        header.decompose()
+    
+    markdown_content = md(str(soup), heading_style='ATX', bullets='*').strip()
+    
+    # Add a frontmatter title for Astro
+    return strip_gitbook_footer(f'---\ntitle: "{title}"\n---\n\n{markdown_content}')
+
+def write_page(title, content, directory=''):
+    """Writes a converted page to `directory` in OUTPUT_DIR."""
+    filename = sanitize_filename(title)
+    filepath = os.path.join(OUTPUT_DIR, directory, filename)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(content)
+    
+    print(f"  -> Saved to {filepath}")
+
+def replay_from_archive(archive, jobs=1):
+    """Rebuilds every page from a recorded archive, without a browser or network access."""
+    unique_links = pages_to_scrape(archive.replay_payload('gitbook_nav', BASE_URL))
+    print(f"Found {len(unique_links)} unique pages to scrape.")
+    archived_pages = []
+    for link in unique_links:
+        try:
+            archived_pages.append((link, archive.replay_payload('gitbook_main', link['href']), None))
+        except Exception as e:
+            archived_pages.append((link, None, e))
+    conversions = run_ordered(convert_page, [(link['title'], html_content) for link, html_content, _ in archived_pages
+                                             if html_content is not None], jobs)
+    for link, html_content, error in archived_pages:
+        print(f"Scraping '{link['title']}' ({link['href']})...")
+        if html_content is not None:
+            _, content, error = next(conversions)
+        if error:
+            print(f"  -> Error scraping {link['href']}: {error}")
+        else:
+            write_page(link['title'], content, link['directory'])
+
+async def main(archive=None, options=None):
+    """
+    Main function to scrape the GitBook site. With a recording archive every navigation
+    tree and page is saved into it; with a replaying archive no browser is started.
+    options carries the page pool settings (concurrency, page_timeout, retries), the
+    lean load profile (lean_load, None to load pages in full), the number of
+    conversion processes (jobs) and whether to re-scrape unchanged pages (force).
+    """
+    if options is None:
+        options = argparse.Namespace(concurrency=CONCURRENCY, page_timeout=PAGE_TIMEOUT, retries=PAGE_RETRIES,
+                                     lean_load=None, jobs=1, force=False)
+    jobs = resolve_jobs(options.jobs)
+    if HTML_PARSER == 'lxml' and importlib.util.find_spec('lxml') is None:
+        raise ImportError("HTML_PARSER is 'lxml', but lxml is not installed. Install it with 'pip install lxml'.")
     print("Starting GitBook scraper...")
     
     if not os.path.exists(OUTPUT_DIR):
         print(f"Creating output directory: {OUTPUT_DIR}")
         os.makedirs(OUTPUT_DIR)
 
+    if archive is not None and archive.replaying:
+        replay_from_archive(archive, jobs)
+        print("Scraping complete!")
+        return
+
+    if async_playwright is None:
+        raise ImportError("Playwright is not installed. Install it with 'pip install playwright' (or use --replay).")
+
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+        context = await browser.new_context()
+        if options.lean_load:
+            await apply_lean_load(context, options.lean_load)
+        page = await context.new_page()
 
         print(f"Navigating to {BASE_URL}...")
+        start_time = time.monotonic()
         await page.goto(BASE_URL, wait_until='networkidle', timeout=60000)
 
-        print("Expanding all collapsible navigation menus...")
-        # Based on HTML analysis, expandable links contain a chevron icon.
-        # Using a raw string r'' to avoid syntax warnings with escapes.
-        expandable_links = await page.query_selector_all(r'a.group\/toclink:has(svg[style*="chevron-right"])')
-        
-        for link in expandable_links:
-            try:
-                if await link.is_visible():
-                    await link.click()
-                    await page.wait_for_timeout(200) # Give it a moment to expand
-            except Exception as e:
-                print(f"Could not click expandable link: {e}")
-
-        print("Collecting all page links from the navigation...")
-        # The navigation is inside an <aside> with data-testid="table-of-contents"
-        nav_container_selector = 'aside[data-testid="table-of-contents"]'
-        await page.wait_for_selector(nav_container_selector, timeout=30000)
-        nav_container = await page.query_selector(nav_container_selector)
-
-        links = await nav_container.eval_on_selector_all(
-            'a',
-            """
-            (anchors) =>
-                anchors
-                    .map(a => ({
-                        href: a.href,
-                        title: a.innerText.trim()
-                    }))
-                    .filter(l => l.title && l.href && !l.href.includes('gitbook.com'))
-            """
-        )
-
-        unique_links = []
-        seen_urls = set()
-        for link in links:
-            # Normalize URL by removing trailing slash
-            normalized_url = link['href'].rstrip('/')
-            if normalized_url not in seen_urls:
-                unique_links.append(link)
-                seen_urls.add(normalized_url)
+        try:
+            sitemap = await read_sitemap(page)
+        except Exception as e:
+            print(f"Could not read the sitemap ({e}); every page will be scraped.")
+            sitemap = []
+        nav_entries, nav_source = await collect_nav_tree(page, sitemap)
+        if archive is not None:
+            archive.record_payload('gitbook_nav', BASE_URL, nav_entries, time.monotonic() - start_time)
+        unique_links = pages_to_scrape(nav_entries)
+        await page.close()
 
         print(f"Found {len(unique_links)} unique pages to scrape.")
+        state, state_nav_source = load_state()
+        lastmods = {normalize_url(url): lastmod for url, lastmod in sitemap}
+        if options.force or archive is not None:
+            to_fetch, kept = unique_links, {} # a recording must hold every page
+        else:
+            to_fetch, kept = plan_incremental_scrape(unique_links, lastmods, state)
+            print(f"{len(to_fetch)} pages are new or changed (or have no sitemap lastmod), {len(kept)} unchanged.")
 
-        for link in unique_links:
-            url = link['href']
-            title = link['title']
-
-            print(f"Scraping '{title}' ({url})...")
-            try:
-                await page.goto(url, wait_until='networkidle', timeout=60000)
-                
-                # The main content is inside the <main> tag.
-                content_selector = 'main'
-                await page.wait_for_selector(content_selector, timeout=10000)
-                
-                html_content = await page.inner_html(content_selector)
-                soup = BeautifulSoup(html_content, 'html.parser')
-
-                # Remove breadcrumbs, headers, and footer navigation
-                for nav in soup.select('nav'):
-                    nav.decompose()
-                for header in soup.select('header'):
-                    header.decompose()
-                
-                markdown_content = md(str(soup), heading_style='ATX', bullets='*').strip()
-                
-                # Add a frontmatter title for Astro
-                final_content = f'---\ntitle: "{title}"\n---\n\n{markdown_content}'
-
-                filename = sanitize_filename(title)
-                filepath = os.path.join(OUTPUT_DIR, filename)
-
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(final_content)
-                
-                print(f"  -> Saved to {filepath}")
-
-            except Exception as e:
-                print(f"  -> Error scraping {url}: {e}")
+        # Pages are converted in worker processes while the browser loads the next ones.
+        executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+        try:
+            written = await scrape_pages(context, to_fetch, options, archive, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        # Pages that failed keep their previous entry (and file); pages no longer in the menu are removed,
+        # unless the menu looks incomplete or was read from another source, in which case their entries
+        # are kept for the next run.
+        new_state = dict(kept)
+        blocker = stale_file_removal_blocker(len(unique_links), nav_source, state, state_nav_source)
+        current_urls = {normalize_url(link['href']) for link in unique_links}
+        new_state.update({url: entry for url, entry in state.items()
+                          if (blocker or url in current_urls) and url not in new_state})
+        for link in written:
+            url = normalize_url(link['href'])
+            new_state[url] = {'lastmod': lastmods.get(url), 'file': page_file(link)}
+        if blocker:
+            print(f"Warning: {blocker}, so no files are removed.")
+            removed_count = 0
+        else:
+            current_files = {entry['file'] for entry in new_state.values()} | {page_file(link) for link in unique_links}
+            removed_count = remove_stale_files(state, current_files)
+        save_state(new_state, nav_source)
+        print(f"Wrote {len(written)} pages, kept {len(kept)} unchanged, removed {removed_count} stale files.")
 
         print("Scraping complete!")
+        if options.lean_load:
+            print(options.lean_load.stats.summary())
+        await context.close()
         await browser.close()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scrape the GitBook site into Markdown files.")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help=f"Number of pages loaded in parallel (default: {CONCURRENCY}).")
+    parser.add_argument("--page-timeout", type=float, default=PAGE_TIMEOUT,
+                        help=f"Seconds a page may take to load before the attempt fails (default: {PAGE_TIMEOUT}).")
+    parser.add_argument("--retries", type=int, default=PAGE_RETRIES,
+                        help=f"How often a page that failed to load is retried (default: {PAGE_RETRIES}).")
+    parser.add_argument("--lean-load", action="store_true",
+                        help="Skip images, fonts, CSS, media and analytics requests (the lean load profile). Pages load in full by default.")
+    parser.add_argument("--block-domain", action="append", default=[], metavar="DOMAIN",
+                        help="Also block requests to this domain and its subdomains (repeatable, implies --lean-load).")
+    parser.add_argument("--force", action="store_true",
+                        help="Scrape every page, also those whose sitemap lastmod did not change since the last run.")
+    add_jobs_argument(parser)
+    add_archive_arguments(parser)
+    args = parser.parse_args()
+    args.lean_load = (LeanLoadProfile(domains=DEFAULT_BLOCKED_DOMAINS + tuple(args.block_domain))
+                      if args.lean_load or args.block_domain else None)
+
     print("This script requires Playwright, BeautifulSoup4, and Markdownify.")
     print("Please install them using pip: pip install playwright beautifulsoup4 markdownify")
     print("You also need to install the browser binaries for Playwright: playwright install")
     print("-" * 20)
     
-    asyncio.run(main()) 
\ No newline at end of file
+    archive = open_archive_from_args(args)
+    try:
+        asyncio.run(main(archive, args))
+    finally:
+        if archive: archive.close()
@@ -1,13 +1,24 @@
 # run_spbcp.py
 # Starlight Page Builder & Component Placer
-# (Latest: Direct URL for inline sources, enhanced re.sub debugging)
+# (Latest: Direct URL for inline sources, single-pass link rewriting)
 
+import argparse
 import config
+import hashlib
 import json
 import os
 import re
 from pathlib import Path
-from urllib.parse import urljoin
+
+from link_graph import LinkGraph
+from page_pool import add_jobs_argument, print_errors, run_ordered
+from page_store import PageStore
+from source_index import (configured_sources, get_configured_line_map, get_configured_source_index, parse_source_href,
+                          parse_source_reference, remap_link_text, resolve_source_link, use_configured_sources)
+
+# Bump when build_page_content's output changes, so incremental runs rebuild every page.
+SPBCP_BUILDER_VERSION = 1
+SPBCP_MANIFEST_VERSION = 1
 
 def sanitize_filename_component(name_str):
     """Sanitizes a string to be a valid filename component (not full path)."""
@@ -25,21 +36,89 @@ def create_directory_if_not_exists(file_path):
         os.makedirs(directory)
         print(f"  Created directory: {directory}")
 
-def parse_filename_and_lines(text_content):
-    """Parses 'path/to/filename:line-start-line-end' or 'filename:line' or 'filename'."""
-    match = re.match(r"([\w\._/-]+)(?::(\d+)(?:-(\d+))?)?", text_content) 
-    if match:
-        filename = match.group(1)
-        line_start = match.group(2)
-        line_end = match.group(3)
-        
-        line_fragment = ""
-        if line_start and line_end:
-            line_fragment = f"#L{line_start}-L{line_end}"
-        elif line_start:
-            line_fragment = f"#L{line_start}"
-        return filename, line_fragment
-    return text_content, ""
+def build_inline_source_component(link_text):
+    """Builds the <SourceLink> component for an inline "Sources:" link (direct GitHub URL from 'file:lines')."""
+    filename_part, line_start, line_end = parse_source_reference(link_text)
+    text_attr = link_text.replace('"', "&quot;")
+    if not filename_part:
+        unresolved_href = f"#TODO-construct-source-{sanitize_filename_component(link_text or 'unknown_text')}"
+        return f'<SourceLink text="{text_attr}" href="{unresolved_href}" />'
+    resolved_github_url, moved = resolve_source_link(filename_part, line_start, line_end)
+    if moved:
+        text_attr = remap_link_text(link_text, moved[0], line_start, line_end, *moved[1:]).replace('"', "&quot;")
+    href_attr = resolved_github_url.replace('"', "&quot;")
+    return f'<SourceLink text="{text_attr}" href="{href_attr}" />'
+
+def collapsible_source_link(link):
+    """
+    The (text, href) of a "Relevant source files" link: as ingested, or resolved against the source index
+    and line map if there are.
+    """
+    if get_configured_source_index() is None and get_configured_line_map() is None:
+        return link["text"], link["href"]
+    filename, line_start, line_end, fragment = parse_source_href(link["original_deepwiki_href"])
+    url, moved = resolve_source_link(filename, line_start, line_end)
+    text = remap_link_text(link["text"], moved[0], line_start, line_end, *moved[1:]) if moved else link["text"]
+    return text, url + (f"#{fragment}" if fragment else "")
+
+def rewrite_markdown_links(markdown_content, inline_source_links, internal_page_links, page_title):
+    """
+    Rewrites [text](href) links in one scan, looking each one up by (text, original href).
+    Each inline source link replaces one occurrence (the first not already taken by an earlier
+    entry with the same key); internal page links replace every remaining occurrence.
+    Links that match nothing are reported.
+    """
+    inline_replacements = {}
+    for link_info in inline_source_links:
+        key = (link_info["text"], link_info["original_deepwiki_href"])
+        if key not in inline_replacements:
+            inline_replacements[key] = [build_inline_source_component(link_info["text"]), 0]
+        inline_replacements[key][1] += 1
+    internal_replacements = {}
+    for link_info in internal_page_links:
+        key = (link_info["text"], link_info["original_deepwiki_href"])
+        internal_replacements.setdefault(key, f'[{link_info["text"]}]({link_info["href"]})')
+    if not inline_replacements and not internal_replacements:
+        return markdown_content
+
+    output = []
+    matched_internal = set()
+    copied_up_to = 0
+    close_bracket = close_paren = -1 # cached search results, reused while still ahead of the scan
+    bracket = markdown_content.find("[")
+    while bracket != -1:
+        if close_bracket <= bracket:
+            close_bracket = markdown_content.find("]", bracket + 1)
+            if close_bracket == -1: break
+        if markdown_content.startswith("(", close_bracket + 1):
+            if close_paren <= close_bracket:
+                close_paren = markdown_content.find(")", close_bracket + 2)
+                if close_paren == -1: break
+            key = (markdown_content[bracket + 1:close_bracket], markdown_content[close_bracket + 2:close_paren])
+            replacement = None
+            inline_entry = inline_replacements.get(key)
+            if inline_entry and inline_entry[1] > 0:
+                replacement = inline_entry[0]
+                inline_entry[1] -= 1
+            elif key in internal_replacements:
+                replacement = internal_replacements[key]
+                matched_internal.add(key)
+            if replacement is not None:
+                output.append(markdown_content[copied_up_to:bracket])
+                output.append(replacement)
+                copied_up_to = close_paren + 1
+                bracket = markdown_content.find("[", copied_up_to)
+                continue
+        bracket = markdown_content.find("[", bracket + 1)
+    output.append(markdown_content[copied_up_to:])
+
+    for (text, original_href), (_, unmatched_count) in inline_replacements.items():
+        if unmatched_count:
+            print(f"    WARNING: Inline source link '[{text}]({original_href})' was not found in the markdown ({unmatched_count} occurrence(s) left unreplaced).")
+    for text, original_href in internal_replacements:
+        if (text, original_href) not in matched_internal:
+            print(f"    Warning: Internal link replacement for '[{text}]({original_href})' did not find/replace a match in content for page '{page_title}'.")
+    return "".join(output)
 
 
 def build_page_content(page_data):
@@ -75,8 +154,9 @@ def build_page_content(page_data):
     if collapsible_links:
         lines.append('<CollapsibleAside title="Relevant Source Files">')
         for link in collapsible_links:
-            text_attr = link["text"].replace('"', "&quot;")
-            href_attr = link["href"].replace('"', "&quot;")
+            text, href = collapsible_source_link(link)
+            text_attr = text.replace('"', "&quot;")
+            href_attr = href.replace('"', "&quot;")
             lines.append(f'  <SourceLink text="{text_attr}" href="{href_attr}" />')
         lines.append('</CollapsibleAside>')
         lines.append("")
@@ -88,181 +168,262 @@ def build_page_content(page_data):
     details_block_pattern = r"<details>\s*<summary>Relevant source files</summary>.*?</details>"
     markdown_content = re.sub(details_block_pattern, "", markdown_content, count=1, flags=re.IGNORECASE | re.DOTALL)
 
-    # 4a. Replace Inline "Sources:" links using direct URL construction
-    # The `relevant_file_paths` map is no longer built or used for this specific resolution.
-    # The `DEBUG RFS MAP` print can be removed or kept if you want to see what `collapsible_links` contained.
-    # For now, let's remove it to reduce noise, as it's not directly used in this loop.
-    # print(f"DEBUG RFS MAP for page '{page_data['title']}': {json.dumps(relevant_file_paths, indent=2)}") 
-    
-    source_link_placeholders = {}
-    placeholder_idx = 0
-
-    for link_info in inline_source_links:
-        original_link_text_content = link_info["text"] 
-        original_link_in_markdown_href_part = link_info["original_deepwiki_href"] 
-        
-        placeholder_link_regex_str = rf"\[{re.escape(original_link_text_content)}\]\({re.escape(original_link_in_markdown_href_part)}\)"
-        
-        filename_part, line_fragment = parse_filename_and_lines(original_link_text_content)
-        
-        # Ensure DEBUG prints are removed or commented out if not needed by user for this step
-        # print(f"DEBUG PARSE (Inline Source): Input='{original_link_text_content}', Parsed Filename='{filename_part}', Parsed Fragment='{line_fragment}'")
-        
-        resolved_github_url = None
-        actual_component_text = ""
-
-        if filename_part: 
-            prefix = config.GITHUB_BLOB_URL_PREFIX
-            if not prefix.endswith('/'):
-                prefix += '/'
-            base_url = urljoin(prefix, filename_part.lstrip('/'))
-            resolved_github_url = base_url + line_fragment
-            # print(f"  Directly constructed URL: {resolved_github_url}")
-
-            text_attr = original_link_text_content.replace('"', "&quot;")
-            href_attr = resolved_github_url.replace('"', "&quot;")
-            actual_component_text = f'<SourceLink text="{text_attr}" href="{href_attr}" />'
-        else: 
-            unresolved_href = f"#TODO-construct-source-{sanitize_filename_component(original_link_text_content or 'unknown_text')}"
-            text_attr = original_link_text_content.replace('"', "&quot;")
-            actual_component_text = f'<SourceLink text="{text_attr}" href="{unresolved_href}" />'
-            # print(f"    Warning: Could not parse filename well from inline source: '{original_link_text_content}'. Placeholder component used.")
-
-        # --- DETAILED DEBUG FOR RE.SUB ---
-        # print(f"DEBUG RE.SUB: Attempting to replace pattern: {repr(placeholder_link_regex_str)}")
-        # print(f"DEBUG RE.SUB: For link text: '{original_link_text_content}'")
-        
-        # context_snippet = "Context not easily found."
-        # try:
-        #     literal_link_to_find = f"[{original_link_text_content}]({original_link_in_markdown_href_part})"
-        #     search_text_start_index = markdown_content.find(literal_link_to_find)
-        #     if search_text_start_index != -1:
-        #         context_start = max(0, search_text_start_index - 40)
-        #         context_end = min(len(markdown_content), search_text_start_index + len(literal_link_to_find) + 40)
-        #         text_for_snippet = markdown_content[context_start:context_end].replace('\\n', '\\\\n')
-        #         context_snippet = f"(Context around link text only): ...{text_for_snippet}..."
-        #     else:
-        #         search_text_start_index = markdown_content.find(original_link_text_content)
-        #         if search_text_start_index != -1:
-        #             context_start = max(0, search_text_start_index - 40)
-        #             context_end = min(len(markdown_content), search_text_start_index + len(original_link_text_content) + 40)
-        #             text_for_snippet = markdown_content[context_start:context_end].replace('\\n', '\\\\n')
-        #             context_snippet = f"(Context around link text only): ...{text_for_snippet}..."
-        #         else:
-        #             context_snippet = f"(Link text '{original_link_text_content}' not found as substring)"
-        # except Exception as e_debug_ctx:
-        #     context_snippet = f"(Error finding context: {e_debug_ctx})"
-        # print(f"DEBUG RE.SUB: Markdown context: ...{context_snippet}...")
-        # --- END DETAILED DEBUG FOR RE.SUB ---
-        
-        current_placeholder = f"__SOURCELINK_PLACEHOLDER_{placeholder_idx}__"
-        source_link_placeholders[current_placeholder] = actual_component_text
-        placeholder_idx += 1
-        
-        temp_markdown_content = markdown_content
-        markdown_content = re.sub(placeholder_link_regex_str, current_placeholder, markdown_content, count=1)
-        
-        if markdown_content == temp_markdown_content:
-            # If re.sub didn't replace, remove the placeholder entry if it was for this link
-            # This might happen if the link was already processed or part of another structure
-            # that the regex didn't match as expected.
-            if source_link_placeholders.get(current_placeholder) == actual_component_text:
-                 del source_link_placeholders[current_placeholder]
-                 # placeholder_idx -=1 # Not strictly necessary to decrement, but good for exact count
-            print(f"    WARNING: re.sub with pattern {repr(placeholder_link_regex_str)} did NOT change markdown for link text '{original_link_text_content}'. Placeholder {current_placeholder} potentially unused.")
-
-    # 4b. Replace Internal Page Links
+    # 4a/4b. Replace inline "Sources:" links with SourceLink components and point internal page links at their Astro paths
     internal_page_links = [link for link in page_data.get("resolved_links", []) if link["context"] == "internal_page_link_from_content_body"]
-    for link_info in internal_page_links:
-        original_text_escaped = re.escape(link_info["text"])
-        original_href_escaped = re.escape(link_info["original_deepwiki_href"])
-        
-        regex_pattern = rf"\[({original_text_escaped})\]\({original_href_escaped}\)"
-        replacement_markdown_link = f'[{link_info["text"]}]({link_info["href"]})' 
-        
-        current_markdown_snapshot = markdown_content
-        markdown_content, num_replacements = re.subn(regex_pattern, replacement_markdown_link, markdown_content)
-
-        if num_replacements == 0: 
-             if link_info["original_deepwiki_href"] and link_info["original_deepwiki_href"] != "#":
-                original_md_link_str = f'[{link_info["text"]}]({link_info["original_deepwiki_href"]})'
-                if original_md_link_str in markdown_content:
-                    markdown_content = markdown_content.replace(original_md_link_str, replacement_markdown_link, 1)
-                    num_replacements = 1 
-            
-             if num_replacements == 0: 
-                print(f"    Warning: Internal link replacement for '[{link_info['text']}]({link_info['original_deepwiki_href']})' did not find/replace a match in content for page '{page_data['title']}'.")
-
-    # After all other processing, substitute placeholders back
-    for placeholder, component_text in source_link_placeholders.items():
-        markdown_content = markdown_content.replace(placeholder, component_text)
+    markdown_content = rewrite_markdown_links(markdown_content, inline_source_links, internal_page_links, page_data.get("title"))
 
     lines.append(markdown_content.strip())
     return "\n\n".join(l for l in lines if l or l == "")
 
 
+def output_path_for(target_astro_path_str):
+    """Maps a page's target Astro path to its .mdx file under TARGET_DOCS_DIR."""
+    if target_astro_path_str == "/":
+        return Path(config.TARGET_DOCS_DIR) / "index.mdx"
+    path_segments = target_astro_path_str.strip("/").split("/")
+    filename = f"{sanitize_filename_component(path_segments[-1])}.mdx"
+    if len(path_segments) > 1:
+        sanitized_dir_parts = [sanitize_filename_component(part) for part in path_segments[:-1]]
+        directory_path = Path(config.TARGET_DOCS_DIR).joinpath(*sanitized_dir_parts)
+    else:
+        directory_path = Path(config.TARGET_DOCS_DIR)
+    return directory_path / filename
+
+def sha256_hex(data):
+    return hashlib.sha256(data).hexdigest()
+
+def page_input_hash(page_data):
+    return sha256_hex(json.dumps(page_data, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+
+def build_signature():
+    """Everything besides the page record that affects build_page_content's output."""
+    source_index = get_configured_source_index()
+    source_commit = source_index.commit if source_index else None
+    return sha256_hex(json.dumps([SPBCP_BUILDER_VERSION, config.GITHUB_BLOB_URL_PREFIX, source_commit,
+                                  config.DEEPWIKI_SOURCE_REF]).encode("utf-8"))
+
+def load_manifest():
+    """
+    Loads the manifest of the previous run:
+        {"version": 1, "build_signature": ..., "target_docs_dir": ...,
+         "pages": {deepwiki_href: {"input_hash": ..., "output_path": ..., "output_hash": ...}}}
+    Returns an empty page table if it is missing, unreadable or was written for another build/target.
+    """
+    empty = {"version": SPBCP_MANIFEST_VERSION, "build_signature": build_signature(),
+             "target_docs_dir": os.path.abspath(config.TARGET_DOCS_DIR), "pages": {}}
+    if not os.path.exists(config.SPBCP_MANIFEST_PATH):
+        return empty, {}
+    try:
+        with open(config.SPBCP_MANIFEST_PATH, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read SPBCP manifest {config.SPBCP_MANIFEST_PATH}: {e}. Rebuilding all pages.")
+        return empty, {}
+    if manifest.get("version") != SPBCP_MANIFEST_VERSION or manifest.get("target_docs_dir") != empty["target_docs_dir"]:
+        print("SPBCP manifest is from another version or target directory; rebuilding all pages.")
+        return empty, {}
+    previous_pages = manifest.get("pages", {})
+    if manifest.get("build_signature") != empty["build_signature"]:
+        # Pages are rebuilt, but the previous output paths are still needed to find orphans.
+        print("SPBCP builder, GitHub URL prefix or source index changed; rebuilding all pages.")
+        return empty, {href: dict(entry, input_hash=None) for href, entry in previous_pages.items()}
+    return empty, previous_pages
+
+def save_manifest(manifest):
+    tmp_path = f"{config.SPBCP_MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, config.SPBCP_MANIFEST_PATH)
+
+def write_if_changed(output_path, content_bytes, previous_hash=None):
+    """
+    Writes through a temp file and an atomic rename, only if the content changed. Returns True if written.
+    previous_hash is the manifest's hash of what SPBCP last wrote to output_path: the post-processing steps
+    edit the file afterwards, so if the new content has that hash the file on disk is already its processed
+    version and is left alone. Without it, the file's bytes are compared.
+    """
+    if previous_hash is not None and os.path.exists(output_path):
+        if sha256_hex(content_bytes) == previous_hash:
+            return False
+        return _replace_file(output_path, content_bytes)
+    try:
+        with open(output_path, "rb") as f:
+            if f.read() == content_bytes:
+                return False
+    except FileNotFoundError:
+        pass
+    return _replace_file(output_path, content_bytes)
+
+def _replace_file(output_path, content_bytes):
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content_bytes)
+    os.replace(tmp_path, output_path)
+    return True
+
+def delete_orphaned_page(output_path):
+    """Deletes a page SPBCP wrote in an earlier run, and any directories under TARGET_DOCS_DIR it leaves empty."""
+    try:
+        os.remove(output_path)
+    except FileNotFoundError:
+        return False
+    docs_dir = os.path.abspath(config.TARGET_DOCS_DIR)
+    directory = os.path.dirname(os.path.abspath(output_path))
+    while directory != docs_dir and directory.startswith(docs_dir + os.sep) and not os.listdir(directory):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
+    return True
+
+
+def build_and_write_page(sources, title, target_astro_path_str, page_data, output_path, created_directory, previous_output_hash=None):
+    """
+    Builds one page and writes it if it changed (see write_if_changed); runs in a page_pool worker with --jobs.
+    created_directory is the directory main() created for this page, if any (reported here to keep the log in page order).
+    sources is the (source index, line map) main() loaded (source_index.configured_sources).
+    Returns (written, output hash), with a None hash if the write failed.
+    """
+    use_configured_sources(sources)
+    print(f"Processing page: '{title}' -> Astro path: '{target_astro_path_str}'")
+    if created_directory:
+        print(f"  Created directory: {created_directory}")
+
+    mdx_bytes = build_page_content(page_data).encode("utf-8")
+    try:
+        if write_if_changed(output_path, mdx_bytes, previous_output_hash):
+            print(f"  Successfully wrote: {output_path}")
+            return True, sha256_hex(mdx_bytes)
+        print(f"  Unchanged on disk: {output_path}")
+        return False, sha256_hex(mdx_bytes)
+    except Exception as e:
+        print(f"  Error writing file {output_path}: {e}")
+        return False, None
+
 def main():
+    parser = argparse.ArgumentParser(description="Build Starlight .mdx pages from the ingested DeepWiki data.")
+    parser.add_argument("--force", action="store_true", help="Rebuild every page, ignoring the SPBCP manifest.")
+    add_jobs_argument(parser)
+    args = parser.parse_args()
+
     print("Starting Starlight Page Builder & Component Placer (SPBCP)...")
 
-    if not os.path.exists(config.INGESTED_DATA_JSON_PATH):
-        print(f"Error: Ingested data file not found at {config.INGESTED_DATA_JSON_PATH}")
-        print("Please run the CDI script (run_cdi.py) first.")
-        return
-    
-    try:
-        with open(config.INGESTED_DATA_JSON_PATH, "r", encoding="utf-8") as f:
-            all_pages_data = json.load(f) 
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON from {config.INGESTED_DATA_JSON_PATH}: {e}")
-        return
-    except Exception as e:
-        print(f"Error reading ingested data file {config.INGESTED_DATA_JSON_PATH}: {e}")
-        return
-    
-    if not all_pages_data:
-        print("Error: Ingested data is empty.")
-        return
+    if config.PAGE_STORE_ENABLED and os.path.exists(config.PAGE_STORE_PATH):
+        page_store = PageStore(config.PAGE_STORE_PATH)
+        page_count = page_store.page_count()
+        if not page_count:
+            print(f"Error: Page store {config.PAGE_STORE_PATH} is empty.")
+            page_store.close()
+            return
+        all_pages = page_store.iter_pages()
+        print(f"Loaded {page_count} page entries from page store.")
+    else:
+        page_store = None
+        if not os.path.exists(config.INGESTED_DATA_JSON_PATH):
+            print(f"Error: Ingested data file not found at {config.INGESTED_DATA_JSON_PATH}")
+            print("Please run the CDI script (run_cdi.py) first.")
+            return
+
+        try:
+            with open(config.INGESTED_DATA_JSON_PATH, "r", encoding="utf-8") as f:
+                all_pages_data = json.load(f) 
+        except json.JSONDecodeError as e:
+            print(f"Error decoding JSON from {config.INGESTED_DATA_JSON_PATH}: {e}")
+            return
+        except Exception as e:
+            print(f"Error reading ingested data file {config.INGESTED_DATA_JSON_PATH}: {e}")
+            return
 
-    print(f"Loaded {len(all_pages_data)} page entries from JSON.")
+        if not all_pages_data:
+            print("Error: Ingested data is empty.")
+            return
+
+        all_pages = all_pages_data.items()
+        print(f"Loaded {len(all_pages_data)} page entries from JSON.")
 
     if not os.path.exists(config.TARGET_DOCS_DIR):
         os.makedirs(config.TARGET_DOCS_DIR)
         print(f"Created base output directory: {config.TARGET_DOCS_DIR}")
 
-    for deepwiki_href, page_data in all_pages_data.items():
+    sources = configured_sources() # index (or load) the source checkout and line maps once, and hand them to the workers
+
+    incremental = config.SPBCP_INCREMENTAL
+    manifest, previous_pages = load_manifest() if incremental else (None, {})
+    if args.force: previous_pages = {href: dict(entry, input_hash=None, output_hash=None) for href, entry in previous_pages.items()}
+    graph = LinkGraph(config.LINK_GRAPH_PATH) if config.LINK_GRAPH_ENABLED else None
+    if graph is not None: graph.begin_site_map()
+    built_count = written_count = skipped_count = deleted_count = 0
+    output_paths = set()
+    pending = [] # (deepwiki_href, input_hash, build_and_write_page arguments) for the pages to build
+
+    for deepwiki_href, page_data in all_pages:
         title = page_data.get("title", "Untitled Page")
         target_astro_path_str = page_data.get("target_astro_path")
+        if graph is not None: graph.add_page(deepwiki_href, page_data)
 
         if not target_astro_path_str:
             print(f"Warning: Skipping page '{title}' (deepwiki_href: {deepwiki_href}) due to missing 'target_astro_path'.")
             continue
-        
-        print(f"Processing page: '{title}' -> Astro path: '{target_astro_path_str}'")
-
-        if target_astro_path_str == "/":
-            filename = "index.mdx"
-            output_path_obj = Path(config.TARGET_DOCS_DIR) / filename
-        else:
-            path_segments = target_astro_path_str.strip("/").split("/")
-            filename = f"{sanitize_filename_component(path_segments[-1])}.mdx"
-            if len(path_segments) > 1:
-                sanitized_dir_parts = [sanitize_filename_component(part) for part in path_segments[:-1]]
-                directory_path = Path(config.TARGET_DOCS_DIR).joinpath(*sanitized_dir_parts)
-            else:
-                directory_path = Path(config.TARGET_DOCS_DIR)
-            output_path_obj = directory_path / filename
-        
-        create_directory_if_not_exists(str(output_path_obj))
-
-        mdx_content = build_page_content(page_data) 
 
+        output_path_obj = output_path_for(target_astro_path_str)
+        output_paths.add(str(output_path_obj))
+        input_hash = page_input_hash(page_data)
+        previous_entry = previous_pages.get(deepwiki_href)
+        if previous_entry and previous_entry["input_hash"] == input_hash \
+                and previous_entry["output_path"] == str(output_path_obj) and output_path_obj.exists():
+            manifest["pages"][deepwiki_href] = previous_entry
+            skipped_count += 1
+            continue
+
+        # Directories are created here, in page order, so workers never race on them.
+        output_directory = os.path.dirname(str(output_path_obj))
+        created_directory = None
+        if not os.path.exists(output_directory):
+            os.makedirs(output_directory)
+            created_directory = output_directory
+        # Same output path: the manifest's hash of its last SPBCP output saves rewriting a post-processed file.
+        previous_output_hash = previous_entry.get("output_hash") \
+            if previous_entry and previous_entry["output_path"] == str(output_path_obj) else None
+        pending.append((deepwiki_href, input_hash,
+                        (title, target_astro_path_str, page_data, str(output_path_obj), created_directory, previous_output_hash)))
+
+    errors = []
+    tasks = [task for _, _, task in pending]
+    for (deepwiki_href, input_hash, task), (_, outcome, error) in zip(pending, run_ordered(build_and_write_page, tasks, args.jobs, context=sources)):
+        if error:
+            print(f"  Error building page {deepwiki_href}: {error}")
+            errors.append((deepwiki_href, error))
+            continue
+        written, output_hash = outcome
+        built_count += 1
+        if written:
+            written_count += 1
+            if graph is not None: graph.set_written(deepwiki_href, os.stat(task[3]).st_mtime_ns)
+        if incremental and output_hash is not None:
+            manifest["pages"][deepwiki_href] = {
+                "input_hash": input_hash, "output_path": task[3], "output_hash": output_hash,
+            }
+
+    if incremental:
+        # Pages from the previous run that are no longer in the ingested data (or moved to another path).
+        for entry in previous_pages.values():
+            if entry["output_path"] not in output_paths and delete_orphaned_page(entry["output_path"]):
+                deleted_count += 1
+                print(f"  Deleted orphaned page: {entry['output_path']}")
+        try:
+            save_manifest(manifest)
+        except Exception as e:
+            print(f"Error saving SPBCP manifest {config.SPBCP_MANIFEST_PATH}: {e}")
+
+    if graph is not None:
         try:
-            with open(output_path_obj, "w", encoding="utf-8") as f:
-                f.write(mdx_content)
-            print(f"  Successfully wrote: {output_path_obj}")
+            graph.save()
         except Exception as e:
-            print(f"  Error writing file {output_path_obj}: {e}")
+            print(f"Error saving link graph {config.LINK_GRAPH_PATH}: {e}")
+
+    print(f"Built {built_count} pages ({written_count} written, {built_count - written_count} unchanged on disk), "
+          f"skipped {skipped_count} unchanged pages, deleted {deleted_count} orphaned pages.")
+    print_errors(errors)
 
+    if page_store: page_store.close()
     print("SPBCP run completed.")
 
 if __name__ == "__main__":
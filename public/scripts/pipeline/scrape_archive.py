@@ -0,0 +1,154 @@
+# scrape_archive.py
+# Record/replay archive for the scrapers (run_cdi.py, run_scrape_gitbook.py)
+
+import base64
+import hashlib
+import json
+import threading
+import time
+import zipfile
+
+ARCHIVE_VERSION = 1
+INDEX_NAME = "index.json"
+
+
+class ArchiveMiss(LookupError):
+    """Raised in replay mode when the archive has no entry for a request."""
+
+
+class ArchivedBrowser:
+    """
+    Stands in for a WebDriver in replay mode. The ingestor reads archived payloads instead of
+    driving it, so it only needs to be truthy and closable.
+    """
+
+    current_url = None
+
+    def quit(self):
+        pass
+
+
+class ScrapeArchive:
+    """
+    A compressed (zip, deflate) snapshot of everything a scraper fetched: HTTP responses and the
+    payloads read from the browser (navigation trees, script bodies, page HTML). Entries are keyed
+    by (kind, key), e.g. ("http", "GET text/html https://...") or ("selenium_scripts", url).
+
+    mode="record" writes every entry as it is fetched; mode="replay" serves them back without any
+    network access. With replay_speed > 0 each replayed entry takes its recorded fetch time divided
+    by replay_speed (1.0 = recorded speed); 0 replays as fast as possible.
+    """
+
+    def __init__(self, path, mode, replay_speed=0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown archive mode: {mode!r} (expected 'record' or 'replay')")
+        self.path = path
+        self.mode = mode
+        self.replay_speed = replay_speed or 0
+        self._lock = threading.Lock()
+        self._index = {}
+        self.hits = 0
+        self.misses = 0
+        if mode == "record":
+            self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        else:
+            self._zip = zipfile.ZipFile(path, "r")
+            index = json.loads(self._zip.read(INDEX_NAME))
+            if index.get("version") != ARCHIVE_VERSION:
+                raise ValueError(f"Unsupported archive version in {path}: {index.get('version')}")
+            self._index = index["entries"]
+        print(f"{'Recording to' if self.recording else 'Replaying from'} scrape archive: {path}")
+
+    @property
+    def recording(self):
+        return self.mode == "record"
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    @staticmethod
+    def _index_key(kind, key):
+        return f"{kind} {key}"
+
+    def has(self, kind, key):
+        return self._index_key(kind, key) in self._index
+
+    def _write(self, kind, key, entry):
+        index_key = self._index_key(kind, key)
+        name = f"entries/{hashlib.sha1(index_key.encode('utf-8')).hexdigest()}.json"
+        with self._lock:
+            if index_key in self._index:
+                return # keep the first capture of a URL, like a browser cache would
+            self._zip.writestr(name, json.dumps(entry, ensure_ascii=False))
+            self._index[index_key] = name
+
+    def _read(self, kind, key):
+        name = self._index.get(self._index_key(kind, key))
+        with self._lock:
+            if name is None:
+                self.misses += 1
+                raise ArchiveMiss(f"No archived {kind} entry for {key}")
+            self.hits += 1
+            entry = json.loads(self._zip.read(name))
+        if self.replay_speed > 0:
+            time.sleep(entry.get("elapsed", 0) / self.replay_speed)
+        return entry
+
+    # --- HTTP responses ---
+
+    def record_response(self, kind, key, status, body, validators, elapsed):
+        self._write(kind, key, {
+            "status": status,
+            "body": base64.b64encode(body).decode("ascii"),
+            "validators": validators,
+            "elapsed": elapsed,
+        })
+
+    def replay_response(self, kind, key, etag=None, last_modified=None):
+        """Returns (status, body bytes or None on 304, validators); revalidation against the archived validators is honoured."""
+        entry = self._read(kind, key)
+        validators = entry["validators"]
+        if (etag and etag == validators.get("etag")) or (last_modified and last_modified == validators.get("last_modified")):
+            return 304, None, validators
+        return entry["status"], base64.b64decode(entry["body"]), validators
+
+    # --- Payloads read from a browser ---
+
+    def record_payload(self, kind, key, value, elapsed=0):
+        self._write(kind, key, {"value": value, "elapsed": elapsed})
+
+    def replay_payload(self, kind, key):
+        return self._read(kind, key)["value"]
+
+    def close(self):
+        with self._lock:
+            if self._zip is None:
+                return
+            if self.recording:
+                self._zip.writestr(INDEX_NAME, json.dumps({"version": ARCHIVE_VERSION, "entries": self._index}, ensure_ascii=False))
+                print(f"Scrape archive saved with {len(self._index)} entries: {self.path}")
+            else:
+                print(f"Scrape archive replayed {self.hits} entries ({self.misses} missing).")
+            self._zip.close()
+            self._zip = None
+
+
+def add_archive_arguments(parser):
+    """Adds the --record / --replay / --replay-speed options to an argparse parser."""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--record", metavar="ARCHIVE", help="Save every fetched page and payload into this archive (.zip).")
+    group.add_argument("--replay", metavar="ARCHIVE", help="Serve pages and payloads from this archive instead of the network.")
+    parser.add_argument(
+        "--replay-speed", type=float, default=0,
+        help="Replay speed relative to the recording: 1 = recorded fetch times, 2 = twice as fast, 0 = no delay (default)."
+    )
+
+
+def open_archive_from_args(args):
+    """Returns the ScrapeArchive selected by add_archive_arguments' options, or None."""
+    if args.record:
+        return ScrapeArchive(args.record, "record")
+    if args.replay:
+        return ScrapeArchive(args.replay, "replay", replay_speed=args.replay_speed)
+    return None
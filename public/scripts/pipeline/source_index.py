@@ -0,0 +1,401 @@
+# source_index.py
+# Offline index of the source repository (paths and line counts at GITHUB_REF, line maps between refs), and the
+# parsing and resolving of the source links SPBCP and the .mdx fixers write
+
+import json
+import os
+import re
+import subprocess
+import threading
+from urllib.parse import urljoin
+
+import config
+
+INDEX_VERSION = 1
+
+
+class SourceIndexError(RuntimeError):
+    """Raised when the local checkout cannot be read (not a git repository, unknown ref, git missing)."""
+
+
+def _git(checkout_path, *args):
+    try:
+        result = subprocess.run(["git", "-C", checkout_path, *args], capture_output=True, check=True)
+    except FileNotFoundError as e:
+        raise SourceIndexError("git is not installed") from e
+    except subprocess.CalledProcessError as e:
+        raise SourceIndexError(e.stderr.decode("utf-8", "replace").strip() or f"git {args[0]} failed") from e
+    return result.stdout
+
+def resolve_commit(checkout_path, ref):
+    """Returns the commit SHA `ref` names in the checkout (no fetching: the ref must already be present)."""
+    try:
+        return _git(checkout_path, "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}").decode("ascii").strip()
+    except SourceIndexError as e:
+        raise SourceIndexError(f"{ref} is not a commit in {checkout_path} ({e}); fetch it first") from e
+
+def count_lines(data):
+    """Number of lines GitHub shows for a file (a trailing newline does not start a new line)."""
+    if not data:
+        return 0
+    return data.count(b"\n") + (0 if data.endswith(b"\n") else 1)
+
+def read_tree_line_counts(checkout_path, commit):
+    """Returns {path: line count} for every file in the commit, read from the object database (the working tree is not used)."""
+    blobs = []
+    for entry in _git(checkout_path, "ls-tree", "-r", "-z", commit).split(b"\0"):
+        if not entry:
+            continue
+        meta, path = entry.split(b"\t", 1)
+        _, object_type, sha = meta.split(b" ")
+        if object_type == b"blob": # submodules ("commit" entries) have no content here
+            blobs.append((path.decode("utf-8", "replace"), sha))
+
+    process = subprocess.Popen(["git", "-C", checkout_path, "cat-file", "--batch"],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    def write_requests():
+        try:
+            for _, sha in blobs:
+                process.stdin.write(sha + b"\n")
+        finally:
+            process.stdin.close()
+    writer = threading.Thread(target=write_requests, daemon=True)
+    writer.start()
+
+    line_counts = {}
+    for path, sha in blobs:
+        header = process.stdout.readline().split()
+        if len(header) != 3:
+            process.kill()
+            raise SourceIndexError(f"git cat-file returned no content for {path} ({sha.decode('ascii')})")
+        line_counts[path] = count_lines(process.stdout.read(int(header[2])))
+        process.stdout.read(1) # newline after the content
+    writer.join()
+    process.wait()
+    return line_counts
+
+
+class SourceIndex:
+    """
+    Paths and line counts of the source repository at one commit, with every path suffix
+    ("parser.py", "utils/parser.py", "compute/utils/parser.py") mapped to the paths it ends,
+    so a short or partial filename cited by DeepWiki resolves with one dictionary lookup.
+    """
+
+    def __init__(self, commit, line_counts):
+        self.commit = commit
+        self.line_counts = line_counts
+        self.directories = set()
+        self._by_suffix = {}
+        for path in line_counts:
+            parts = path.split("/")
+            for i in range(len(parts)):
+                self._by_suffix.setdefault("/".join(parts[i:]), []).append(path)
+            for i in range(1, len(parts)):
+                self.directories.add("/".join(parts[:i]))
+
+    def lookup(self, filename):
+        """
+        Returns (path, problem): the repository path `filename` refers to, or None and a short
+        description of why not ("not found", or the candidate paths when it is ambiguous).
+        """
+        name = filename.strip().lstrip("/")
+        while name.startswith("./"):
+            name = name[2:]
+        if name in self.line_counts or name.rstrip("/") in self.directories:
+            return name, None
+        candidates = self._by_suffix.get(name)
+        if not candidates:
+            return None, f"not found in the source tree at {self.commit[:12]}"
+        if len(candidates) > 1:
+            shown = ", ".join(sorted(candidates)[:5]) + (", ..." if len(candidates) > 5 else "")
+            return None, f"ambiguous, matches {len(candidates)} files ({shown})"
+        return candidates[0], None
+
+    def check_lines(self, path, line_start, line_end=None):
+        """Returns a description of the problem if the line range runs past the end of the file, else None."""
+        line_count = self.line_counts.get(path)
+        if line_count is None: # a directory
+            return None
+        last_line = max(int(line_start or 0), int(line_end or 0))
+        if last_line > line_count:
+            return f"line {last_line} is past the end of {path} ({line_count} lines)"
+        return None
+
+    def to_json(self):
+        return {"version": INDEX_VERSION, "commit": self.commit, "files": self.line_counts}
+
+
+def build_source_index(checkout_path, ref, cache_path=None):
+    """
+    Returns the SourceIndex of `ref` in the local checkout, from cache_path if it was built for
+    the same commit, otherwise by reading the git object database (and then saving it there).
+    """
+    commit = resolve_commit(checkout_path, ref)
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") == INDEX_VERSION and cached.get("commit") == commit:
+                return SourceIndex(commit, cached["files"])
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            print(f"Warning: Could not read source index cache {cache_path}: {e}. Rebuilding it.")
+
+    print(f"Indexing source tree of {checkout_path} at {ref} ({commit[:12]})...")
+    index = SourceIndex(commit, read_tree_line_counts(checkout_path, commit))
+    print(f"Indexed {len(index.line_counts)} files.")
+    if cache_path:
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index.to_json(), f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    return index
+
+
+_configured_index = None
+_configured_index_loaded = False
+
+def get_configured_source_index():
+    """
+    Returns the SourceIndex for config.SOURCE_CHECKOUT_PATH at config.GITHUB_REF (loaded once per
+    process), or None if no checkout is configured or it cannot be read.
+    """
+    global _configured_index, _configured_index_loaded
+    if not _configured_index_loaded:
+        _configured_index_loaded = True
+        checkout_path = config.SOURCE_CHECKOUT_PATH
+        if checkout_path:
+            try:
+                _configured_index = build_source_index(checkout_path, config.GITHUB_REF, config.SOURCE_INDEX_CACHE_PATH)
+            except (SourceIndexError, OSError) as e:
+                print(f"Warning: Could not index source checkout {checkout_path} at {config.GITHUB_REF}: {e}. "
+                      "Source links will not be checked.")
+    return _configured_index
+
+
+LINE_MAP_VERSION = 1
+
+def _parse_hunk_range(text):
+    start, _, count = text.partition(",")
+    return int(start), int(count) if count else 1
+
+def read_changed_files(checkout_path, old_commit, new_commit):
+    """
+    Returns {old path: {"path": new path or None if deleted, "hunks": [[old_start, old_count, new_start, new_count], ...]}}
+    for every file that differs between the commits, from one `git diff -U0` (with rename detection).
+    """
+    diff = _git(checkout_path, "-c", "core.quotePath=false", "diff", "-U0", "-M", "--no-color", "--no-ext-diff",
+                old_commit, new_commit).decode("utf-8", "replace")
+    changed = {}
+    entry = None
+    for line in diff.split("\n"):
+        if line.startswith("diff --git "):
+            entry = {"path": None, "hunks": []}
+            old_path = new_path = None
+            in_header = True
+        elif entry is None:
+            continue
+        elif line.startswith("@@ "):
+            in_header = False
+            old_range, new_range = line.split(" ")[1:3]
+            entry["hunks"].append([*_parse_hunk_range(old_range[1:]), *_parse_hunk_range(new_range[1:])])
+        elif not in_header: # removed/added lines, which may look like headers ("--- x" for a removed "-- x")
+            continue
+        elif line.startswith("rename from "):
+            old_path = line[len("rename from "):]
+        elif line.startswith("rename to "):
+            new_path = line[len("rename to "):]
+            changed[old_path] = dict(entry, path=new_path)
+            entry = changed[old_path]
+        elif line.startswith("--- "):
+            old_path = old_path or (line[len("--- a/"):] if line != "--- /dev/null" else None)
+        elif line.startswith("+++ "):
+            new_path = new_path or (line[len("+++ b/"):] if line != "+++ /dev/null" else None)
+            if old_path is not None: # added files cannot be cited at the old ref
+                entry["path"] = new_path
+                changed[old_path] = entry
+    return changed
+
+
+class LineMap:
+    """
+    Maps file paths and line numbers cited at one commit to another commit, from the -U0 diff hunks
+    between them. A line maps if it is not part of a changed hunk (lines only move when code above
+    them is added or removed); a range maps if both its first and last line do.
+    """
+
+    def __init__(self, old_commit, new_commit, changed_files):
+        self.old_commit = old_commit
+        self.new_commit = new_commit
+        self.changed_files = changed_files
+
+    @staticmethod
+    def _map_line(hunks, line):
+        shift = 0
+        for old_start, old_count, new_start, new_count in hunks:
+            if old_count == 0: # insertion after line old_start
+                if old_start >= line:
+                    break
+            else:
+                if line < old_start:
+                    break
+                if line < old_start + old_count:
+                    return None
+            shift += new_count - old_count
+        return line + shift
+
+    def map_range(self, path, line_start=None, line_end=None):
+        """
+        Returns (new path, new line_start, new line_end, problem); problem is None if the file and lines
+        were mapped, else a short description (and the lines are returned unchanged).
+        """
+        entry = self.changed_files.get(path)
+        if entry is None:
+            return path, line_start, line_end, None
+        if entry["path"] is None:
+            return path, line_start, line_end, f"{path} was deleted"
+        new_start = new_end = None
+        if line_start:
+            new_start = self._map_line(entry["hunks"], int(line_start))
+            new_end = self._map_line(entry["hunks"], int(line_end)) if line_end else None
+            if new_start is None or (line_end and new_end is None):
+                return path, line_start, line_end, f"lines changed in {path}"
+        return entry["path"], new_start and str(new_start), new_end and str(new_end), None
+
+
+def build_line_map(checkout_path, old_ref, new_ref, cache_path=None):
+    """Returns the LineMap from old_ref to new_ref, from cache_path if it has the same pair of commits, else from git."""
+    old_commit = resolve_commit(checkout_path, old_ref)
+    new_commit = resolve_commit(checkout_path, new_ref)
+    key = f"{old_commit}..{new_commit}"
+    cached = {"version": LINE_MAP_VERSION, "maps": {}}
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            if loaded.get("version") == LINE_MAP_VERSION:
+                cached = loaded
+                if key in cached["maps"]:
+                    return LineMap(old_commit, new_commit, cached["maps"][key])
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            print(f"Warning: Could not read line map cache {cache_path}: {e}. Rebuilding it.")
+
+    print(f"Computing line maps from {old_ref} ({old_commit[:12]}) to {new_ref} ({new_commit[:12]})...")
+    line_map = LineMap(old_commit, new_commit, read_changed_files(checkout_path, old_commit, new_commit))
+    print(f"{len(line_map.changed_files)} files changed.")
+    if cache_path:
+        cached["maps"][key] = line_map.changed_files
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cached, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    return line_map
+
+
+_configured_line_map = None
+_configured_line_map_loaded = False
+
+def get_configured_line_map():
+    """
+    Returns the LineMap from config.DEEPWIKI_SOURCE_REF to config.GITHUB_REF in config.SOURCE_CHECKOUT_PATH
+    (loaded once per process), or None if the refs are the same, no checkout is configured or it cannot be read.
+    """
+    global _configured_line_map, _configured_line_map_loaded
+    if not _configured_line_map_loaded:
+        _configured_line_map_loaded = True
+        checkout_path = config.SOURCE_CHECKOUT_PATH
+        if checkout_path and config.DEEPWIKI_SOURCE_REF and config.DEEPWIKI_SOURCE_REF != config.GITHUB_REF:
+            try:
+                _configured_line_map = build_line_map(checkout_path, config.DEEPWIKI_SOURCE_REF, config.GITHUB_REF,
+                                                      config.SOURCE_LINE_MAP_CACHE_PATH)
+            except (SourceIndexError, OSError) as e:
+                print(f"Warning: Could not map lines from {config.DEEPWIKI_SOURCE_REF} to {config.GITHUB_REF}: {e}. "
+                      "Source line numbers will not be remapped.")
+    return _configured_line_map
+
+def configured_sources():
+    """
+    (source index, line map) of the configuration, loaded once in this process. Scripts with --jobs pass it to
+    their workers as run_ordered's context, where use_configured_sources installs it, so worker processes
+    (also when started with spawn, the default on macOS and Windows) never index the checkout themselves.
+    """
+    return get_configured_source_index(), get_configured_line_map()
+
+def use_configured_sources(sources):
+    """Makes get_configured_source_index() and get_configured_line_map() return the given (source index, line map)."""
+    global _configured_index, _configured_index_loaded, _configured_line_map, _configured_line_map_loaded
+    _configured_index, _configured_line_map = sources
+    _configured_index_loaded = _configured_line_map_loaded = True
+
+
+def parse_source_reference(text_content):
+    """Parses 'path/to/filename:line-start-line-end' or 'filename:line' or 'filename' into (filename, line_start, line_end)."""
+    match = re.match(r"([\w\._/-]+)(?::(\d+)(?:-(\d+))?)?", text_content) 
+    if match:
+        return match.group(1), match.group(2), match.group(3)
+    return text_content, None, None
+
+def line_fragment_for(line_start, line_end):
+    if line_start and line_end:
+        return f"#L{line_start}-L{line_end}"
+    elif line_start:
+        return f"#L{line_start}"
+    return ""
+
+def source_reference_text(filename, line_start, line_end):
+    """Formats a source reference the way DeepWiki cites it: 'filename:start-end', 'filename:start' or 'filename'."""
+    return filename + (f":{line_start}" if line_start else "") + (f"-{line_end}" if line_end else "")
+
+def remap_link_text(text, filename, line_start, line_end, new_filename, new_start, new_end):
+    """Updates a link text that cites the same file and lines as its href ('file:start-end') to the remapped ones."""
+    text_filename = parse_source_reference(text)[0]
+    if text != source_reference_text(text_filename, line_start, line_end) or not filename.endswith(text_filename):
+        return text
+    if text_filename == filename:
+        text_filename = new_filename
+    return source_reference_text(text_filename, new_start, new_end)
+
+def resolve_source_link(filename, line_start=None, line_end=None, github_prefix=None):
+    """
+    GitHub blob URL for a cited source file. With a source index (SOURCE_CHECKOUT_PATH), short or partial
+    filenames are resolved to their full path and lines past the end of the file are reported;
+    files the index cannot resolve are reported and linked as cited. With DEEPWIKI_SOURCE_REF, the
+    cited lines are moved to GITHUB_REF (or, if they changed, linked at DEEPWIKI_SOURCE_REF).
+    github_prefix defaults to GITHUB_BLOB_URL_PREFIX.
+    Returns (url, moved): moved is (path, new path, new line_start, new line_end) if the line map was applied, else None.
+    """
+    source_index = get_configured_source_index()
+    resolved = None
+    if source_index is not None:
+        resolved, problem = source_index.lookup(filename)
+        if resolved is None:
+            print(f"    Warning: Source file '{filename}' is {problem}; linking it as cited.")
+        else:
+            filename = resolved
+    moved = None
+    line_map = get_configured_line_map()
+    if line_map is not None:
+        new_filename, new_start, new_end, problem = line_map.map_range(filename, line_start, line_end)
+        if problem:
+            print(f"    Warning: Source link '{filename}{line_fragment_for(line_start, line_end)}': {problem}; "
+                  f"linking it at {config.DEEPWIKI_SOURCE_REF}.")
+            url = f"{config.GITHUB_REPO_URL}/blob/{config.DEEPWIKI_SOURCE_REF}/{filename.lstrip('/')}"
+            return url + line_fragment_for(line_start, line_end), None
+        moved = (filename, new_filename, new_start, new_end)
+        filename, line_start, line_end = new_filename, new_start, new_end
+    if resolved is not None:
+        problem = source_index.check_lines(filename, line_start, line_end)
+        if problem:
+            print(f"    Warning: Source link '{filename}{line_fragment_for(line_start, line_end)}': {problem}.")
+    prefix = github_prefix or config.GITHUB_BLOB_URL_PREFIX
+    if not prefix.endswith('/'):
+        prefix += '/'
+    return urljoin(prefix, filename.lstrip('/')) + line_fragment_for(line_start, line_end), moved
+
+def parse_source_href(source_href):
+    """Parses a 'path/to/file#L10-L20' style href into (filename, line_start, line_end, other fragment)."""
+    filename, _, fragment = source_href.partition("#")
+    line_match = re.fullmatch(r"L(\d+)(?:-L(\d+))?", fragment)
+    if line_match:
+        return filename, line_match.group(1), line_match.group(2), ""
+    return filename, None, None, fragment
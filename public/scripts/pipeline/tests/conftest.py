@@ -0,0 +1,5 @@
+# Makes the pipeline scripts (flat modules next to this directory) importable from the tests.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
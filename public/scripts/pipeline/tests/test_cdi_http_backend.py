@@ -0,0 +1,113 @@
+# test_cdi_http_backend.py
+# The HTTP backend must ingest the same data as the Selenium path. A recorded DeepWiki fixture site
+# (tests/fixtures/deepwiki_site: page HTML and RSC responses) is served from http.server and ingested
+# with CDI_INGESTION_BACKEND = "http"; the Selenium recording of the same site
+# (tests/fixtures/deepwiki_selenium.zip) is replayed with the "selenium" backend.
+
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+
+import config
+import run_cdi
+from scrape_archive import ScrapeArchive
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SITE_DIR = os.path.join(FIXTURES_DIR, "deepwiki_site")
+SELENIUM_ARCHIVE = os.path.join(FIXTURES_DIR, "deepwiki_selenium.zip")
+# BASE_DEEPWIKI_URL the Selenium recording was made with.
+RECORDED_BASE_URL = "http://127.0.0.1:8765/neuralinternet/ni-compute"
+WIKI_PATH = urlparse(RECORDED_BASE_URL).path
+
+
+class FixtureSiteHandler(BaseHTTPRequestHandler):
+    """Serves SITE_DIR: '<path>.html' for page requests, '<path>.rsc' for 'RSC: 1' requests, with ETags."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        is_rsc = self.headers.get("RSC") == "1"
+        file_path = os.path.join(SITE_DIR, path.lstrip("/") + (".rsc" if is_rsc else ".html"))
+        if ".." in path or not os.path.isfile(file_path):
+            self.send_response(404)
+            self.end_headers()
+            return
+        with open(file_path, "rb") as f:
+            body = f.read()
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/x-component" if is_rsc else "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_fixture_site(port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), FixtureSiteHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def cdi_config(monkeypatch, tmp_path):
+    """Points CDI's outputs at tmp_path and turns off the stores and caches that persist between runs."""
+    monkeypatch.setattr(config, "CDI_CHECKPOINT_PATH", str(tmp_path / "checkpoint.json"))
+    monkeypatch.setattr(config, "CDI_INCREMENTAL", False)
+    monkeypatch.setattr(config, "PAGE_STORE_ENABLED", False)
+    monkeypatch.setattr(config, "LINK_GRAPH_ENABLED", False)
+    monkeypatch.setattr(config, "CDI_SELENIUM_FALLBACK", False)
+
+    def ingest(backend, base_url, archive=None):
+        output_path = tmp_path / f"ingested_{backend}.json"
+        monkeypatch.setattr(config, "CDI_INGESTION_BACKEND", backend)
+        monkeypatch.setattr(config, "BASE_DEEPWIKI_URL", base_url)
+        monkeypatch.setattr(config, "INGESTED_DATA_JSON_PATH", str(output_path))
+        ingestor = run_cdi.ComprehensiveDeepWikiIngestor(archive=archive)
+        try:
+            ingestor.run()
+        finally:
+            ingestor.close_driver()
+        with open(output_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    return ingest
+
+
+def without_host(site_map):
+    """The site map without full_deepwiki_url, the only field that depends on the server's address."""
+    return {href: {key: value for key, value in page.items() if key != "full_deepwiki_url"}
+            for href, page in site_map.items()}
+
+
+def test_http_backend_matches_selenium_replay(cdi_config):
+    archive = ScrapeArchive(SELENIUM_ARCHIVE, "replay")
+    try:
+        selenium_data = cdi_config("selenium", RECORDED_BASE_URL, archive)
+    finally:
+        archive.close()
+    assert archive.misses == 0
+
+    server = start_fixture_site()
+    try:
+        http_data = cdi_config("http", f"http://127.0.0.1:{server.server_address[1]}{WIKI_PATH}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert len(selenium_data) == 6
+    assert all(page["main_markdown_content"] for page in selenium_data.values())
+    assert list(http_data) == list(selenium_data)
+    assert without_host(http_data) == without_host(selenium_data)
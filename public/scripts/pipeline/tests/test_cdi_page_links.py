@@ -0,0 +1,138 @@
+# test_cdi_page_links.py
+# CDI's single-pass _extract_page_links must find the same mermaid diagrams and links, in the same order, as the
+# per-pattern passes it replaced (kept below as the reference), on the shipped ingested pages and on edge cases.
+
+import json
+import os
+import re
+from urllib.parse import urljoin, urlparse
+
+import pytest
+
+import config
+import run_cdi
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_PAGE = """# Scoring System
+
+<details>
+<summary>Relevant source files</summary>
+
+The following files were used as context for generating this wiki page:
+
+- [neurons/validator.py](neurons/validator.py)
+-[compute/utils/math.py](compute/utils/math.py) - [compute/protocol.py](/compute/protocol.py)
+* [not a dash item](README.md)
+- [ ](empty.py)
+- [neurons/miner.py](neurons/miner.py)
+- [neurons/api.py](neurons/api.py
+
+</details>
+
+See [Overview](#overview), [Miner System](/neuralinternet/ni-compute/3-miner-system) and ![a diagram](diagram.png).
+The [Miner [System](/neuralinternet/ni-compute/3-miner-system) link has a stray bracket.
+
+```mermaid
+graph TB
+    A["[not a link](x)"] --> B
+```
+
+Sources: [neurons/validator.py:356-437]() [compute/utils/math.py:12]() [neurons/validator.py:356-437]()
+  SOURCES: [README.md](README.md) [a [nested] link]() [neurons/validator.py:356-437]()\r
+sources: [unclosed](link and [compute/protocol.py:1-40]()
+Sources: [split across](
+lines) [neurons/api.py:3]()
+Sources:\x0b[after a vertical tab]() continues [on the same line]()
+
+```mermaid
+sequenceDiagram
+    V->>M: [challenge](#2.1)
+```
+
+Sources: [neurons/Validator/calculate_pow_score.py:1-50]() and the [Scoring System](#scoring-system)
+"""
+
+
+def reference_page_links(ingestor, markdown_content):
+    """The per-pattern passes _process_single_page made before the single pass (returns (mermaid_blocks, links))."""
+    resolved_links_for_page = []
+    mermaid_blocks = re.findall(r"```mermaid\n(.*?)\n```", markdown_content, re.DOTALL)
+
+    relevant_files_details_match = re.search(
+        r"<details>\s*<summary>Relevant source files</summary>(.*?)<\/details>", markdown_content, re.IGNORECASE | re.DOTALL
+    )
+    if relevant_files_details_match:
+        for link_match in re.finditer(r"-\s*\[([^\]]+)\]\(([^)]+)\)", relevant_files_details_match.group(1)):
+            text = link_match.group(1).strip()
+            original_href = link_match.group(2).strip()
+            if not text or not original_href: continue
+            resolved_links_for_page.append({
+                "text": text,
+                "href": urljoin(config.GITHUB_BLOB_URL_PREFIX, original_href.lstrip('/')),
+                "original_deepwiki_href": original_href,
+                "context": "collapsible_aside_link"
+            })
+
+    for line in markdown_content.splitlines():
+        if line.strip().lower().startswith("sources:"):
+            for link_match in re.finditer(r"\[([^\]]+?)\]\(([^)]*?)\)", line):
+                text_content = link_match.group(1).strip()
+                original_href_val = link_match.group(2).strip()
+                is_already_added = any(existing_link["text"] == text_content and
+                                       existing_link["original_deepwiki_href"] == original_href_val and
+                                       existing_link["context"] == "inline_source_link"
+                                       for existing_link in resolved_links_for_page)
+                if not is_already_added:
+                    resolved_links_for_page.append({
+                        "text": text_content, "href": "",
+                        "original_deepwiki_href": original_href_val,
+                        "context": "inline_source_link"
+                    })
+
+    for internal_link_match in re.finditer(r"\[([^!][^\]]*)\]\(([^)]+)\)", markdown_content):
+        link_text = internal_link_match.group(1)
+        original_internal_href = internal_link_match.group(2)
+        resolved_astro_path = None
+        original_path_lower = urlparse(original_internal_href).path.lower()
+        if original_path_lower in ingestor.link_resolution_map:
+            resolved_astro_path = ingestor.link_resolution_map[original_path_lower]
+        elif original_internal_href.startswith("#") and link_text.lower() in ingestor.link_resolution_map:
+            resolved_astro_path = ingestor.link_resolution_map[link_text.lower()] + original_internal_href
+        if resolved_astro_path:
+            resolved_links_for_page.append({
+                "text": link_text, "href": resolved_astro_path,
+                "original_deepwiki_href": original_internal_href,
+                "context": "internal_page_link_from_content_body"
+            })
+    return mermaid_blocks, resolved_links_for_page
+
+
+def load_pages():
+    with open(os.path.join(PIPELINE_DIR, "ingested_deepwiki_data.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def ingestor():
+    """An ingestor with only the link resolution map of the shipped pages (by DeepWiki path and by title)."""
+    ingestor = run_cdi.ComprehensiveDeepWikiIngestor.__new__(run_cdi.ComprehensiveDeepWikiIngestor)
+    ingestor.link_resolution_map = {}
+    for page_data in load_pages().values():
+        ingestor.link_resolution_map[page_data["original_deepwiki_href"].lower()] = page_data["target_astro_path"]
+        ingestor.link_resolution_map[page_data["title"].lower()] = page_data["target_astro_path"]
+    return ingestor
+
+
+@pytest.mark.parametrize("markdown_content", [SAMPLE_PAGE] + [page_data["main_markdown_content"]
+                                                              for page_data in load_pages().values()])
+def test_matches_per_pattern_passes(ingestor, markdown_content):
+    expected = reference_page_links(ingestor, markdown_content)
+    assert ingestor._extract_page_links(markdown_content) == expected
+
+
+def test_sample_page_has_every_link_context(ingestor):
+    mermaid_blocks, links = ingestor._extract_page_links(SAMPLE_PAGE)
+    assert len(mermaid_blocks) == 2
+    assert {link["context"] for link in links} == {"collapsible_aside_link", "inline_source_link",
+                                                   "internal_page_link_from_content_body"}
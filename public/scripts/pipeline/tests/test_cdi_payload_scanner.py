@@ -0,0 +1,88 @@
+# test_cdi_payload_scanner.py
+# The readiness probe in run_cdi.PAGE_PAYLOAD_SCANNER_JS is a JavaScript port of flight_parser. Run in Node,
+# it must call a page ready exactly when flight_parser finds a markdown document CDI keeps (a '# ' heading of
+# at least MIN_PAGE_LEN_HEURISTIC characters) in the push scripts seen so far, for the fixture pages and for
+# their flight stream pushed in pieces of various sizes, as strings or base64.
+
+import base64
+import json
+import os
+import re
+import shutil
+import subprocess
+
+import pytest
+
+import config
+import run_cdi
+from flight_parser import iter_markdown_documents
+
+SITE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "deepwiki_site", "neuralinternet")
+SCRIPT_RE = re.compile(r"<script>(.*?)</script>", re.DOTALL)
+
+# Reads [{"scripts", "minLength"}] from stdin and prints, for each case, whether the page is ready after each script.
+NODE_RUNNER = run_cdi.PAGE_PAYLOAD_SCANNER_JS + """
+const cases = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+console.log(JSON.stringify(cases.map(({scripts, minLength}) => {
+    const scanner = makePayloadScanner(minLength);
+    return scripts.map(script => { scanner.feedScript(script); return scanner.ready(); });
+})));
+"""
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="Node.js is not installed")
+
+
+def push(kind, data):
+    return f"self.__next_f.push({json.dumps([kind, data])})"
+
+
+def pushed_in_pieces(flight, size, as_base64=False, pushes_per_script=1):
+    """Script bodies pushing the flight stream in pieces of `size` characters (or bytes, as base64)."""
+    if as_base64:
+        data = flight.encode("utf-8")
+        pushes = [push(3, base64.b64encode(data[i:i + size]).decode("ascii")) for i in range(0, len(data), size)]
+    else:
+        pushes = [push(1, flight[i:i + size]) for i in range(0, len(flight), size)]
+    return [";".join(pushes[i:i + pushes_per_script]) for i in range(0, len(pushes), pushes_per_script)]
+
+
+def read_fixture(name):
+    with open(os.path.join(SITE_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def flight_parser_readiness(scripts, min_length):
+    """Whether CDI would find a markdown document after each script, according to flight_parser."""
+    return [any(len(document.strip()) >= min_length for document in iter_markdown_documents(scripts[:count]))
+            for count in range(1, len(scripts) + 1)]
+
+
+def scanner_readiness(cases):
+    result = subprocess.run(["node", "-e", NODE_RUNNER], input=json.dumps(cases), capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def test_scanner_matches_flight_parser():
+    flight = read_fixture(os.path.join("ni-compute", "2.2-scoring-system.rsc"))
+    markdown = "# Unframed page\n\n" + "Text pushed without flight row framing. " * 20
+    cases = [SCRIPT_RE.findall(read_fixture(name)) for name in
+             ("ni-compute.html", os.path.join("ni-compute", "2.2-scoring-system.html"),
+              os.path.join("ni-compute", "3-miner-system.html"))]
+    for size in (61, 500, 4096):
+        cases.append(pushed_in_pieces(flight, size))
+        cases.append(pushed_in_pieces(flight, size, as_base64=True, pushes_per_script=3))
+    cases += [
+        # Rows the scanner skips: stray lines, other length-prefixed rows, a text row that is not markdown.
+        pushed_in_pieces("garbage\n0:[]\na:A3,xyz5:T5,hello" + flight, 97),
+        # No row framing at all: a pushed string with a heading counts, unless text rows turn up later.
+        [push(1, markdown)],
+        [push(1, markdown[:100])],
+        [push(1, "# Short page\n" + " " * 6000)], # long enough only with the whitespace
+        [push(1, markdown), push(1, "5:T5,hello")],
+        [push(0, None), "not a push", push(1, markdown)],
+    ]
+
+    for min_length in (config.MIN_PAGE_LEN_HEURISTIC, 5000):
+        readiness = scanner_readiness([{"scripts": scripts, "minLength": min_length} for scripts in cases])
+        assert readiness == [flight_parser_readiness(scripts, min_length) for scripts in cases]
+        assert any(ready[-1] for ready in readiness) and not all(ready[0] for ready in readiness)
@@ -0,0 +1,119 @@
+# test_fix_source_links.py
+# The document-model source link rewriter must produce the same pages as the regex rewriter it replaced
+# (kept below as the reference), and running it over its own output must make no replacements.
+
+import re
+from urllib.parse import urljoin
+
+import pytest
+
+import run_fix_source_links
+import source_index
+from mdx_document import MdxDocument
+
+GITHUB_PREFIX = "https://github.com/neuralinternet/ni-compute/blob/main/"
+FENCE_RE = re.compile(r"^```.*?^```\n", re.MULTILINE | re.DOTALL)
+
+SAMPLE_PAGE = """---
+title: "Scoring System"
+---
+
+import SourceLink from '@components/SourceLink.astro';
+
+# Scoring System
+
+The validator scores miners by their benchmark results. See [Overview](#overview) and [the miner](/miner-system).
+
+Sources: [neurons/validator.py:356-437]() [compute/utils/math.py:12]()
+
+- [neurons/miner.py](neurons/miner.py)
+- [compute/protocol.py:1-40](https://example.com/elsewhere)
+* [scripts/installation_script/install.sh]()
+  - [compute/pow/__init__.py:7]()
+
+<SourceLink text="neurons/api.py:3" href="https://github.com/neuralinternet/ni-compute/blob/main/neurons/api.py#L3" /> and [docs/hardware.md]()
+
+Weights are set from [compute/wandb/wandb.py:88-120](compute/wandb/wandb.py:88-120), not from [this page](README.md).
+A link that is [not a file](), [v2]() and [README]() stay as they are.
+
+Sources: [neurons/Validator/calculate_pow_score.py:1-50]()
+"""
+
+
+def regex_fix_source_links(content, github_prefix):
+    """The regex rewriter run_fix_source_links.py used before the document model (returns (content, replacements))."""
+    replacements_made = 0
+    target_url = github_prefix if github_prefix.endswith('/') else github_prefix + '/'
+
+    def github_url(link_text):
+        match = re.match(r"([\w\._/-]+)(?::(\d+)(?:-(\d+))?)?", link_text)
+        filename, line_start, line_end = match.groups()
+        line_fragment = f"#L{line_start}-L{line_end}" if line_start and line_end else f"#L{line_start}" if line_start else ""
+        return urljoin(target_url, filename.lstrip('/')) + line_fragment
+
+    def looks_like_file(link_text):
+        return re.search(r"[./\\]", link_text) and "  " not in link_text
+
+    def prefixed_replacer(match):
+        nonlocal replacements_made
+        if "<SourceLink" in match.group(0) or not looks_like_file(match.group(3)):
+            return match.group(0)
+        replacements_made += 1
+        return f"{match.group(1)}{run_fix_source_links.create_source_link_component(match.group(3), github_url(match.group(3)))}"
+
+    def final_replacer(match):
+        nonlocal replacements_made
+        link_text, href = match.group(1), match.group(2)
+        if not looks_like_file(link_text) or href not in ("", link_text):
+            return match.group(0)
+        replacements_made += 1
+        return run_fix_source_links.create_source_link_component(link_text, github_url(link_text))
+
+    content = re.sub(r"(Sources:\s*|\*\s*|\-\s*|\s*\-\s+)(\[([\w\.\-\/:]+)\]\(([^\)]*)\))",
+                     prefixed_replacer, content, flags=re.IGNORECASE)
+    link_pattern = r'\[([\w\.\-\/:]+)\]\(([^\)]*)\)'
+    new_content = ""
+    last_end = 0
+    for sl_match in re.finditer(r'<SourceLink[^>]*>', content):
+        new_content += re.sub(link_pattern, final_replacer, content[last_end:sl_match.start()]) + sl_match.group(0)
+        last_end = sl_match.end()
+    new_content += re.sub(link_pattern, final_replacer, content[last_end:])
+    return new_content, replacements_made
+
+
+@pytest.fixture(autouse=True)
+def no_source_checkout(monkeypatch):
+    """Links are joined to GITHUB_PREFIX as cited, as the regex rewriter did (no source index or line map)."""
+    monkeypatch.setattr(source_index, "get_configured_source_index", lambda: None)
+    monkeypatch.setattr(source_index, "get_configured_line_map", lambda: None)
+
+
+def rewrite(content):
+    doc = MdxDocument(content)
+    count = run_fix_source_links.fix_source_links_in_document(doc, GITHUB_PREFIX)
+    return doc.text, count
+
+
+@pytest.mark.parametrize("content", [
+    SAMPLE_PAGE,
+    # Fenced code is left alone by the document model but not by the regexes; the pages compared have none.
+    FENCE_RE.sub("", run_fix_source_links.build_benchmark_mdx(64 * 1024)),
+], ids=["sample_page", "benchmark_page"])
+def test_matches_regex_rewriter(content):
+    expected, expected_count = regex_fix_source_links(content, GITHUB_PREFIX)
+    rewritten, count = rewrite(content)
+    assert count == expected_count > 0
+    assert rewritten == expected
+
+
+def test_second_pass_makes_no_replacements():
+    rewritten, count = rewrite(run_fix_source_links.build_benchmark_mdx(64 * 1024))
+    assert count > 0
+    assert rewrite(rewritten) == (rewritten, 0)
+
+
+def test_links_in_fenced_code_are_kept():
+    content = "```python\n# [neurons/validator.py:1-4]()\n```\n\nSources: [neurons/validator.py:1-4]()\n"
+    rewritten, count = rewrite(content)
+    assert count == 1
+    assert rewritten.startswith("```python\n# [neurons/validator.py:1-4]()\n```\n")
@@ -0,0 +1,149 @@
+# test_parallel_jobs.py
+# --jobs must not change what SPBCP and the .mdx fixers write or print. A few pages of the shipped ingested data
+# are built with --jobs 1 and --jobs 2 against a small source checkout (with a line map between two refs), then
+# post-processed. The scripts run in subprocesses with the "spawn" start method (the macOS and Windows default),
+# where worker processes inherit nothing from the parent but run_ordered's context.
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from source_index import parse_source_href, parse_source_reference
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE_COUNT = 8
+SOURCE_REFERENCE_RE = re.compile(r"\[([\w./-]+\.\w+(?::\d+(?:-\d+)?)?)\]\(")
+
+RUNNER = """
+import importlib, multiprocessing, sys
+multiprocessing.set_start_method("spawn")
+sys.path[:0] = [sys.argv[1], sys.argv[2]]
+module = importlib.import_module(sys.argv[3])
+sys.argv = [sys.argv[3] + ".py"] + sys.argv[4:]
+module.main()
+"""
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def git(checkout, *args):
+    subprocess.run(["git", "-C", str(checkout), "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                   check=True, capture_output=True)
+
+
+def cited_files(pages):
+    """{filename: highest cited line} of the pages' source links."""
+    references = []
+    for page_data in pages.values():
+        for link in page_data["resolved_links"]:
+            if link["context"] == "collapsible_aside_link":
+                references.append(parse_source_href(link["original_deepwiki_href"])[:3])
+            elif link["context"] == "inline_source_link":
+                references.append(parse_source_reference(link["text"]))
+        references += [parse_source_reference(text) for text in SOURCE_REFERENCE_RE.findall(page_data["main_markdown_content"])]
+    files = {}
+    for filename, line_start, line_end in references:
+        filename = filename.strip("/")
+        files[filename] = max(files.get(filename, 0), int(line_start or 0), int(line_end or 0))
+    directories = {os.path.dirname(filename) for filename in files}
+    return {filename: last_line for filename, last_line in files.items() if filename not in directories}
+
+
+def make_source_checkout(path, files):
+    """A git repository with every cited file at ref "deepwiki"; at "current" some files gained lines at the top and one is gone."""
+    path.mkdir()
+    git(path, "init", "-q")
+    for filename, last_line in files.items():
+        file_path = path / filename
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text("".join(f"line {n}\n" for n in range(1, last_line + 11)), encoding="utf-8")
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", "deepwiki")
+    git(path, "tag", "deepwiki")
+    for i, filename in enumerate(sorted(files)):
+        file_path = path / filename
+        if i == 1:
+            file_path.unlink()
+        elif i % 3 == 0:
+            file_path.write_text("inserted\n" * 5 + file_path.read_text(encoding="utf-8"), encoding="utf-8")
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", "current")
+    git(path, "tag", "current")
+
+
+def write_config(run_dir, checkout, ingested_path):
+    """config.py for one run: the template with every path in run_dir, no caches (so any re-indexing shows in the log)."""
+    with open(os.path.join(PIPELINE_DIR, "config.template.py"), "r", encoding="utf-8") as f:
+        template = f.read()
+    overrides = {
+        "TARGET_DOCS_DIR": str(run_dir / "docs"),
+        "INGESTED_DATA_JSON_PATH": str(ingested_path),
+        "PAGE_STORE_ENABLED": False,
+        "SPBCP_INCREMENTAL": True,
+        "SPBCP_MANIFEST_PATH": str(run_dir / "spbcp_manifest.json"),
+        "LINK_GRAPH_ENABLED": True,
+        "LINK_GRAPH_PATH": str(run_dir / "link_graph.json"),
+        "SOURCE_CHECKOUT_PATH": str(checkout),
+        "SOURCE_INDEX_CACHE_PATH": None,
+        "SOURCE_LINE_MAP_CACHE_PATH": None,
+        "DEEPWIKI_SOURCE_REF": "deepwiki",
+        "GITHUB_REF": "current",
+    }
+    lines = [f"{name} = {value!r}" for name, value in overrides.items()]
+    lines.append('GITHUB_BLOB_URL_PREFIX = f"{GITHUB_REPO_URL}/blob/{GITHUB_REF}/"')
+    config_dir = run_dir / "config"
+    config_dir.mkdir()
+    (config_dir / "config.py").write_text(template + "\n\n" + "\n".join(lines) + "\n", encoding="utf-8")
+    return config_dir
+
+
+def run_script(config_dir, script, *args):
+    result = subprocess.run([sys.executable, "-c", RUNNER, str(config_dir), PIPELINE_DIR, script, *args],
+                            capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+def build_site(run_dir, checkout, ingested_path, jobs):
+    """SPBCP, then the fused post-processing on a copy ("fused") and the standalone source link fixer on the original."""
+    run_dir.mkdir()
+    config_dir = write_config(run_dir, checkout, ingested_path)
+    log = run_script(config_dir, "run_spbcp", "--jobs", jobs)
+    shutil.copytree(run_dir / "docs", run_dir / "fused")
+    log += run_script(config_dir, "run_postprocess_mdx", str(run_dir / "fused"), "--jobs", jobs)
+    log += run_script(config_dir, "run_fix_source_links", "--jobs", jobs)
+    return log.replace(str(run_dir), "<run>")
+
+
+def read_tree(directory):
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, directory)] = f.read()
+    return files
+
+
+def test_jobs_give_the_same_pages_and_log(tmp_path):
+    with open(os.path.join(PIPELINE_DIR, "ingested_deepwiki_data.json"), "r", encoding="utf-8") as f:
+        pages = dict(list(json.load(f).items())[:PAGE_COUNT])
+    ingested_path = tmp_path / "ingested_deepwiki_data.json"
+    ingested_path.write_text(json.dumps(pages), encoding="utf-8")
+    checkout = tmp_path / "source"
+    make_source_checkout(checkout, cited_files(pages))
+
+    serial_log = build_site(tmp_path / "serial", checkout, ingested_path, "1")
+    parallel_log = build_site(tmp_path / "parallel", checkout, ingested_path, "2")
+
+    assert serial_log.count("Indexing source tree") == 3 # once per script run, in the main process
+    assert "Source link" in serial_log and "replacements made" in serial_log
+    assert parallel_log == serial_log
+    for directory in ("docs", "fused"):
+        serial_files = read_tree(tmp_path / "serial" / directory)
+        assert len(serial_files) == PAGE_COUNT
+        assert read_tree(tmp_path / "parallel" / directory) == serial_files
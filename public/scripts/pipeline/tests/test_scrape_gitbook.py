@@ -0,0 +1,307 @@
+# test_scrape_gitbook.py
+# The incremental scrape state of run_scrape_gitbook.py (which pages are fetched again and which files are
+# deleted, against a temporary OUTPUT_DIR), how the navigation tree is read and mapped to folders, and
+# scrape_pages against a fake browser context (write order, retries, timeouts, how far it loads ahead).
+
+import argparse
+import asyncio
+import json
+import os
+
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("markdownify")
+
+import run_scrape_gitbook as scraper
+
+BASE = "https://docs.neuralinternet.ai"
+
+
+def link(slug, title, directory=""):
+    return {"href": f"{BASE}/{slug}", "title": title, "directory": directory}
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(scraper, "STATE_PATH", str(tmp_path / ".scrape_state.json"))
+    return tmp_path
+
+
+def write_files(output_dir, *files):
+    for file in files:
+        path = output_dir / file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("old", encoding="utf-8")
+
+
+def test_plan_keeps_pages_with_unchanged_lastmod_and_file(output_dir):
+    links = [link("a", "Page A"), link("b", "Page B", "guides"), link("c", "Page C"), link("d", "Page D")]
+    state = {f"{BASE}/a": {"lastmod": "2024-01-01", "file": "page_a.md"},
+             f"{BASE}/b": {"lastmod": "2024-01-01", "file": "page_b.md"}, # moved into "guides"
+             f"{BASE}/c": {"lastmod": "2024-01-01", "file": "page_c.md"}}
+    write_files(output_dir, "page_a.md", "page_b.md", "page_c.md")
+    lastmods = {f"{BASE}/a": "2024-01-01", f"{BASE}/b": "2024-01-01", f"{BASE}/c": "2024-02-01", f"{BASE}/d": "2024-01-01"}
+
+    to_fetch, kept = scraper.plan_incremental_scrape(links, lastmods, state)
+
+    assert [l["title"] for l in to_fetch] == ["Page B", "Page C", "Page D"]
+    assert kept == {f"{BASE}/a": state[f"{BASE}/a"]}
+
+
+def test_plan_fetches_pages_without_lastmod_or_file(output_dir):
+    links = [link("a", "Page A"), link("b", "Page B")]
+    state = {f"{BASE}/a": {"lastmod": None, "file": "page_a.md"},
+             f"{BASE}/b": {"lastmod": "2024-01-01", "file": "page_b.md"}}
+    write_files(output_dir, "page_a.md") # page_b.md was deleted by hand
+
+    to_fetch, kept = scraper.plan_incremental_scrape(links, {f"{BASE}/b": "2024-01-01"}, state)
+
+    assert to_fetch == links and kept == {}
+
+
+def test_remove_stale_files_deletes_only_state_files(output_dir):
+    state = {f"{BASE}/a": {"lastmod": None, "file": "page_a.md"},
+             f"{BASE}/b": {"lastmod": None, "file": os.path.join("guides", "page_b.md")}}
+    write_files(output_dir, "page_a.md", os.path.join("guides", "page_b.md"), "old_flat_page.md", "notes.txt")
+
+    removed_count = scraper.remove_stale_files(state, {"page_a.md"})
+
+    assert removed_count == 1
+    assert sorted(os.listdir(output_dir)) == ["notes.txt", "old_flat_page.md", "page_a.md"] # empty "guides" removed
+
+
+def test_remove_stale_files_without_state_deletes_nothing(output_dir):
+    write_files(output_dir, "page_a.md", "page_b.md")
+
+    assert scraper.remove_stale_files({}, {"page_a.md"}) == 0
+    assert sorted(os.listdir(output_dir)) == ["page_a.md", "page_b.md"]
+
+
+@pytest.mark.parametrize("page_count, state_size, incomplete", [
+    (0, 0, True),
+    (0, 10, True),
+    (4, 10, True),
+    (5, 10, False),
+    (12, 10, False),
+    (3, 0, False),
+])
+def test_nav_looks_incomplete(page_count, state_size, incomplete):
+    state = {f"{BASE}/{i}": {"lastmod": None, "file": f"{i}.md"} for i in range(state_size)}
+    assert scraper.nav_looks_incomplete(page_count, state) == incomplete
+
+
+def test_state_round_trip(output_dir):
+    state = {f"{BASE}/a": {"lastmod": "2024-01-01", "file": "page_a.md"}}
+    scraper.save_state(state, "sitemap")
+    assert scraper.load_state() == (state, "sitemap")
+
+
+def test_state_without_nav_source(output_dir):
+    state = {f"{BASE}/a": {"lastmod": "2024-01-01", "file": "page_a.md"}}
+    (output_dir / ".scrape_state.json").write_text(json.dumps({"version": 1, "pages": state}), encoding="utf-8")
+    assert scraper.load_state() == (state, None)
+
+
+@pytest.mark.parametrize("page_count, nav_source, state_size, state_nav_source, blocked", [
+    (10, "page_data", 0, None, None),
+    (10, "page_data", 10, "page_data", None),
+    (4, "page_data", 10, "page_data", "looks incomplete"),
+    (10, "sitemap", 10, "page_data", "read from the sitemap, the last run's from the embedded page data"),
+    (10, "page_data", 10, None, "the last run's from an unrecorded source"),
+])
+def test_stale_file_removal_blocker(page_count, nav_source, state_size, state_nav_source, blocked):
+    state = {f"{BASE}/{i}": {"lastmod": None, "file": f"{i}.md"} for i in range(state_size)}
+    blocker = scraper.stale_file_removal_blocker(page_count, nav_source, state, state_nav_source)
+    assert blocker is None if blocked is None else blocked in blocker
+
+
+def push_script(text):
+    return f"self.__next_f.push({json.dumps([1, text])})"
+
+
+def test_nav_entries_from_page_data():
+    toc = json.dumps({"pages": [
+        {"title": "Introduction", "path": "introduction"},
+        {"title": "Getting Started", "pages": [ # a section heading without a page
+            {"title": "Miner Setup", "path": "getting-started/miner-setup", "pages": [
+                {"title": "Docker", "href": "/getting-started/miner-setup/docker"}]},
+            {"title": "GitHub", "href": "https://github.com/neuralinternet/ni-compute"}, # external
+            {"title": "Validator Setup", "path": "getting-started/validator-setup"}]},
+        {"title": " ", "path": "untitled"},
+    ]})
+    other_list = json.dumps({"pages": [{"title": "Only one", "path": "one"}]})
+    middle = len(toc) // 2 # the page data is split over several pushes
+    scripts = [push_script(other_list), push_script('0:{"toc":' + toc[:middle]), push_script(toc[middle:] + "}")]
+
+    assert scraper.nav_entries_from_page_data(scripts) == [
+        scraper.nav_entry("Introduction", f"{BASE}/introduction", None, 0, 0),
+        scraper.nav_entry("Getting Started", None, None, 0, 1),
+        scraper.nav_entry("Miner Setup", f"{BASE}/getting-started/miner-setup", 1, 1, 0),
+        scraper.nav_entry("Docker", f"{BASE}/getting-started/miner-setup/docker", 2, 2, 0),
+        scraper.nav_entry("Validator Setup", f"{BASE}/getting-started/validator-setup", 1, 1, 1),
+    ]
+    assert scraper.nav_entries_from_page_data([push_script("no table of contents")]) == []
+
+
+def test_nav_entries_from_menu():
+    links = [{"href": f"{BASE}/introduction", "title": "Introduction", "depth": 1},
+             {"href": f"{BASE}/miner-setup", "title": "Miner Setup", "depth": 1},
+             {"href": f"{BASE}/miner-setup/docker", "title": "Docker", "depth": 2},
+             {"href": "https://github.com/neuralinternet", "title": "GitHub", "depth": 2},
+             {"href": f"{BASE}/miner-setup/docker/gpu", "title": "GPU", "depth": 3},
+             {"href": f"{BASE}/empty", "title": "", "depth": 2},
+             {"href": f"{BASE}/validator-setup", "title": "Validator Setup", "depth": 1}]
+
+    assert scraper.nav_entries_from_menu(links) == [
+        scraper.nav_entry("Introduction", f"{BASE}/introduction", None, 0, 0),
+        scraper.nav_entry("Miner Setup", f"{BASE}/miner-setup", None, 0, 1),
+        scraper.nav_entry("Docker", f"{BASE}/miner-setup/docker", 1, 1, 0),
+        scraper.nav_entry("GPU", f"{BASE}/miner-setup/docker/gpu", 2, 2, 0),
+        scraper.nav_entry("Validator Setup", f"{BASE}/validator-setup", None, 0, 2),
+    ]
+
+
+def test_nav_entries_from_sitemap():
+    urls = [f"{BASE}/", f"{BASE}/miner-setup", f"{BASE}/miner-setup/docker", f"{BASE}/miner-setup/", "https://example.com/x",
+            f"{BASE}/validator-setup/gpu-checks"]
+
+    assert scraper.nav_entries_from_sitemap(urls, {f"{BASE}/miner-setup": "Miner Setup"}) == [
+        scraper.nav_entry("Home", f"{BASE}/", None, 0, 0),
+        scraper.nav_entry("Miner Setup", f"{BASE}/miner-setup", None, 0, 1),
+        scraper.nav_entry("Docker", f"{BASE}/miner-setup/docker", 1, 1, 0),
+        scraper.nav_entry("Gpu checks", f"{BASE}/validator-setup/gpu-checks", None, 0, 2),
+    ]
+
+
+def test_pages_to_scrape_mirrors_the_menu_in_folders():
+    entries = [scraper.nav_entry("Introduction", f"{BASE}/introduction", None, 0, 0),
+               scraper.nav_entry("Getting Started", None, None, 0, 1),
+               scraper.nav_entry("Miner Setup", f"{BASE}/miner-setup", 1, 1, 0),
+               scraper.nav_entry("Docker", f"{BASE}/miner-setup/docker", 2, 2, 0),
+               scraper.nav_entry("Introduction again", f"{BASE}/introduction/", 1, 1, 1)]
+
+    assert scraper.pages_to_scrape(entries) == [
+        {"href": f"{BASE}/introduction", "title": "Introduction", "directory": ""},
+        {"href": f"{BASE}/miner-setup", "title": "Miner Setup", "directory": "getting_started"},
+        {"href": f"{BASE}/miner-setup/docker", "title": "Docker", "directory": os.path.join("getting_started", "miner_setup")},
+    ]
+
+
+class FakePage:
+    """A browser page whose goto() takes behavior[url]: a delay, "hang", "fail", "crash" (closes the page), or a list of those per attempt."""
+
+    def __init__(self, context):
+        self.context = context
+        self.url = None
+        self.closed = False
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        attempt = self.context.attempts[url] = self.context.attempts.get(url, 0) + 1
+        self.context.started.append(url)
+        behavior = self.context.behavior.get(url, 0)
+        if isinstance(behavior, list):
+            behavior = behavior[min(attempt, len(behavior)) - 1]
+        if behavior == "hang":
+            await asyncio.sleep(60)
+        elif behavior == "crash":
+            self.closed = True
+            raise Exception("Target page, context or browser has been closed")
+        elif behavior == "fail":
+            raise Exception("net::ERR_CONNECTION_RESET")
+        await asyncio.sleep(behavior)
+        self.url = url
+
+    async def wait_for_selector(self, selector, timeout=None):
+        pass
+
+    async def inner_html(self, selector):
+        return f"<p>{self.url}</p>"
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self, behavior=None):
+        self.behavior = behavior or {}
+        self.attempts = {}
+        self.started = []
+        self.pages_opened = 0
+
+    async def new_page(self):
+        self.pages_opened += 1
+        return FakePage(self)
+
+
+@pytest.fixture
+def fake_scrape(output_dir, monkeypatch, capsys):
+    """Runs scrape_pages on a FakeContext; returns (written titles, log lines)."""
+    monkeypatch.setattr(scraper, "RETRY_DELAY", 0)
+    monkeypatch.setattr(scraper, "convert_page", lambda title, html_content: f"# {title}\n{html_content}")
+
+    def scrape(context, links, concurrency=3, page_timeout=5, retries=1):
+        options = argparse.Namespace(concurrency=concurrency, page_timeout=page_timeout, retries=retries)
+        written = asyncio.run(scraper.scrape_pages(context, links, options, None))
+        return [link["title"] for link in written], capsys.readouterr().out.splitlines()
+    return scrape
+
+
+def page_links(count):
+    return [link(f"p{i}", f"Page {i}") for i in range(count)]
+
+
+def test_scrape_pages_writes_in_navigation_order(fake_scrape, output_dir):
+    links = page_links(8)
+    context = FakeContext({f"{BASE}/p{i}": (8 - i) * 0.01 for i in range(8)}) # later pages load first
+
+    written, log = fake_scrape(context, links)
+
+    assert written == [f"Page {i}" for i in range(8)]
+    assert [line for line in log if line.startswith("Scraping '")] == [f"Scraping 'Page {i}' ({BASE}/p{i})..." for i in range(8)]
+    assert (output_dir / "page_3.md").read_text(encoding="utf-8") == f"# Page 3\n<p>{BASE}/p3</p>"
+
+
+def test_scrape_pages_retries_failed_pages(fake_scrape, output_dir):
+    context = FakeContext({f"{BASE}/p1": ["crash", 0], f"{BASE}/p2": "fail"})
+
+    written, log = fake_scrape(context, page_links(4), concurrency=2, retries=1)
+
+    assert written == ["Page 0", "Page 1", "Page 3"]
+    assert context.attempts == {f"{BASE}/p0": 1, f"{BASE}/p1": 2, f"{BASE}/p2": 2, f"{BASE}/p3": 1}
+    assert context.pages_opened == 3 # the crashed page was replaced
+    assert "  -> Attempt 1 failed (Target page, context or browser has been closed), retrying..." in log
+    assert f"  -> Error scraping {BASE}/p2: net::ERR_CONNECTION_RESET" in log
+    assert not (output_dir / "page_2.md").exists()
+
+
+def test_scrape_pages_times_out_hanging_pages(fake_scrape):
+    context = FakeContext({f"{BASE}/p0": ["hang", 0], f"{BASE}/p1": "hang"})
+
+    written, log = fake_scrape(context, page_links(3), page_timeout=0.05, retries=1)
+
+    assert written == ["Page 0", "Page 2"]
+    assert log.count("  -> Attempt 1 failed (timed out after 0.05s), retrying...") == 2
+    assert f"  -> Error scraping {BASE}/p1: timed out after 0.05s" in log
+
+
+def test_scrape_pages_loads_at_most_max_pending_pages_ahead(fake_scrape, monkeypatch):
+    monkeypatch.setattr(scraper, "MAX_PENDING_PAGES", 4)
+    context = FakeContext({f"{BASE}/p0": 0.2}) # the first page is slow, the others load at once
+    started_while_first_loads = []
+
+    original_goto = FakePage.goto
+    async def goto(page, url, wait_until=None, timeout=None):
+        await original_goto(page, url, wait_until, timeout)
+        if url == f"{BASE}/p0":
+            started_while_first_loads.extend(context.started)
+    monkeypatch.setattr(FakePage, "goto", goto)
+
+    written, _ = fake_scrape(context, page_links(12), concurrency=2)
+
+    assert written == [f"Page {i}" for i in range(12)]
+    assert len(started_while_first_loads) == 4 # the first page and the 3 after it, not all 11
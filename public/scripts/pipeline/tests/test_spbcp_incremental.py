@@ -0,0 +1,109 @@
+# test_spbcp_incremental.py
+# SPBCP_INCREMENTAL: write-if-changed, skipping unchanged pages and deleting orphaned pages, against a temporary
+# TARGET_DOCS_DIR.
+
+import json
+import os
+import sys
+
+import pytest
+
+import config
+import run_spbcp
+
+
+@pytest.fixture
+def docs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TARGET_DOCS_DIR", str(tmp_path / "docs"))
+    monkeypatch.setattr(config, "INGESTED_DATA_JSON_PATH", str(tmp_path / "ingested_deepwiki_data.json"))
+    monkeypatch.setattr(config, "SPBCP_MANIFEST_PATH", str(tmp_path / "spbcp_manifest.json"))
+    monkeypatch.setattr(config, "PAGE_STORE_ENABLED", False)
+    monkeypatch.setattr(config, "LINK_GRAPH_ENABLED", False)
+    monkeypatch.setattr(run_spbcp, "configured_sources", lambda: (None, None)) # no source checkout
+    return tmp_path / "docs"
+
+
+def page(title, astro_path, body):
+    return {"title": title, "target_astro_path": astro_path, "main_markdown_content": f"# {title}\n\n{body}\n",
+            "resolved_links": [], "mermaid_diagrams": []}
+
+
+def run_spbcp_main(monkeypatch, capsys, pages, *args):
+    with open(config.INGESTED_DATA_JSON_PATH, "w", encoding="utf-8") as f:
+        json.dump(pages, f)
+    monkeypatch.setattr(sys, "argv", ["run_spbcp.py", *args])
+    run_spbcp.main()
+    return capsys.readouterr().out
+
+
+def test_write_if_changed(tmp_path):
+    output_path = str(tmp_path / "page.mdx")
+    assert run_spbcp.write_if_changed(output_path, b"first")
+    os.utime(output_path, ns=(1, 1))
+
+    assert not run_spbcp.write_if_changed(output_path, b"first")
+    assert os.stat(output_path).st_mtime_ns == 1
+    assert run_spbcp.write_if_changed(output_path, b"second")
+    assert open(output_path, "rb").read() == b"second"
+    assert not os.path.exists(output_path + ".tmp")
+
+
+def test_write_if_changed_keeps_post_processed_file(tmp_path):
+    """With the hash of what SPBCP last wrote, the same build output leaves the (post-processed) file alone."""
+    output_path = str(tmp_path / "page.mdx")
+    with open(output_path, "wb") as f:
+        f.write(b"post-processed")
+
+    assert not run_spbcp.write_if_changed(output_path, b"built", run_spbcp.sha256_hex(b"built"))
+    assert open(output_path, "rb").read() == b"post-processed"
+    assert run_spbcp.write_if_changed(output_path, b"rebuilt", run_spbcp.sha256_hex(b"built"))
+    assert open(output_path, "rb").read() == b"rebuilt"
+    os.remove(output_path)
+    assert run_spbcp.write_if_changed(output_path, b"built", run_spbcp.sha256_hex(b"built"))
+
+
+def test_delete_orphaned_page_removes_empty_directories(docs_dir):
+    (docs_dir / "guides" / "advanced").mkdir(parents=True)
+    (docs_dir / "guides" / "advanced" / "old.mdx").write_text("old", encoding="utf-8")
+    (docs_dir / "index.mdx").write_text("index", encoding="utf-8")
+
+    assert run_spbcp.delete_orphaned_page(str(docs_dir / "guides" / "advanced" / "old.mdx"))
+    assert sorted(os.listdir(docs_dir)) == ["index.mdx"]
+    assert not run_spbcp.delete_orphaned_page(str(docs_dir / "guides" / "advanced" / "old.mdx"))
+
+
+def test_incremental_runs_skip_unchanged_and_delete_orphaned_pages(docs_dir, monkeypatch, capsys):
+    monkeypatch.setattr(config, "SPBCP_INCREMENTAL", True)
+    pages = {"/wiki/1-overview": page("Overview", "/", "Start here."),
+             "/wiki/2-miner": page("Miner", "/miner-system", "Runs jobs."),
+             "/wiki/2.1-setup": page("Setup", "/miner-system/setup", "Install it.")}
+    log = run_spbcp_main(monkeypatch, capsys, pages)
+    assert "Built 3 pages (3 written, 0 unchanged on disk), skipped 0 unchanged pages, deleted 0 orphaned pages." in log
+    (docs_dir / "index.mdx").write_text("post-processed", encoding="utf-8")
+
+    log = run_spbcp_main(monkeypatch, capsys, pages)
+    assert "Built 0 pages (0 written, 0 unchanged on disk), skipped 3 unchanged pages, deleted 0 orphaned pages." in log
+    assert (docs_dir / "index.mdx").read_text(encoding="utf-8") == "post-processed"
+
+    del pages["/wiki/2.1-setup"]
+    pages["/wiki/2-miner"] = page("Miner", "/miner-system", "Runs jobs and challenges.")
+    log = run_spbcp_main(monkeypatch, capsys, pages)
+    assert "Built 1 pages (1 written, 0 unchanged on disk), skipped 1 unchanged pages, deleted 1 orphaned pages." in log
+    assert sorted(os.listdir(docs_dir)) == ["index.mdx", "miner-system.mdx"] # the empty miner-system/ folder is gone
+
+    log = run_spbcp_main(monkeypatch, capsys, pages, "--force") # rebuilds all, rewrites what differs on disk
+    assert "Built 2 pages (1 written, 1 unchanged on disk), skipped 0 unchanged pages, deleted 0 orphaned pages." in log
+    assert (docs_dir / "index.mdx").read_text(encoding="utf-8").startswith("---")
+
+
+def test_non_incremental_runs_rebuild_everything_and_delete_nothing(docs_dir, monkeypatch, capsys):
+    monkeypatch.setattr(config, "SPBCP_INCREMENTAL", False)
+    pages = {"/wiki/1-overview": page("Overview", "/", "Start here."),
+             "/wiki/2-miner": page("Miner", "/miner-system", "Runs jobs.")}
+    run_spbcp_main(monkeypatch, capsys, pages)
+    del pages["/wiki/2-miner"]
+
+    log = run_spbcp_main(monkeypatch, capsys, pages)
+    assert "Built 1 pages (0 written, 1 unchanged on disk), skipped 0 unchanged pages, deleted 0 orphaned pages." in log
+    assert sorted(os.listdir(docs_dir)) == ["index.mdx", "miner-system.mdx"]
+    assert not os.path.exists(config.SPBCP_MANIFEST_PATH)
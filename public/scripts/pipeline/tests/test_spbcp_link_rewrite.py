@@ -0,0 +1,120 @@
+# test_spbcp_link_rewrite.py
+# SPBCP's single-scan rewrite_markdown_links must rewrite pages the same way as the sequential re.sub passes it
+# replaced (kept below as the reference), on the shipped ingested pages and on a sample page. Two internal links
+# overlapping through nested brackets ("[a [b](h)") and backslashes in link text are left out: there the old passes
+# depended on the order of the entries or failed.
+
+import json
+import os
+import re
+
+import pytest
+
+import run_spbcp
+import source_index
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DETAILS_BLOCK_RE = re.compile(r"<details>\s*<summary>Relevant source files</summary>.*?</details>", re.IGNORECASE | re.DOTALL)
+
+SAMPLE_PAGE = """# Scoring System
+
+See [Overview](#overview), [the miner](/neuralinternet/ni-compute/3-miner-system) and [Overview](#overview) again.
+An [unresolved page](/neuralinternet/ni-compute/9-gone) and [Overview](#other) stay as they are.
+
+Sources: [neurons/validator.py:356-437]() [compute/utils/math.py:12]() [neurons/validator.py:356-437]()
+Sources: [neurons/validator.py:356-437]() [compute/*.py (all)+?]() [docs/"quoted".md](docs/"quoted".md)
+Sources: [not a file]() [neurons/miner.py](neurons/miner.py) [Overview](#overview)
+Sources: [old [Overview](#overview) and [draft [the miner](/neuralinternet/ni-compute/3-miner-system)
+
+The last [neurons/miner.py](neurons/miner.py) is not on a Sources: line.
+"""
+
+SAMPLE_LINKS = [
+    ("inline_source_link", "neurons/validator.py:356-437", ""),
+    ("inline_source_link", "compute/utils/math.py:12", ""),
+    ("inline_source_link", "neurons/validator.py:356-437", ""), # the second occurrence of the same key
+    ("inline_source_link", "compute/*.py (all)+?", ""),
+    ("inline_source_link", 'docs/"quoted".md', 'docs/"quoted".md'),
+    ("inline_source_link", "not a file", ""),
+    ("inline_source_link", "neurons/miner.py", "neurons/miner.py"),
+    ("inline_source_link", "neurons/never_cited.py:1", ""), # not in the page
+    ("inline_source_link", "old [Overview", "#overview"), # the outer link, not [Overview](#overview) in it
+    ("internal_page_link_from_content_body", "Overview", "#overview"),
+    ("internal_page_link_from_content_body", "the miner", "/neuralinternet/ni-compute/3-miner-system"),
+    ("internal_page_link_from_content_body", "neurons/miner.py", "neurons/miner.py"),
+    ("internal_page_link_from_content_body", "Gone", "#gone"), # not in the page
+]
+
+
+def sequential_rewrite(markdown_content, inline_source_links, internal_page_links):
+    """The passes build_page_content made before rewrite_markdown_links: one re.sub per link, then the placeholders."""
+    source_link_placeholders = {}
+    for placeholder_idx, link_info in enumerate(inline_source_links):
+        pattern = rf"\[{re.escape(link_info['text'])}\]\({re.escape(link_info['original_deepwiki_href'])}\)"
+        current_placeholder = f"__SOURCELINK_PLACEHOLDER_{placeholder_idx}__"
+        new_content = re.sub(pattern, current_placeholder, markdown_content, count=1)
+        if new_content != markdown_content:
+            source_link_placeholders[current_placeholder] = run_spbcp.build_inline_source_component(link_info["text"])
+        markdown_content = new_content
+
+    for link_info in internal_page_links:
+        pattern = rf"\[({re.escape(link_info['text'])})\]\({re.escape(link_info['original_deepwiki_href'])}\)"
+        replacement_markdown_link = f'[{link_info["text"]}]({link_info["href"]})'
+        markdown_content, num_replacements = re.subn(pattern, replacement_markdown_link, markdown_content)
+        if num_replacements == 0:
+            original_md_link_str = f'[{link_info["text"]}]({link_info["original_deepwiki_href"]})'
+            markdown_content = markdown_content.replace(original_md_link_str, replacement_markdown_link, 1)
+
+    for placeholder, component_text in source_link_placeholders.items():
+        markdown_content = markdown_content.replace(placeholder, component_text)
+    return markdown_content
+
+
+@pytest.fixture(autouse=True)
+def no_source_checkout(monkeypatch):
+    """Source links are joined to GITHUB_BLOB_URL_PREFIX as cited, as the old passes did."""
+    monkeypatch.setattr(source_index, "get_configured_source_index", lambda: None)
+    monkeypatch.setattr(source_index, "get_configured_line_map", lambda: None)
+
+
+def sample_links():
+    links = [{"context": context, "text": text, "original_deepwiki_href": original_href,
+              "href": f"/astro/{original_href.strip('/#')}" if context != "inline_source_link" else ""}
+             for context, text, original_href in SAMPLE_LINKS]
+    # A second entry for an internal link: the first entry has already replaced every occurrence.
+    links.append({"context": "internal_page_link_from_content_body", "text": "the miner",
+                  "original_deepwiki_href": "/neuralinternet/ni-compute/3-miner-system", "href": "/astro/elsewhere"})
+    return links
+
+
+def load_pages():
+    with open(os.path.join(PIPELINE_DIR, "ingested_deepwiki_data.json"), "r", encoding="utf-8") as f:
+        pages = json.load(f)
+    return [pytest.param(DETAILS_BLOCK_RE.sub("", page_data["main_markdown_content"], count=1), page_data["resolved_links"],
+                         id=page_data["title"])
+            for page_data in pages.values()]
+
+
+@pytest.mark.parametrize("markdown_content, resolved_links",
+                         [pytest.param(SAMPLE_PAGE, sample_links(), id="sample_page")] + load_pages())
+def test_matches_sequential_substitutions(markdown_content, resolved_links):
+    inline_source_links = [link for link in resolved_links if link["context"] == "inline_source_link"]
+    internal_page_links = [link for link in resolved_links if link["context"] == "internal_page_link_from_content_body"]
+    expected = sequential_rewrite(markdown_content, inline_source_links, internal_page_links)
+    assert run_spbcp.rewrite_markdown_links(markdown_content, inline_source_links, internal_page_links, "Page") == expected
+
+
+def test_sample_page_rewrites_and_reports_unmatched_links(capsys):
+    links = sample_links()
+    rewritten = run_spbcp.rewrite_markdown_links(
+        SAMPLE_PAGE, [link for link in links if link["context"] == "inline_source_link"],
+        [link for link in links if link["context"] != "inline_source_link"], "Scoring System")
+    warnings = capsys.readouterr().out
+
+    assert rewritten.count('<SourceLink text="neurons/validator.py:356-437"') == 2
+    assert "[neurons/validator.py:356-437]()" in rewritten # a third occurrence without an entry of its own
+    assert rewritten.count("[Overview](/astro/overview)") == 3 # not the one inside "[old [Overview](#overview)"
+    assert rewritten.count("[the miner](/astro/neuralinternet/ni-compute/3-miner-system)") == 2
+    assert "[neurons/miner.py](/astro/neurons/miner.py) is not on a Sources: line" in rewritten
+    assert "[neurons/never_cited.py:1]()" in warnings and "'[Gone](#gone)'" in warnings
+    assert warnings.lower().count("warning") == 2